@@ -0,0 +1,153 @@
+"""Compares the statements, rows and time taken by category queries with the relationship loading the Categories model
+used to default to (children joined two levels deep, and every level's mappings joined too) against what the app does
+now.
+
+Builds a realistically sized category tree in a throwaway database, in memory with sqlite unless a database URL is
+given. Run it from the repository root in the app's environment, as for the unit tests:
+
+    python -m benchmarks.category_loading [database url]
+"""
+from flask import Flask
+from maintain_api.extensions import db
+from maintain_api.models import Categories, CategoryInstrumentsMapping, CategoryStatProvisionMapping, Instruments, \
+    StatutoryProvision
+from maintain_api.utilities.category_tree import load_category_tree
+from sqlalchemy import event, func
+from sqlalchemy.orm import joinedload
+import statistics
+import sys
+import time
+
+TOP_LEVEL_CATEGORIES = 10
+SUB_CATEGORIES = 6
+GRANDCHILD_CATEGORIES = 2
+PROVISIONS = 200
+INSTRUMENTS = 60
+PROVISIONS_PER_CATEGORY = 3
+INSTRUMENTS_PER_CATEGORY = 1
+REPEATS = 5
+
+
+def previous_loading():
+    """Query options reproducing the joined loading the model used to default to."""
+    children = joinedload(Categories.children)
+    grandchildren = joinedload(Categories.children).joinedload(Categories.children)
+    return [joinedload(Categories.provisions), joinedload(Categories.instruments), children,
+            joinedload(Categories.children).joinedload(Categories.provisions),
+            joinedload(Categories.children).joinedload(Categories.instruments), grandchildren,
+            joinedload(Categories.children).joinedload(Categories.children).joinedload(Categories.provisions),
+            joinedload(Categories.children).joinedload(Categories.children).joinedload(Categories.instruments)]
+
+
+def lookup(options):
+    """The name lookup every category write starts with."""
+    return Categories.query.options(*options) \
+        .filter(func.lower(Categories.name) == func.lower("Category 7")) \
+        .filter(Categories.parent_id == None) \
+        .first()  # noqa: E711 - Ignore "is None vs ==", is None does not produce valid sql in sqlAlchmey
+
+
+def lookup_with_mappings(options):
+    """The lookup category updates make, then reading the mappings to find what changed."""
+    category = lookup(options)
+    return [mapping.statutory_provision_id for mapping in category.provisions], \
+        [mapping.instruments_id for mapping in category.instruments]
+
+
+def list_top_level(options):
+    """How the category list endpoint used to read the top level categories."""
+    return [(category.name, category.display_name, category.permission) for category in Categories.query
+            .options(*options)
+            .filter(Categories.parent_id == None)  # noqa: E711 - is None does not produce valid sql in sqlAlchmey
+            .order_by(Categories.display_order)
+            .all()]
+
+
+def build_tree():
+    provisions = [StatutoryProvision("Provision {}".format(number)) for number in range(PROVISIONS)]
+    instruments = [Instruments("Instrument {}".format(number)) for number in range(INSTRUMENTS)]
+    db.session.add_all(provisions + instruments)
+    db.session.flush()
+
+    categories = []
+
+    def add(name, parent_id, order):
+        category = Categories(name, parent_id, order, None, name)
+        db.session.add(category)
+        db.session.flush()
+        categories.append(category)
+        return category
+
+    for top in range(TOP_LEVEL_CATEGORIES):
+        parent = add("Category {}".format(top), None, top)
+        for sub in range(SUB_CATEGORIES):
+            child = add("Category {}.{}".format(top, sub), parent.id, sub)
+            for grandchild in range(GRANDCHILD_CATEGORIES):
+                add("Category {}.{}.{}".format(top, sub, grandchild), child.id, grandchild)
+
+    mappings = []
+    for index, category in enumerate(categories):
+        for offset in range(PROVISIONS_PER_CATEGORY):
+            mappings.append({"category_id": category.id,
+                             "statutory_provision_id": provisions[(index + offset) % PROVISIONS].id})
+    db.session.bulk_insert_mappings(CategoryStatProvisionMapping, mappings)
+    mappings = []
+    for index, category in enumerate(categories):
+        for offset in range(INSTRUMENTS_PER_CATEGORY):
+            mappings.append({"category_id": category.id,
+                             "instruments_id": instruments[(index + offset) % INSTRUMENTS].id})
+    db.session.bulk_insert_mappings(CategoryInstrumentsMapping, mappings)
+    db.session.commit()
+    return len(categories)
+
+
+def measure(scenario):
+    """Runs the scenario REPEATS times, returning the statements it ran, the rows they returned and the median time."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    times = []
+    for _ in range(REPEATS):
+        db.session.expunge_all()
+        del statements[:]
+        event.listen(db.engine, "before_cursor_execute", record)
+        start = time.perf_counter()
+        scenario()
+        times.append(time.perf_counter() - start)
+        event.remove(db.engine, "before_cursor_execute", record)
+
+    # Run the recorded statements again, outside the timings, to count the rows each one sent back
+    connection = db.session.connection()
+    rows = sum(len(connection.execute(statement, parameters).fetchall()) for statement, parameters in statements)
+    return len(statements), rows, statistics.median(times) * 1000
+
+
+def main(database_url):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        try:
+            print("{} categories, {} provisions, {} instruments\n".format(build_tree(), PROVISIONS, INSTRUMENTS))
+            print("{:<45} {:>10} {:>10} {:>10}".format("", "statements", "rows", "median ms"))
+            for name, before, after in [
+                    ("category lookup", lambda: lookup(previous_loading()), lambda: lookup([])),
+                    ("category lookup with mappings", lambda: lookup_with_mappings(previous_loading()),
+                     lambda: lookup_with_mappings([])),
+                    ("top level list (after: tree snapshot)", lambda: list_top_level(previous_loading()),
+                     lambda: load_category_tree(None).get_all())]:
+                for label, scenario in [("before", before), ("after", after)]:
+                    print("{:<45} {:>10} {:>10} {:>10.2f}".format(
+                        "{} - {}".format(name, label), *measure(scenario)))
+        finally:
+            db.session.rollback()
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else 'sqlite://')
@@ -0,0 +1,57 @@
+"""Compares the cost of validating request payloads with jsonschema.validate, which checks the schema and builds a
+validator on every call, against the validators the views now build once at import.
+
+Run it from the repository root in the app's environment, as for the unit tests:
+
+    python -m benchmarks.schema_validation
+"""
+from jsonschema import validate
+from maintain_api.views.v1_0.categories import CATEGORY_SCHEMA, CATEGORY_VALIDATOR
+from maintain_api.views.v1_0.instruments import INSTRUMENT_SCHEMA, INSTRUMENT_VALIDATOR
+from maintain_api.views.v1_0.reference_data_import import IMPORT_SCHEMA, IMPORT_VALIDATOR
+from maintain_api.views.v1_0.statutory_provisions import STAT_PROV_SCHEMA, STAT_PROV_VALIDATOR
+import timeit
+
+REPEATS = 5
+NUMBER = 2000
+
+CATEGORY = {
+    "name": "Planning",
+    "display-name": "Planning",
+    "display-order": 1,
+    "permission": None,
+    "provisions": ["Town and Country Planning Act 1990 section 106", "Planning Act 2008"],
+    "instruments": ["Deed", "Agreement"]
+}
+
+PROVISION = {"title": "Planning Act 2008", "selectable": True}
+
+INSTRUMENT = {"name": "Deed"}
+
+IMPORT = {
+    "statutory-provisions": [{"title": "Provision {}".format(number), "selectable": True} for number in range(20)],
+    "instruments": [{"name": "Instrument {}".format(number)} for number in range(5)],
+    "categories": [dict(CATEGORY, name="Category {}".format(number), **{"sub-categories": [CATEGORY] * 3})
+                   for number in range(5)]
+}
+
+
+def per_call_microseconds(function):
+    return min(timeit.repeat(function, number=NUMBER, repeat=REPEATS)) / NUMBER * 1000000
+
+
+def main():
+    print("{:<25} {:>15} {:>15}".format("", "before (us)", "after (us)"))
+    for name, schema, validator, payload in [
+            ("category", CATEGORY_SCHEMA, CATEGORY_VALIDATOR, CATEGORY),
+            ("statutory provision", STAT_PROV_SCHEMA, STAT_PROV_VALIDATOR, PROVISION),
+            ("instrument", INSTRUMENT_SCHEMA, INSTRUMENT_VALIDATOR, INSTRUMENT),
+            ("import (45 items)", IMPORT_SCHEMA, IMPORT_VALIDATOR, IMPORT)]:
+        print("{:<25} {:>15.1f} {:>15.1f}".format(
+            name,
+            per_call_microseconds(lambda: validate(payload, schema)),
+            per_call_microseconds(lambda: validator.validate(payload))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import pytest
+
+
+@pytest.fixture
+def max_statements():
+    """Returns a context manager that fails the test if more than the given number of database statements are run
+    inside it, listing the statements that were.
+
+    Used to catch endpoints that start running a statement per row (N+1 queries) as the data grows:
+
+        with max_statements(3):
+            client.get('/v1.0/maintain/categories/Planning')
+    """
+    @contextmanager
+    def assert_max_statements(limit):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(Engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(Engine, 'before_cursor_execute', record)
+
+        assert len(statements) <= limit, "{0} database statements were run, expected at most {1}:\n{2}".format(
+            len(statements), limit, "\n".join(statements))
+
+    return assert_max_statements
@@ -0,0 +1,68 @@
+from maintain_api import main
+from maintain_api.extensions import db
+from maintain_api.models import Categories, Instruments, StatutoryProvision
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql
+from unittest import TestCase
+
+
+class TestQueryPlans(TestCase):
+    """Checks the case-insensitive name lookups are answered from the lower() indexes.
+
+    Sequential scans are disabled for the check, so postgres only picks one when no index can answer the query. The
+    tables are small enough in a test database that it would otherwise prefer a sequential scan anyway.
+    """
+
+    def setUp(self):
+        self.context = main.app.app_context()
+        self.context.push()
+        self.connection = db.engine.connect()
+        self.transaction = self.connection.begin()
+        self.connection.execute("SET LOCAL enable_seqscan = off")
+
+    def tearDown(self):
+        self.transaction.rollback()
+        self.connection.close()
+        self.context.pop()
+
+    def explain(self, query):
+        compiled = query.statement.compile(dialect=postgresql.dialect())
+        rows = self.connection.execute("EXPLAIN " + str(compiled), compiled.params)
+        return "\n".join(row[0] for row in rows)
+
+    def assert_uses_index(self, query, index):
+        plan = self.explain(query)
+        self.assertNotIn("Seq Scan", plan)
+        self.assertIn(index, plan)
+
+    def test_top_level_category_lookup(self):
+        query = db.session.query(Categories.id) \
+            .filter(func.lower(Categories.name) == func.lower("Planning")) \
+            .filter(Categories.parent_id == None)  # noqa: E711 - is None does not produce valid sql in sqlAlchmey
+        self.assert_uses_index(query, "ix_charge_categories_lower_name_top_level")
+
+    def test_sub_category_lookup(self):
+        query = db.session.query(Categories.id) \
+            .filter(func.lower(Categories.name) == func.lower("Listed building")) \
+            .filter(Categories.parent_id == 1)
+        self.assert_uses_index(query, "ix_charge_categories_parent_id_lower_name")
+
+    def test_instrument_lookup(self):
+        query = db.session.query(Instruments.id) \
+            .filter(func.lower(Instruments.name) == func.lower("Deed"))
+        self.assert_uses_index(query, "ix_instruments_lower_name")
+
+    def test_instrument_batch_lookup(self):
+        query = db.session.query(Instruments.id) \
+            .filter(func.lower(Instruments.name).in_(["deed", "notice"]))
+        self.assert_uses_index(query, "ix_instruments_lower_name")
+
+    def test_statutory_provision_lookup(self):
+        query = db.session.query(StatutoryProvision.id) \
+            .filter(func.lower(StatutoryProvision.title) == func.lower("Planning Act"))
+        self.assert_uses_index(query, "ix_statutory_provision_lower_title")
+
+    def test_statutory_provision_batch_lookup(self):
+        query = db.session.query(StatutoryProvision.id) \
+            .filter(func.lower(StatutoryProvision.title).in_(["planning act", "highways act"]))
+        self.assert_uses_index(query, "ix_statutory_provision_lower_title")
@@ -0,0 +1,128 @@
+from maintain_api import main
+from maintain_api.extensions import db
+from maintain_api.models import Categories
+from maintain_api.utilities.category_tree import category_tree
+from maintain_api.utilities.reference_data import table_versions, CATEGORIES_TABLE
+from maintain_api.views.v1_0.categories import categories_body_cache, category_tree_body_cache
+from maintain_api.views.v1_0.instruments import instruments_body_cache
+from maintain_api.views.v1_0.statutory_provisions import provision_cache
+from sqlalchemy.orm import aliased
+from unittest.mock import patch
+import json
+import pytest
+import uuid
+
+HEADERS = {'Authorization': 'Fake JWT'}
+
+
+@pytest.fixture
+def client():
+    """A test client with JWT validation patched out, and every reference data cache emptied so each request
+    reads from the database."""
+    for cache in [categories_body_cache, category_tree_body_cache, instruments_body_cache, provision_cache,
+                  category_tree]:
+        cache.invalidate()
+    with patch('maintain_api.app.validate'):
+        yield main.app.test_client()
+
+
+@pytest.fixture
+def sub_category():
+    """The name of a sub-category in the database, with the name of its top level category."""
+    with main.app.app_context():
+        parent = aliased(Categories)
+        row = db.session.query(parent.name, Categories.name) \
+            .join(Categories, Categories.parent_id == parent.id) \
+            .filter(parent.parent_id == None) \
+            .first()  # noqa: E711 - Ignore "is None vs ==", is None does not produce valid sql in sqlAlchmey
+        db.session.remove()
+    if row is None:
+        pytest.skip("No sub-categories in the database")
+    return row
+
+
+def test_categories(client, max_statements):
+    with max_statements(4):
+        assert client.get('/v1.0/maintain/categories', headers=HEADERS).status_code == 200
+
+
+def test_category_tree(client, max_statements):
+    with max_statements(4):
+        assert client.get('/v1.0/maintain/categories/tree', headers=HEADERS).status_code == 200
+
+
+def test_category(client, max_statements, sub_category):
+    with max_statements(4):
+        response = client.get('/v1.0/maintain/categories/{0}'.format(sub_category[0]), headers=HEADERS)
+    assert response.status_code == 200
+
+
+def test_sub_category(client, max_statements, sub_category):
+    with max_statements(4):
+        response = client.get('/v1.0/maintain/categories/{0}/sub-categories/{1}'.format(*sub_category),
+                              headers=HEADERS)
+    assert response.status_code == 200
+
+
+def test_categories_see_other_process_writes(client, sub_category):
+    """A write committed by another process, which bumps the version but can't touch this process's caches, is seen
+    by the next read."""
+    def rename(old, new):
+        with main.app.app_context():
+            db.session.query(Categories) \
+                .filter(Categories.name == old) \
+                .filter(Categories.parent_id == None) \
+                .update({Categories.name: new}, synchronize_session=False)  # noqa: E711 - as above
+            table_versions.bump(CATEGORIES_TABLE)
+            db.session.commit()
+            db.session.remove()
+
+    renamed = "{0} {1}".format(sub_category[0], uuid.uuid4().hex[:8])
+    assert client.get('/v1.0/maintain/categories/{0}'.format(sub_category[0]), headers=HEADERS).status_code == 200
+    rename(sub_category[0], renamed)
+    try:
+        assert client.get('/v1.0/maintain/categories/{0}'.format(sub_category[0]), headers=HEADERS).status_code == 404
+        assert client.get('/v1.0/maintain/categories/{0}'.format(renamed), headers=HEADERS).status_code == 200
+    finally:
+        rename(renamed, sub_category[0])
+
+
+def test_instruments(client, max_statements):
+    with max_statements(2):
+        assert client.get('/v1.0/maintain/instruments', headers=HEADERS).status_code in (200, 404)
+
+
+def test_statutory_provisions(client, max_statements):
+    with max_statements(2):
+        assert client.get('/v1.0/maintain/statutory-provisions', headers=HEADERS).status_code in (200, 404)
+
+
+def import_document(width):
+    """An import of width top level categories, each with width sub-categories that each have width more, mapped to
+    provisions and an instrument created by the same import. Names are unique to the test run."""
+    run = uuid.uuid4().hex[:8]
+    provisions = ["Provision {0} {1}".format(run, number) for number in range(width)]
+    instrument = "Instrument {0}".format(run)
+
+    def category(name, sub_categories):
+        return {"name": name, "display-name": name, "display-order": 1, "permission": None,
+                "provisions": provisions, "instruments": [instrument], "sub-categories": sub_categories}
+
+    return {
+        "statutory-provisions": [{"title": title, "selectable": True} for title in provisions],
+        "instruments": [{"name": instrument}],
+        "categories": [category("Category {0} {1}".format(run, top), [
+            category("Sub-category {0}.{1}".format(top, sub), [
+                category("Sub-sub-category {0}.{1}.{2}".format(top, sub, sub_sub), []) for sub_sub in range(width)])
+            for sub in range(width)]) for top in range(width)]
+    }
+
+
+@pytest.mark.parametrize("width", [2, 6])
+def test_import_new_categories(client, max_statements, width):
+    """The statements an import takes depend on the depth of the category tree, not how many categories it has."""
+    # Left uncommitted, so everything imported is rolled back when the request's session is removed
+    with patch.object(db.session, 'commit'), max_statements(20):
+        response = client.post('/v1.0/maintain/reference-data/import', data=json.dumps(import_document(width)),
+                               headers=dict(HEADERS, **{'Content-Type': 'application/json'}))
+    assert response.status_code == 200
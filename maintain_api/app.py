@@ -1,39 +1,86 @@
 from flask import Flask, g, request
 import uuid
-import requests
+import time
 from jwt_validation.validate import validate
 from maintain_api.exceptions import ApplicationError
+from maintain_api.extensions import http_client
+from maintain_api.dependencies.authentication_api.authentication_api_service import AuthenticationApiService
+from maintain_api.utilities.authentication import authorization_cache_key, get_token, get_token_expiry, \
+    LocalTokenVerifier
+from maintain_api.utilities.cache import LruCache
+from maintain_api.utilities.metrics import request_duration, request_count
+from maintain_api.utilities.query_stats import start_query_stats
+from maintain_api.utilities.server_timing import start_server_timing, record_phase, server_timing_header
 from jwt_validation.exceptions import ValidationFailure
 
 app = Flask(__name__)
 
 app.config.from_pyfile("config.py")
 
+# Authorization headers that authentication-api has already accepted, so repeat calls skip the validate round trip.
+jwt_cache = LruCache(app.config['JWT_CACHE_MAX_SIZE'], app.config['JWT_CACHE_TTL_SECONDS'])
+
+# Optionally verify JWT signatures locally, so authentication-api is only called when that is inconclusive.
+if app.config['JWT_LOCAL_VERIFICATION']:
+    token_verifier = LocalTokenVerifier(AuthenticationApiService.get_signing_keys,
+                                        app.config['JWT_SIGNING_KEYS_REFRESH_SECONDS'])
+else:
+    token_verifier = None
+
 
 @app.before_request
 def before_request():
+    # Timed from here, so the JWT checks below count towards the request's duration
+    g.request_start = time.perf_counter()
+    start_query_stats()
+    if app.config['SERVER_TIMING']:
+        start_server_timing()
+
     # Sets the transaction trace id into the global object if it has been provided in the HTTP header from the caller.
     # Generate a new one if it has not. We will use this in log messages.
     g.trace_id = request.headers.get('X-Trace-ID', uuid.uuid4().hex)
-    # We also create a session-level requests object for the app to use with the header pre-set, so other APIs will
-    # receive it. These lines can be removed if the app will not make requests to other LR APIs!
-    g.requests = requests.Session()
-    g.requests.headers.update({'X-Trace-ID': g.trace_id})
+    # We also create a request-level requests object for the app to use with the header pre-set, so other APIs will
+    # receive it. It shares the process-wide connection pools, so calls to other LR APIs reuse warm connections.
+    g.requests = http_client.for_request({'X-Trace-ID': g.trace_id})
 
-    # Don't check for a JWT on health endpoints
-    if '/health' in request.path:
+    # Don't check for a JWT on health or metrics endpoints
+    if is_monitoring_request():
         return
 
     if 'Authorization' not in request.headers:
         raise ApplicationError("Missing Authorization header", "AUTH1", 401)
 
+    authorization = request.headers['Authorization']
+    auth_start = time.perf_counter()
     try:
-        validate(app.config['AUTHENTICATION_API_URL'] + '/authentication/validate',
-                 request.headers['Authorization'], g.requests)
-    except ValidationFailure as fail:
-        raise ApplicationError(fail.message, "AUTH1", 401)
+        check_authorization(authorization)
+    finally:
+        record_phase('auth', time.perf_counter() - auth_start)
+
+    g.requests.headers.update({'Authorization': authorization})
+
 
-    g.requests.headers.update({'Authorization': request.headers['Authorization']})
+def is_monitoring_request():
+    """Whether the current request is for a health or metrics endpoint, which are polled rather than used."""
+    return '/health' in request.path or request.path == '/metrics'
+
+
+def check_authorization(authorization):
+    """Raises an ApplicationError unless the Authorization header holds a valid JWT."""
+    cache_key = authorization_cache_key(authorization)
+
+    if jwt_cache.get(cache_key) is None:
+        if token_verifier is None or not token_verifier.verify(get_token(authorization)):
+            try:
+                validate(app.config['AUTHENTICATION_API_URL'] + '/authentication/validate', authorization,
+                         g.requests)
+            except ValidationFailure as fail:
+                raise ApplicationError(fail.message, "AUTH1", 401)
+
+        # Only tokens with an expiry are cached, so a cached validation can never outlive the token itself
+        expiry = get_token_expiry(authorization)
+        if expiry is not None:
+            jwt_cache.set(cache_key, True, expiry - time.time())
 
 
 @app.after_request
@@ -42,4 +89,19 @@ def after_request(response):
     # API manual. A major version update will need to go in the URL. All changes should be documented though, for
     # reusing teams to take advantage of.
     response.headers["X-API-Version"] = "1.0.0"
+
+    # Unmatched URLs have no endpoint, and are counted together so they can't add a series per URL
+    endpoint = request.endpoint or 'none'
+    if 'request_start' in g:
+        duration = time.perf_counter() - g.request_start
+        request_duration.observe((endpoint, request.method), duration)
+        if 'server_timing' in g:
+            # A streamed body is still to be written, so its time isn't included
+            response.headers['Server-Timing'] = server_timing_header(duration)
+        # The formatter adds the request's database statement count and time to the log line. Health checks and
+        # metrics scrapes are left out, as they would drown out everything else.
+        if not is_monitoring_request():
+            app.logger.info("Request complete - status %s in %.1fms", response.status_code, duration * 1000,
+                            extra={'query_stats': g.query_stats})
+    request_count.inc((endpoint, request.method, response.status_code))
     return response
@@ -5,6 +5,8 @@ from maintain_api.views.v1_0 import add_land_charge as add_land_charge_v1_0
 from maintain_api.views.v1_0 import update_land_charge as update_land_charge_v1_0
 from maintain_api.views.v1_0 import categories as categories_v1_0
 from maintain_api.views.v1_0 import instruments as instruments_v1_0
+from maintain_api.views.v1_0 import reference_data_import as reference_data_import_v1_0
+from maintain_api.views.v1_0 import reference_data_export as reference_data_export_v1_0
 
 
 def register_blueprints(app):
@@ -15,6 +17,8 @@ def register_blueprints(app):
     app.register_blueprint(statutory_provision_v1_0.statutory_provision_bp, url_prefix='/v1.0/maintain')
     app.register_blueprint(categories_v1_0.categories)
     app.register_blueprint(instruments_v1_0.instruments_bp)
+    app.register_blueprint(reference_data_import_v1_0.reference_data_import_bp)
+    app.register_blueprint(reference_data_export_v1_0.reference_data_export_bp)
 
     # All done!
     app.logger.info("Blueprints registered")
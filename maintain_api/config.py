@@ -10,6 +10,19 @@ from urllib.parse import quote_plus
 
 # For logging
 FLASK_LOG_LEVEL = os.environ['LOG_LEVEL']
+# Log records are written out by a background thread from a queue holding at most this many. When it is full a record
+# waits this long for room before being dropped (0 drops it straight away, 'none' waits as long as it takes, so never
+# drops). Audit records have their own queue, and should never be dropped.
+LOG_QUEUE_SIZE = int(os.environ['LOG_QUEUE_SIZE'])
+LOG_QUEUE_BLOCK_SECONDS = float(os.environ['LOG_QUEUE_BLOCK_SECONDS'])
+AUDIT_LOG_QUEUE_BLOCK_SECONDS = None if os.environ['AUDIT_LOG_QUEUE_BLOCK_SECONDS'] == 'none' \
+    else float(os.environ['AUDIT_LOG_QUEUE_BLOCK_SECONDS'])
+
+# When set to 'yes', responses carry a Server-Timing header breaking down where the request's time was spent
+SERVER_TIMING = os.environ['SERVER_TIMING'] == 'yes'
+# Each worker process keeps its /metrics values in a file in this directory, so any of them can serve the totals of all
+# of them. It must be shared by every worker of an instance, and by nothing else.
+METRICS_DIRECTORY = os.environ['METRICS_DIRECTORY']
 
 # For health route
 COMMIT = os.environ['COMMIT']
@@ -29,6 +42,25 @@ SEARCH_API_URL = os.environ['SEARCH_API_URL']
 AUTHENTICATION_API_URL = os.environ['AUTHENTICATION_API_URL']
 AUTHENTICATION_API_BASE_URL = os.environ['AUTHENTICATION_API_BASE_URL']
 
+# Outbound HTTP calls share a pool of keep-alive connections per dependency (see dependencies/http_client.py)
+HTTP_POOL_SIZES = {
+    MINT_API_URL_ROOT: int(os.environ['MINT_API_POOL_SIZE']),
+    SEARCH_API_URL: int(os.environ['SEARCH_API_POOL_SIZE']),
+    AUTHENTICATION_API_BASE_URL: int(os.environ['AUTHENTICATION_API_POOL_SIZE'])
+}
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.environ['HTTP_CONNECT_TIMEOUT_SECONDS'])
+HTTP_READ_TIMEOUT_SECONDS = float(os.environ['HTTP_READ_TIMEOUT_SECONDS'])
+
+# Successful JWT validations are cached (keyed by a hash of the Authorization header) until the token's exp claim or
+# this TTL, whichever comes first. A max size of 0 turns the cache off.
+JWT_CACHE_MAX_SIZE = int(os.environ['JWT_CACHE_MAX_SIZE'])
+JWT_CACHE_TTL_SECONDS = int(os.environ['JWT_CACHE_TTL_SECONDS'])
+# When set to 'yes', JWT signatures are verified locally against authentication-api's signing keys, only falling back
+# to the validate endpoint if local verification is inconclusive (e.g. an unknown key id).
+JWT_LOCAL_VERIFICATION = os.environ['JWT_LOCAL_VERIFICATION'] == 'yes'
+# Minimum time between refreshes of the signing keys, which are refetched when a token has an unknown key id
+JWT_SIGNING_KEYS_REFRESH_SECONDS = int(os.environ['JWT_SIGNING_KEYS_REFRESH_SECONDS'])
+
 
 # --- Database variables start
 # These must all be set in the OS environment.
@@ -47,11 +79,29 @@ SQLALCHEMY_DATABASE_URI = 'postgres://{0}:{1}@{2}/{3}'.format(
     FINAL_SQL_USERNAME, quote_plus(SQL_PASSWORD), SQL_HOST, SQL_DATABASE)
 SQLALCHEMY_TRACK_MODIFICATIONS = False  # Explicitly set this in order to remove warning on run
 SQLALCHEMY_POOL_RECYCLE = int(os.environ['SQLALCHEMY_POOL_RECYCLE'])
+# Database statements taking longer than this are logged as a warning, along with the trace id of their request
+SLOW_STATEMENT_SECONDS = float(os.environ['SLOW_STATEMENT_SECONDS'])
 # --- Database variables end
 
-STATUTORY_PROVISION_CACHE_TIMEOUT_MINUTES = os.environ['STATUTORY_PROVISION_CACHE_TIMEOUT_MINUTES']
+STATUTORY_PROVISION_CACHE_TIMEOUT_MINUTES = int(os.environ['STATUTORY_PROVISION_CACHE_TIMEOUT_MINUTES'])
+# Encoded reference data (category, provision and instrument) lists are rebuilt whenever a write is committed, and are
+# also dropped after this long even if unchanged
+REFERENCE_DATA_CACHE_TIMEOUT_MINUTES = int(os.environ['REFERENCE_DATA_CACHE_TIMEOUT_MINUTES'])
+# Also keep a gzipped copy of encoded reference data lists, for callers that accept gzip
+REFERENCE_DATA_GZIP = os.environ['REFERENCE_DATA_GZIP'] == 'yes'
 
 MAX_HEALTH_CASCADE = os.environ['MAX_HEALTH_CASCADE']
+# Cascade probes run concurrently on a pool of this many threads, shared by all cascade requests
+HEALTH_CASCADE_MAX_WORKERS = int(os.environ['HEALTH_CASCADE_MAX_WORKERS'])
+# Time allowed for a single probe: the database probe's pool checkout and statement, and connecting to a service. A
+# cascade of depth n waits at most (n + 1) times this, so each level down the cascade has a smaller budget than its
+# caller and answers before the caller gives up on it.
+HEALTH_CASCADE_PROBE_TIMEOUT_SECONDS = float(os.environ['HEALTH_CASCADE_PROBE_TIMEOUT_SECONDS'])
+# Healthy cascade results are reused for this long (0 turns caching off; concurrent callers still share one run of
+# the probes). Unhealthy ones are reused for the shorter HEALTH_CASCADE_UNHEALTHY_CACHE_SECONDS, so recovery is seen
+# soon, but polling during an outage still doesn't run every probe on every poll.
+HEALTH_CASCADE_CACHE_SECONDS = float(os.environ['HEALTH_CASCADE_CACHE_SECONDS'])
+HEALTH_CASCADE_UNHEALTHY_CACHE_SECONDS = float(os.environ['HEALTH_CASCADE_UNHEALTHY_CACHE_SECONDS'])
 DEPENDENCIES = {
     "postgres": SQLALCHEMY_DATABASE_URI,
     "mint-api": MINT_API_URL_ROOT,
@@ -77,16 +127,20 @@ LOGCONFIG = {
     },
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler',
+            'class': 'maintain_api.extensions.QueueStreamHandler',
             'formatter': 'simple',
             'filters': ['contextual'],
-            'stream': 'ext://sys.stdout'
+            'stream': 'ext://sys.stdout',
+            'capacity': LOG_QUEUE_SIZE,
+            'block_seconds': LOG_QUEUE_BLOCK_SECONDS
         },
         'audit_console': {
-            'class': 'logging.StreamHandler',
+            'class': 'maintain_api.extensions.QueueStreamHandler',
             'formatter': 'audit',
             'filters': ['contextual'],
-            'stream': 'ext://sys.stdout'
+            'stream': 'ext://sys.stdout',
+            'capacity': LOG_QUEUE_SIZE,
+            'block_seconds': AUDIT_LOG_QUEUE_BLOCK_SECONDS
         }
     },
     'loggers': {
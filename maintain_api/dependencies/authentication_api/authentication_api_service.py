@@ -0,0 +1,19 @@
+import logging
+from maintain_api.config import AUTHENTICATION_API_URL
+from maintain_api.extensions import http_client
+
+# Called from a background thread outside of any request, so current_app.logger and g.requests are not available
+logger = logging.getLogger(__name__)
+
+
+class AuthenticationApiService(object):
+    """Service class for making requests to authentication-api"""
+
+    @staticmethod
+    def get_signing_keys():
+        """Returns the JSON Web Keys authentication-api signs its tokens with."""
+        url = "{}/authentication/keys".format(AUTHENTICATION_API_URL)
+        logger.info("Fetching signing keys via this URL: %s", url)
+        response = http_client.for_request().get(url)
+        response.raise_for_status()
+        return response.json()['keys']
@@ -0,0 +1,91 @@
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+import requests
+import time
+from maintain_api.utilities.metrics import observe_dependency
+
+
+class PooledHttpClient(object):
+    """Process-wide requests session, keeping a pool of keep-alive connections to each dependency.
+
+    The session itself is never modified once the app is set up, so it can be shared by every request thread. Use
+    for_request to get a client carrying headers (X-Trace-ID, Authorization) for just the current request.
+    """
+
+    def __init__(self):
+        self.session = None
+        self.timeout = None
+        self.dependencies = None
+
+    def init_app(self, app):
+        session = requests.Session()
+        # Cookies set by one caller's downstream call must never be sent on behalf of another caller
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        for url, pool_size in app.config['HTTP_POOL_SIZES'].items():
+            session.mount(url.rstrip('/') + '/', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+        self.timeout = (app.config['HTTP_CONNECT_TIMEOUT_SECONDS'], app.config['HTTP_READ_TIMEOUT_SECONDS'])
+        # URL prefixes of the APIs we call, longest first, so calls can be timed against the dependency they go to
+        self.dependencies = sorted(((url.rstrip('/') + '/', name) for name, url in app.config['DEPENDENCIES'].items()
+                                    if url.startswith('http')), reverse=True)
+        self.session = session
+
+    def for_request(self, headers=None):
+        """Returns a client that sends the given headers on every call, using the shared connection pools."""
+        return RequestHttpClient(self.session, self.timeout, headers, self.dependencies)
+
+
+class RequestHttpClient(object):
+    """Overlays per-request headers and default timeouts onto the shared session.
+
+    Offers the same request methods as requests.Session, so it can be used anywhere a session was used before. Every
+    call is timed under the name of the dependency its URL belongs to (see observe_dependency).
+    """
+
+    def __init__(self, session, timeout, headers=None, dependencies=None):
+        self.session = session
+        self.timeout = timeout
+        self.headers = CaseInsensitiveDict(headers)
+        self.dependencies = dependencies or []
+
+    def request(self, method, url, **kwargs):
+        headers = self.headers.copy()
+        headers.update(kwargs.pop('headers', None) or {})
+        kwargs.setdefault('timeout', self.timeout)
+        start = time.perf_counter()
+        try:
+            return self.session.request(method, url, headers=headers, **kwargs)
+        finally:
+            observe_dependency(self.dependency(url), time.perf_counter() - start)
+
+    def dependency(self, url):
+        """Returns the name of the dependency the URL belongs to, or 'other' for one not in DEPENDENCIES."""
+        for prefix, name in self.dependencies:
+            if url.startswith(prefix) or url == prefix[:-1]:
+                return name
+        return 'other'
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault('allow_redirects', True)
+        return self.request('GET', url, **kwargs)
+
+    def options(self, url, **kwargs):
+        kwargs.setdefault('allow_redirects', True)
+        return self.request('OPTIONS', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        kwargs.setdefault('allow_redirects', False)
+        return self.request('HEAD', url, **kwargs)
+
+    def post(self, url, data=None, json=None, **kwargs):
+        return self.request('POST', url, data=data, json=json, **kwargs)
+
+    def put(self, url, data=None, **kwargs):
+        return self.request('PUT', url, data=data, **kwargs)
+
+    def patch(self, url, data=None, **kwargs):
+        return self.request('PATCH', url, data=data, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
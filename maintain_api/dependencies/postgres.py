@@ -1,25 +1,89 @@
+from concurrent.futures import Future, TimeoutError
 from flask import current_app
+from sqlalchemy import exc
 import psycopg2
+import threading
+import time
 from maintain_api.exceptions import ApplicationError
+from maintain_api.extensions import db
 
 
-def get_current_timestamp():
-    cur = None
-    conn = None
+def select_current_timestamp():
+    """Returns the database's current timestamp, and how long it took to get a connection from the pool.
+
+    Uses a pooled connection rather than opening a new one, so health checks don't churn postgres backends.
+    """
     try:
-        conn = psycopg2.connect(current_app.config['SQLALCHEMY_DATABASE_URI'])
-        cur = conn.cursor()
-        cur.execute("SELECT CURRENT_TIMESTAMP;")
-        result = cur.fetchone()
-        return result[0]
-    except psycopg2.DataError as e:
-        raise ApplicationError(
-            'Input data error: ' + str(e), 'DB', http_code=400)
-    except (psycopg2.OperationalError, psycopg2.ProgrammingError) as e:
-        raise ApplicationError(
-            'Database error: ' + str(e), 'DB', http_code=400)
+        try:
+            return query_current_timestamp()
+        except exc.DBAPIError as e:
+            # Pool pre-ping: if the pooled connection had gone stale it has now been invalidated (along with the rest
+            # of the pool), so a single retry will be given a fresh connection
+            if not e.connection_invalidated:
+                raise
+            return query_current_timestamp()
+    except exc.DBAPIError as e:
+        if isinstance(e.orig, psycopg2.DataError):
+            raise ApplicationError(
+                'Input data error: ' + str(e.orig), 'DB', http_code=400)
+        if isinstance(e.orig, (psycopg2.OperationalError, psycopg2.ProgrammingError)):
+            raise ApplicationError(
+                'Database error: ' + str(e.orig), 'DB', http_code=400)
+        raise
+
+
+def query_current_timestamp():
+    timeout = current_app.config['HEALTH_CASCADE_PROBE_TIMEOUT_SECONDS']
+    start = time.monotonic()
+    conn = checkout(db.engine, timeout)
+    checkout_seconds = time.monotonic() - start
+    try:
+        trans = conn.begin()
+        # Don't let a struggling database hold the probe (and the pooled connection) beyond its own timeout
+        conn.execute("SET LOCAL statement_timeout = {:d}".format(int(timeout * 1000)))
+        result = conn.execute("SELECT CURRENT_TIMESTAMP;").scalar()
+        trans.rollback()
+        return result, checkout_seconds
     finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
+        conn.close()
+
+
+def checkout(engine, timeout):
+    """Gets a connection from the engine's pool, waiting at most timeout seconds for one.
+
+    The pool's own checkout timeout is sized for requests, which can afford to queue for a connection; a probe of a
+    saturated pool should report it rather than queue behind it. A connection that turns up after the probe has given
+    up is handed straight back to the pool.
+    """
+    connection = Future()
+
+    def connect():
+        try:
+            connection.set_result(engine.connect())
+        except Exception as e:
+            connection.set_exception(e)
+
+    threading.Thread(target=connect, daemon=True).start()
+    try:
+        return connection.result(timeout)
+    except TimeoutError:
+        connection.add_done_callback(release_late_connection)
+        raise ApplicationError(
+            'Database error: no pooled connection within {} seconds'.format(timeout), 'DB', http_code=400)
+
+
+def release_late_connection(connection):
+    if connection.exception() is None:
+        connection.result().close()
+
+
+def get_pool_status():
+    """Returns the current state of the app's connection pool, for spotting pool saturation."""
+    pool = db.engine.pool
+    status = {}
+    for name, counter in [("size", "size"), ("checked_out", "checkedout"), ("overflow", "overflow"),
+                          ("idle", "checkedin")]:
+        # Only queue pools keep these counters
+        if hasattr(pool, counter):
+            status[name] = getattr(pool, counter)()
+    return status
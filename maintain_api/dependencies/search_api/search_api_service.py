@@ -7,7 +7,6 @@ class SearchApiService(object):
 
     @staticmethod
     def get_by_charge_number(charge_number):
-        current_app.logger.info("Method called")
         url = "{}/search/local_land_charges/{}".format(SEARCH_API_URL, charge_number)
         current_app.logger.info("Calling search api via this URL: %s", url)
         return g.requests.get(url)
@@ -1,10 +1,17 @@
 from flask_logconfig import LogConfig
 from flask_sqlalchemy import SQLAlchemy
+from maintain_api.dependencies.http_client import PooledHttpClient
+from maintain_api.utilities.query_stats import QueryInstrument
 import logging
+import logging.handlers
 import json
+from json.encoder import encode_basestring_ascii
 import traceback
 from flask import g, ctx, request
-import collections
+import copy
+import os
+import queue
+import time
 
 # Add custom log level for performance platform logs
 PERFORMANCE_PLATFORM_LOG_LEVEL_NUM = 51
@@ -20,6 +27,8 @@ logging.Logger.performance_platform = performance_platform
 # Create empty extension objects here
 logger = LogConfig()
 db = SQLAlchemy()
+http_client = PooledHttpClient()
+query_instrument = QueryInstrument()
 
 
 def register_extensions(app):
@@ -33,6 +42,11 @@ def register_extensions(app):
 
     # Database
     db.init_app(app)
+    # Per-request statement counts and timings, and slow statement logging
+    query_instrument.init_app(app)
+
+    # Connection pools for calls to other APIs, shared by every request
+    http_client.init_app(app)
 
     # All done!
     app.logger.info("Extensions registered")
@@ -42,43 +56,160 @@ class ContextualFilter(logging.Filter):
     def filter(self, log_record):
         """Provide some extra variables to be placed into the log message"""
 
-        # If we have an app context (because we're servicing an http request) then get the trace id we have
-        # set in g (see app.py)
-        if ctx.has_app_context():
+        # If we have a request context (because we're servicing an http request) then get the trace id we have
+        # set in g (see app.py). The request details are kept as attributes, and only put into the message by the
+        # formatter (see record_message).
+        if ctx.has_request_context():
             log_record.trace_id = g.trace_id
-            log_record.msg = "Endpoint: {}, Method: {}, Caller: {}.{}[{}], {}".format(
-                request.endpoint, request.method, log_record.module, log_record.funcName, log_record.lineno,
-                log_record.msg)
+            log_record.endpoint = request.endpoint
+            log_record.method = request.method
         else:
             log_record.trace_id = 'N/A'
         return True
 
 
-class JsonFormatter(logging.Formatter):
+def record_message(record):
+    """Returns the record's message with its arguments filled in, prefixed with the request details and caller when
+    ContextualFilter found a request."""
+    message = record.getMessage()
+    if hasattr(record, 'endpoint'):
+        message = "Endpoint: {}, Method: {}, Caller: {}.{}[{}], {}".format(
+            record.endpoint, record.method, record.module, record.funcName, record.lineno, message)
+    return message
+
+
+class JsonLineFormatter(logging.Formatter):
+    """Base for the JSON log formatters.
+
+    Every line has the same keys in the same order, so the values are written straight into a template rather than
+    building a dict for json.dumps. The output is byte for byte what json.dumps gave for the same dict.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The second the date and time part of the last timestamp was for, and its text
+        self._second = (None, None)
+
+    def formatTime(self, record, datefmt=None):
+        """Same as logging.Formatter.formatTime, reusing the date and time part for records in the same second."""
+        if datefmt or self.datefmt:
+            return super().formatTime(record, datefmt)
+
+        second, text = self._second
+        if second != int(record.created):
+            text = time.strftime(self.default_time_format, self.converter(record.created))
+            self._second = (int(record.created), text)
+        return self.default_msec_format % (text, record.msecs)
+
+
+def json_value(value):
+    # Strings, which nearly every value is, go straight to the encoder json.dumps would use
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    return json.dumps(value)
+
+
+class JsonFormatter(JsonLineFormatter):
     def format(self, record):
         if record.exc_info:
-            exc = traceback.format_exception(*record.exc_info)
+            exc = json.dumps(traceback.format_exception(*record.exc_info))
         else:
-            exc = None
+            exc = 'null'
 
-        # Timestamp must be first (webops request)
-        log_entry = collections.OrderedDict(
-            [('timestamp', self.formatTime(record)),
-             ('level', record.levelname),
-             ('traceid', record.trace_id),
-             ('message', record.msg % record.args),
-             ('exception', exc)])
+        # Request end lines also give the request's database statement count and time
+        query_stats = getattr(record, 'query_stats', None)
+        if query_stats is not None:
+            extra = ', "db_statements": %d, "db_time_ms": %s' % (
+                query_stats.statements, json_value(round(query_stats.seconds * 1000, 3)))
+        else:
+            extra = ''
 
-        return json.dumps(log_entry)
+        # Timestamp must be first (webops request)
+        return '{"timestamp": %s, "level": %s, "traceid": %s, "message": %s, "exception": %s%s}' % (
+            json_value(self.formatTime(record)), json_value(record.levelname), json_value(record.trace_id),
+            json_value(record_message(record)), exc, extra)
 
 
-class JsonAuditFormatter(logging.Formatter):
+class JsonAuditFormatter(JsonLineFormatter):
     def format(self, record):
         # Timestamp must be first (webops request)
-        log_entry = collections.OrderedDict(
-            [('timestamp', self.formatTime(record)),
-             ('level', 'AUDIT'),
-             ('traceid', record.trace_id),
-             ('message', record.msg % record.args)])
-
-        return json.dumps(log_entry)
+        return '{"timestamp": %s, "level": "AUDIT", "traceid": %s, "message": %s}' % (
+            json_value(self.formatTime(record)), json_value(record.trace_id), json_value(record_message(record)))
+
+
+class QueueStreamHandler(logging.handlers.QueueHandler):
+    """Writes log records to a stream from a background thread, so a slow log collector can't hold up a request.
+
+    Records are filtered and formatted on the thread that logs them, while the request context is still there, then
+    put on a queue holding at most capacity records. When the queue is full a record waits up to block_seconds for
+    room, then is dropped, or waits for as long as it takes if block_seconds is None. Dropped records are counted in
+    dropped, and a warning saying how many were lost is written once there is room again.
+
+    The writer thread is started by the first record logged in each process, so forked workers get their own.
+    """
+
+    def __init__(self, stream=None, capacity=10000, block_seconds=0):
+        super().__init__(queue.Queue(capacity))
+        self.stream = stream
+        self.capacity = capacity
+        self.block_seconds = block_seconds
+        self.dropped = 0
+        self._unreported = 0
+        self._pid = None
+        self._listener = None
+
+    def prepare(self, record):
+        # Format a copy, the record may be passed on to other handlers
+        return super().prepare(copy.copy(record))
+
+    def enqueue(self, record):
+        # Handler.handle holds self.lock while this runs, so only one thread is ever in here at a time
+        if self._pid != os.getpid():
+            self._start()
+
+        if self._unreported:
+            warning = logging.makeLogRecord({
+                "name": self.name, "levelno": logging.WARNING, "levelname": logging.getLevelName(logging.WARNING),
+                "msg": "Dropped %d log records, the log queue was full", "args": (self._unreported,),
+                "trace_id": "N/A"})
+            try:
+                self.queue.put_nowait(self.prepare(warning))
+                self._unreported = 0
+            except queue.Full:
+                pass
+
+        try:
+            if self.block_seconds is None:
+                self.queue.put(record)
+            elif self.block_seconds > 0:
+                self.queue.put(record, timeout=self.block_seconds)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+
+    def _start(self):
+        # A forked process has a copy of the queue, but not the thread reading it
+        self.queue = queue.Queue(self.capacity)
+        self._listener = BlockingStopQueueListener(self.queue, logging.StreamHandler(self.stream))
+        self._listener.start()
+        self._pid = os.getpid()
+
+    def close(self):
+        """Stops the writer thread once it has written out every queued record."""
+        self.acquire()
+        try:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+            self._pid = None
+        finally:
+            self.release()
+        super().close()
+
+
+class BlockingStopQueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room rather than failing to stop when the queue is full
+        self.queue.put(self._sentinel)
@@ -10,9 +10,18 @@ class Categories(db.Model):
     parent_id = db.Column('parent_id', db.Integer(), db.ForeignKey('charge_categories.id'), nullable=True)
     display_order = db.Column('display_order', db.Integer(), nullable=True)
     permission = db.Column('permission', db.String(), nullable=True)
-    children = db.relationship("Categories", lazy="joined", order_by="asc(Categories.display_order)", join_depth=2)
-    provisions = db.relationship("CategoryStatProvisionMapping", lazy="joined", back_populates="category")
-    instruments = db.relationship("CategoryInstrumentsMapping", lazy="joined", back_populates="category")
+    # Loaded only when used. Category reads come from the category tree snapshot, and most writes only look up a
+    # category's id, so eager loading would join in every descendant and mapping row for nothing.
+    children = db.relationship("Categories", lazy="select", order_by="asc(Categories.display_order)")
+    provisions = db.relationship("CategoryStatProvisionMapping", lazy="select", back_populates="category")
+    instruments = db.relationship("CategoryInstrumentsMapping", lazy="select", back_populates="category")
+    # Names are looked up ignoring case, and are unique ignoring case among categories with the same parent. Top level
+    # categories have no parent, and nulls never clash in a unique index, so they need an index of their own.
+    __table_args__ = (
+        db.Index('ix_charge_categories_lower_name_top_level', db.func.lower(name), unique=True,
+                 postgresql_where=parent_id.is_(None)),
+        db.Index('ix_charge_categories_parent_id_lower_name', parent_id, db.func.lower(name), unique=True),
+    )
 
     def __init__(self, name, parent_id, display_order, permission, display_name):
         self.name = name
@@ -28,6 +37,8 @@ class Instruments(db.Model):
     id = db.Column('id', db.Integer(), primary_key=True, autoincrement=True)
     name = db.Column('name', db.String(), nullable=False)
     categories = db.relationship("CategoryInstrumentsMapping", back_populates="instrument")
+    # Names are looked up, and unique, ignoring case
+    __table_args__ = (db.Index('ix_instruments_lower_name', db.func.lower(name), unique=True),)
 
     def __init__(self, name):
         self.name = name
@@ -40,6 +51,8 @@ class StatutoryProvision(db.Model):
     title = db.Column(db.String, nullable=False)
     selectable = db.Column(db.Boolean, nullable=False, server_default='t')
     categories = db.relationship("CategoryStatProvisionMapping", back_populates="provision")
+    # Titles are looked up, and unique, ignoring case
+    __table_args__ = (db.Index('ix_statutory_provision_lower_title', db.func.lower(title), unique=True),)
 
     def __init__(self, title, selectable=True):
         self.title = title
@@ -73,3 +86,19 @@ class CategoryInstrumentsMapping(db.Model):
     def __init__(self, category_id, instruments_id):
         self.category_id = category_id
         self.instruments_id = instruments_id
+
+
+class ReferenceDataVersion(db.Model):
+    """A version number for one of the reference data tables, bumped in the same transaction as every write to it.
+
+    Every process caches reference data against these versions, so they are how a write made through one process
+    reaches the caches of all the others.
+    """
+    __tablename__ = 'reference_data_versions'
+
+    table_name = db.Column('table_name', db.String(), primary_key=True)
+    version = db.Column('version', db.BigInteger(), nullable=False, server_default='0')
+
+    def __init__(self, table_name, version):
+        self.table_name = table_name
+        self.version = version
@@ -0,0 +1,115 @@
+from jwt.algorithms import RSAAlgorithm
+from maintain_api.exceptions import ApplicationError
+import base64
+import hashlib
+import json
+import jwt
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def authorization_cache_key(authorization):
+    """Returns a SHA-256 digest of the given Authorization header, so raw tokens are never held as cache keys."""
+    return hashlib.sha256(authorization.encode('utf-8')).hexdigest()
+
+
+def get_token(authorization):
+    """Returns the JWT from the given Authorization header, removing the 'Bearer' scheme if present."""
+    parts = authorization.split()
+    if len(parts) == 2 and parts[0].lower() == 'bearer':
+        return parts[1]
+    return authorization.strip()
+
+
+def get_token_expiry(authorization):
+    """Returns the exp claim (seconds since the epoch) of the JWT in the given Authorization header.
+
+    Returns None if the header does not hold a JWT with a numeric exp claim. The token's signature is NOT checked,
+    so the result must only be trusted for a token that has already been validated.
+    """
+    try:
+        payload = get_token(authorization).split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload.encode('ascii')).decode('utf-8'))
+        expiry = claims.get('exp')
+    except (IndexError, ValueError, AttributeError):
+        return None
+
+    if isinstance(expiry, bool) or not isinstance(expiry, (int, float)):
+        return None
+    return expiry
+
+
+class LocalTokenVerifier(object):
+    """Verifies JWT signatures locally, against the RSA signing keys of authentication-api.
+
+    Keys are fetched with the given fetch_keys callable in a background thread, the first time they are needed and
+    again whenever a token has a key id we don't know (at most once every refresh_interval_seconds).
+    """
+
+    ALGORITHMS = ['RS256', 'RS384', 'RS512']
+
+    def __init__(self, fetch_keys, refresh_interval_seconds):
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self._fetch_keys = fetch_keys
+        self._keys = {}
+        self._last_refresh = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def verify(self, token):
+        """Returns True if the token's signature was verified, or False if verification was inconclusive.
+
+        Inconclusive tokens (not a JWT, unknown key id, unsupported claims) should be validated by authentication-api
+        instead. Throws ApplicationError if the token is definitely invalid, i.e. expired or wrongly signed.
+        """
+        try:
+            key_id = jwt.get_unverified_header(token).get('kid')
+        except jwt.InvalidTokenError:
+            return False
+
+        key = self._keys.get(key_id)
+        if key is None:
+            self.refresh()
+            return False
+
+        try:
+            jwt.decode(token, key, algorithms=self.ALGORITHMS, options={'verify_aud': False})
+        except jwt.ExpiredSignatureError:
+            raise ApplicationError("Token has expired", "AUTH1", 401)
+        except jwt.InvalidSignatureError:
+            raise ApplicationError("Token signature is invalid", "AUTH1", 401)
+        except jwt.InvalidTokenError:
+            return False
+        return True
+
+    def refresh(self):
+        """Reloads the signing keys in a background thread, unless a refresh is running or ran too recently."""
+        with self._lock:
+            now = time.monotonic()
+            if self._refreshing or \
+                    (self._last_refresh is not None and now - self._last_refresh < self.refresh_interval_seconds):
+                return
+            self._refreshing = True
+            self._last_refresh = now
+
+        thread = threading.Thread(target=self.load_keys, name='signing-key-refresh')
+        thread.daemon = True
+        thread.start()
+
+    def load_keys(self):
+        """Fetches the signing keys and swaps them in, keeping the current keys if the fetch fails."""
+        try:
+            keys = {}
+            for jwk in self._fetch_keys():
+                if jwk.get('kty') == 'RSA' and 'kid' in jwk:
+                    keys[jwk['kid']] = RSAAlgorithm.from_jwk(json.dumps(jwk))
+            self._keys = keys
+            logger.info("Loaded %s signing keys", len(keys))
+        except Exception as e:
+            logger.warning("Failed to load signing keys: %s", repr(e))
+        finally:
+            self._refreshing = False
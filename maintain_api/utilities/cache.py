@@ -0,0 +1,58 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class LruCache(object):
+    """Thread-safe, size-bounded cache with least-recently-used eviction and a time-to-live on every entry.
+
+    A max_size of 0 disables the cache, so every get will miss. None can not be cached as it is used to signal a miss.
+    """
+
+    def __init__(self, max_size, ttl_seconds):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Returns the value cached against key, or None if there isn't one or it has expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, ttl_seconds=None):
+        """Caches value against key, evicting the least recently used entry if the cache is full.
+
+        ttl_seconds can be used to expire the entry sooner than the cache's own time-to-live, but never later.
+        """
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        if self.max_size <= 0 or ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """Removes the entry for key, or every entry if no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
@@ -0,0 +1,166 @@
+from maintain_api.extensions import db
+from maintain_api.models import Categories, CategoryInstrumentsMapping, CategoryStatProvisionMapping, Instruments, \
+    StatutoryProvision
+from maintain_api.utilities.reference_data import table_versions, EncodedBody, CATEGORIES_TABLE, INSTRUMENTS_TABLE, \
+    PROVISIONS_TABLE
+import threading
+
+# The tables a snapshot is built from, so the tables whose versions it is keyed by
+CATEGORY_TREE_TABLES = (CATEGORIES_TABLE, PROVISIONS_TABLE, INSTRUMENTS_TABLE)
+
+
+class CategoryTree(object):
+    """Snapshot of every category, with provision titles and instrument names already resolved.
+
+    The results are built up front in the shape the category endpoints return, so serving a read is a dictionary
+    lookup. A snapshot is never changed once built - the dictionaries it returns are shared and must not be modified.
+    Encoded single category bodies are kept with it, so they are thrown away along with it once it is replaced.
+
+    rows are (id, name, display_name, parent_id, display_order, permission) tuples, provisions are (category_id,
+    title) tuples and instruments are (category_id, name) tuples.
+    """
+
+    def __init__(self, version, rows, provisions, instruments):
+        self.version = version
+
+        titles = {}
+        for category_id, title in provisions:
+            titles.setdefault(category_id, []).append(title)
+        names = {}
+        for category_id, name in instruments:
+            names.setdefault(category_id, []).append(name)
+
+        # Children in display order, nulls last to match postgres
+        rows = sorted(rows, key=lambda row: (row[4] is None, row[4] or 0, row[0]))
+        children = {}
+        for row in rows:
+            children.setdefault(row[3], []).append(row)
+
+        self._all = [summary(row) for row in children.get(None, [])]
+        self._tree = [nested(row, titles, names, children) for row in children.get(None, [])]
+        self._categories = {}
+        self._sub_categories = {}
+        self._bodies = {}
+        for row in children.get(None, []):
+            # Names are matched case-insensitively, and the first match (lowest display order) wins
+            self._categories.setdefault(row[1].lower(), detail(row, titles, names, children))
+            for child in children.get(row[0], []):
+                sub_category = detail(child, titles, names, children)
+                sub_category["parent"] = row[1]
+                self._sub_categories.setdefault((row[1].lower(), child[1].lower()), sub_category)
+
+    def get_all(self):
+        """Returns the top level categories, in display order."""
+        return self._all
+
+    def get_tree(self):
+        """Returns every top level category in display order, each with its sub-categories nested in full."""
+        return self._tree
+
+    def get_category(self, name):
+        """Returns the top level category with the given name, or None if there isn't one."""
+        return self._categories.get(name.lower())
+
+    def get_sub_category(self, parent, name):
+        """Returns the sub-category with the given name under the given top level category, or None."""
+        return self._sub_categories.get((parent.lower(), name.lower()))
+
+    def get_category_body(self, name):
+        """Returns get_category(name) as an EncodedBody, or None. Encoded on first use, then kept with the snapshot."""
+        return self._encoded(('category', name.lower()), self.get_category(name))
+
+    def get_sub_category_body(self, parent, name):
+        """Returns get_sub_category(parent, name) as an EncodedBody, or None, kept the same way."""
+        return self._encoded(('sub-category', parent.lower(), name.lower()), self.get_sub_category(parent, name))
+
+    def _encoded(self, key, value):
+        if value is None:
+            return None
+        body = self._bodies.get(key)
+        if body is None:
+            # Two readers may both encode the same body, the later one simply replaces the other
+            body = self._bodies[key] = EncodedBody(value)
+        return body
+
+
+def summary(row):
+    return {
+        "name": row[1],
+        "display-name": row[2],
+        "permission": row[5]
+    }
+
+
+def detail(row, titles, names, children):
+    return {
+        "name": row[1],
+        "display-name": row[2],
+        "permission": row[5],
+        "statutory-provisions": titles.get(row[0], []),
+        "instruments": names.get(row[0], []),
+        "sub-categories": [summary(child) for child in children.get(row[0], [])]
+    }
+
+
+def nested(row, titles, names, children):
+    return {
+        "name": row[1],
+        "display-name": row[2],
+        "permission": row[5],
+        "statutory-provisions": titles.get(row[0], []),
+        "instruments": names.get(row[0], []),
+        "sub-categories": [nested(child, titles, names, children) for child in children.get(row[0], [])]
+    }
+
+
+def load_category_tree(version):
+    """Builds a snapshot from the database with one query per table, rather than walking the model relationships."""
+    rows = db.session.query(Categories.id, Categories.name, Categories.display_name, Categories.parent_id,
+                            Categories.display_order, Categories.permission) \
+        .all()
+    provisions = db.session.query(CategoryStatProvisionMapping.category_id, StatutoryProvision.title) \
+        .join(StatutoryProvision, CategoryStatProvisionMapping.statutory_provision_id == StatutoryProvision.id) \
+        .order_by(CategoryStatProvisionMapping.category_id, StatutoryProvision.title) \
+        .all()
+    instruments = db.session.query(CategoryInstrumentsMapping.category_id, Instruments.name) \
+        .join(Instruments, CategoryInstrumentsMapping.instruments_id == Instruments.id) \
+        .order_by(CategoryInstrumentsMapping.category_id, Instruments.name) \
+        .all()
+    return CategoryTree(version, rows, provisions, instruments)
+
+
+class CategoryTreeCache(object):
+    """Holds the current category tree snapshot, replacing it whenever the category, provision or instrument data
+    has changed.
+
+    Writes bump the table versions in the same transaction, whichever process makes them, and the next read here
+    builds a new snapshot and swaps it in whole, so a reader only ever sees a complete snapshot. Concurrent readers
+    wait for a single rebuild.
+    """
+
+    def __init__(self):
+        self._tree = None
+        self._lock = threading.Lock()
+
+    def get(self, version=None):
+        """Returns the current snapshot. version is the tables' current version, if the caller has already read it
+        with table_versions.get(*CATEGORY_TREE_TABLES).
+        """
+        # Read the version before any data, so a write committed mid-build leaves the snapshot out of date
+        if version is None:
+            version = table_versions.get(*CATEGORY_TREE_TABLES)
+        tree = self._tree
+        if tree is not None and tree.version == version:
+            return tree
+
+        with self._lock:
+            tree = self._tree
+            if tree is None or tree.version != version:
+                tree = self._tree = load_category_tree(version)
+        return tree
+
+    def invalidate(self):
+        self._tree = None
+
+
+category_tree = CategoryTreeCache()
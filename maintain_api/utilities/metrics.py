@@ -0,0 +1,271 @@
+from bisect import bisect_left
+from maintain_api.config import METRICS_DIRECTORY
+from maintain_api.utilities.server_timing import DEPENDENCY_PHASES, record_phase
+import json
+import mmap
+import os
+import struct
+import threading
+
+# Upper bounds, in seconds, of the buckets request and dependency timings are counted into
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Each process's value file is named this followed by its pid, and starts out this many bytes long
+FILE_PREFIX = 'metrics_'
+FILE_INITIAL_SIZE = 64 * 1024
+# A value file's bytes in use (padded to 8 bytes), an entry's key length, and an entry's value
+HEADER = struct.Struct('<i4x')
+LENGTH = struct.Struct('<i')
+VALUE = struct.Struct('<d')
+
+
+class ProcessValueStore(object):
+    """Values added to by this process, kept in a memory mapped file of its own in directory, so whichever process
+    serves /metrics can read and sum the values of every process.
+
+    The file starts with the number of bytes in use, then holds an entry for each key: the length of the key, the key
+    as JSON padded to a multiple of 8 bytes, then the value as a double. Entries are only ever appended or updated in
+    place, and the bytes in use only move on once an entry is complete, so other processes can read it at any time.
+
+    Files are left behind when a process exits, so what it counted stays in the totals. A process reusing the pid of an
+    old one carries on from the old file's values, so totals never go down.
+    """
+
+    def __init__(self, directory, initial_size=FILE_INITIAL_SIZE):
+        self.directory = directory
+        self.initial_size = initial_size
+        self._pid = None
+        self._fd = None
+        self._map = None
+        self._used = 0
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    def add(self, key, amount):
+        """Adds amount to the value of key, which is a tuple of JSON types."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+            position = self._positions.get(key)
+            if position is None:
+                position = self._append(key)
+            value, = VALUE.unpack_from(self._map, position)
+            VALUE.pack_into(self._map, position, value + amount)
+
+    def read_all(self):
+        """Returns the values of every process that has written to directory, summed by key."""
+        totals = {}
+        for name in sorted(os.listdir(self.directory)) if os.path.isdir(self.directory) else []:
+            if name.startswith(FILE_PREFIX):
+                with open(os.path.join(self.directory, name), 'rb') as file:
+                    data = file.read()
+                for key, value, _ in read_entries(data):
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def _open(self):
+        # A forked process starts a file of its own, rather than adding to its parent's
+        if self._map is not None:
+            self._map.close()
+            os.close(self._fd)
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, '{0}{1}.db'.format(FILE_PREFIX, os.getpid()))
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT)
+        size = max(os.fstat(self._fd).st_size, self.initial_size)
+        os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._positions = {}
+        self._used = HEADER.size
+        for key, _, position in read_entries(self._map):
+            self._positions[key] = position
+            self._used = position + VALUE.size
+        HEADER.pack_into(self._map, 0, self._used)
+        self._pid = os.getpid()
+
+    def _append(self, key):
+        encoded = json.dumps(key).encode('utf-8')
+        position = self._used + LENGTH.size + padded(len(encoded))
+        used = position + VALUE.size
+        if used > len(self._map):
+            size = len(self._map)
+            while size < used:
+                size *= 2
+            self._map.close()
+            os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, size)
+
+        LENGTH.pack_into(self._map, self._used, len(encoded))
+        self._map[self._used + LENGTH.size:self._used + LENGTH.size + len(encoded)] = encoded
+        VALUE.pack_into(self._map, position, 0.0)
+        # Only once the entry is complete, so readers never see part of one
+        HEADER.pack_into(self._map, 0, used)
+        self._used = used
+        self._positions[key] = position
+        return position
+
+
+def padded(length):
+    """Returns the bytes taken by a key of the given length, so the value after it is 8 byte aligned."""
+    return length + (-(LENGTH.size + length) % 8)
+
+
+def read_entries(data):
+    """Yields (key, value, position of value) for each complete entry in a value file's contents."""
+    if len(data) < HEADER.size:
+        return
+    used, = HEADER.unpack_from(data, 0)
+    position = HEADER.size
+    while position < used:
+        length, = LENGTH.unpack_from(data, position)
+        key = json.loads(bytes(data[position + LENGTH.size:position + LENGTH.size + length]).decode('utf-8'))
+        position += LENGTH.size + padded(length)
+        value, = VALUE.unpack_from(data, position)
+        yield tuple(tuple(part) if isinstance(part, list) else part for part in key), value, position
+        position += VALUE.size
+
+
+class Counter(object):
+    """A count for each combination of label values, which only ever goes up."""
+
+    metric_type = 'counter'
+
+    def __init__(self, name, documentation, label_names, store):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._store = store
+
+    def inc(self, label_values, amount=1):
+        self._store.add((self.name, label_values, None), amount)
+
+    def samples(self, values=None):
+        """Yields the samples to render, from the summed values of every process keyed by (label values, part), which
+        are read from the store if not given.
+        """
+        if values is None:
+            values = by_metric(self._store.read_all()).get(self.name, {})
+        for (label_values, _), value in sorted(values.items()):
+            yield self.name, labels(self.label_names, label_values), whole(value)
+
+
+class Histogram(object):
+    """Counts of observed values falling into each bucket, along with their sum, for each combination of label values.
+
+    As Prometheus expects, each bucket's count includes everything in the buckets below it.
+    """
+
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, label_names, store, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._store = store
+
+    def observe(self, label_values, value):
+        # Bucket counts are kept for their own bucket alone, len(buckets) being those above the last bucket
+        self._store.add((self.name, label_values, bisect_left(self.buckets, value)), 1)
+        self._store.add((self.name, label_values, 'sum'), value)
+
+    def samples(self, values=None):
+        """Yields the samples to render, from the summed values of every process keyed by (label values, part), which
+        are read from the store if not given.
+        """
+        if values is None:
+            values = by_metric(self._store.read_all()).get(self.name, {})
+        for label_values in sorted(set(label_values for label_values, _ in values)):
+            total = 0
+            for index, bound in enumerate(self.buckets + (float('inf'),)):
+                total += whole(values.get((label_values, index), 0))
+                yield self.name + '_bucket', labels(self.label_names + ('le',), label_values + (bound,)), total
+            yield self.name + '_sum', labels(self.label_names, label_values), values.get((label_values, 'sum'), 0.0)
+            yield self.name + '_count', labels(self.label_names, label_values), total
+
+
+class MetricsRegistry(object):
+    """Holds the app's metrics and renders them in the Prometheus text format.
+
+    Every worker process sits behind the same address, so a scrape reaches whichever one takes it. Each process keeps
+    its values in a file of its own in directory, and rendering sums the files of every process, so any of them gives
+    the totals for the whole instance.
+    """
+
+    def __init__(self, directory):
+        self.store = ProcessValueStore(directory)
+        self.metrics = []
+
+    def counter(self, name, documentation, label_names):
+        return self._register(Counter(name, documentation, label_names, self.store))
+
+    def histogram(self, name, documentation, label_names, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, label_names, self.store, buckets))
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        values = by_metric(self.store.read_all())
+        lines = []
+        for metric in self.metrics:
+            lines.append('# HELP {0} {1}'.format(metric.name, metric.documentation))
+            lines.append('# TYPE {0} {1}'.format(metric.name, metric.metric_type))
+            for name, sample_labels, value in metric.samples(values.get(metric.name, {})):
+                lines.append('{0}{1} {2}'.format(name, sample_labels, format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+
+def by_metric(totals):
+    """Splits store totals up by metric name, keying each metric's values by (label values, part)."""
+    values = {}
+    for (name, label_values, part), value in totals.items():
+        values.setdefault(name, {})[(label_values, part)] = value
+    return values
+
+
+def labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join('{0}="{1}"'.format(name, escape_label(format_value(value)))
+                          for name, value in zip(names, values)) + '}'
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def whole(value):
+    """Returns a count, which is kept as a double, as an int if it is a whole number."""
+    return int(value) if float(value).is_integer() else value
+
+
+def format_value(value):
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(value)
+    return str(value)
+
+
+registry = MetricsRegistry(METRICS_DIRECTORY)
+
+request_duration = registry.histogram(
+    'maintain_api_http_request_duration_seconds', 'Time taken to handle requests, by endpoint.',
+    ['endpoint', 'method'])
+request_count = registry.counter(
+    'maintain_api_http_requests_total', 'Requests handled, by endpoint and response status.',
+    ['endpoint', 'method', 'status'])
+dependency_duration = registry.histogram(
+    'maintain_api_dependency_request_duration_seconds',
+    'Time taken by calls to other APIs and statements run on the database, by dependency.', ['dependency'])
+
+
+def observe_dependency(dependency, seconds):
+    """Records the time taken by a call to a dependency, in dependency_duration and the request's Server-Timing."""
+    dependency_duration.observe((dependency,), seconds)
+    phase = DEPENDENCY_PHASES.get(dependency)
+    if phase is not None:
+        record_phase(phase, seconds)
@@ -0,0 +1,68 @@
+from flask import g, has_app_context
+from maintain_api.utilities.metrics import observe_dependency
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# The dependency name database statements are timed under, as in the DEPENDENCIES config
+DATABASE_DEPENDENCY = 'postgres'
+
+# Slow statements are logged with at most this many characters of their SQL
+SLOW_STATEMENT_MAX_LENGTH = 1000
+
+
+class QueryStats(object):
+    """The number of statements a request has run on the database, and the time they took."""
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+    def add(self, seconds):
+        self.statements += 1
+        self.seconds += seconds
+
+
+def start_query_stats():
+    """Starts counting the statements run for the current request."""
+    g.query_stats = QueryStats()
+
+
+class QueryInstrument(object):
+    """Times every statement run on the database, adding it to the current request's QueryStats and the postgres
+    dependency timings, and logs any statement taking longer than SLOW_STATEMENT_SECONDS.
+
+    Listens to every engine, so it only needs setting up once for the process.
+    """
+
+    def __init__(self):
+        self.slow_statement_seconds = None
+        self._listening = False
+
+    def init_app(self, app):
+        self.slow_statement_seconds = app.config['SLOW_STATEMENT_SECONDS']
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self.before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self.after_cursor_execute)
+            self._listening = True
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Kept on the execution context, which is thrown away if the statement fails
+        context.query_stats_start = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, 'query_stats_start', None)
+        if start is None:
+            return
+
+        seconds = time.perf_counter() - start
+        observe_dependency(DATABASE_DEPENDENCY, seconds)
+        if has_app_context() and g.get('query_stats') is not None:
+            g.query_stats.add(seconds)
+        if seconds > self.slow_statement_seconds:
+            # The trace id is added by the logging filter when this is part of a request
+            logger.warning("Slow database statement took %.1fms: %s", seconds * 1000,
+                           statement[:SLOW_STATEMENT_MAX_LENGTH])
@@ -0,0 +1,106 @@
+from flask import Response, request
+from maintain_api.config import REFERENCE_DATA_GZIP
+from maintain_api.extensions import db
+from maintain_api.models import Categories, Instruments, ReferenceDataVersion, StatutoryProvision
+from maintain_api.utilities.server_timing import record_phase
+import gzip
+import hashlib
+import json
+import time
+
+
+class TableVersions(object):
+    """Version numbers for the reference data tables, which key every process's copies of reference data.
+
+    The versions are kept in the reference_data_versions table, and writes bump them in the same transaction as the
+    data, so a copy is rebuilt as soon as a write has been committed by any process. Reading them is a single
+    statement against a handful of rows. Versions are never sent to callers, ETags are a hash of the response body
+    instead (see EncodedBody).
+    """
+
+    def get(self, *tables):
+        """Returns the combined current version of the given tables. Tables without a row yet are at version 0."""
+        versions = dict(db.session.query(ReferenceDataVersion.table_name, ReferenceDataVersion.version)
+                        .filter(ReferenceDataVersion.table_name.in_(tables))
+                        .all())
+        return '.'.join(str(versions.get(table, 0)) for table in tables)
+
+    def bump(self, *tables):
+        """Moves the given tables on to a new version. Call this before committing a write to them, so the new
+        version is committed along with it, or rolled back if the write is.
+        """
+        for table in tables:
+            updated = db.session.query(ReferenceDataVersion) \
+                .filter(ReferenceDataVersion.table_name == table) \
+                .update({ReferenceDataVersion.version: ReferenceDataVersion.version + 1}, synchronize_session=False)
+            if not updated:
+                db.session.add(ReferenceDataVersion(table, 1))
+
+
+table_versions = TableVersions()
+
+# The tables versions are kept for. Writes to a category's provision and instrument mappings count as writes to the
+# category itself.
+CATEGORIES_TABLE = Categories.__tablename__
+INSTRUMENTS_TABLE = Instruments.__tablename__
+PROVISIONS_TABLE = StatutoryProvision.__tablename__
+
+# The gzipped copy of a body is a different representation, so is given a different ETag
+GZIP_ETAG_SUFFIX = '-gzip'
+
+
+def not_modified(etag):
+    """Returns a 304 response if the request's If-None-Match holds the given ETag, otherwise None."""
+    for matched in [etag, etag + GZIP_ETAG_SUFFIX]:
+        if matched in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(matched)
+            return response
+    return None
+
+
+class EncodedBody(object):
+    """A JSON response body, encoded once up front so it can be served any number of times without walking the
+    Python objects again. Also keeps a gzipped copy when REFERENCE_DATA_GZIP is set, made the first time it is needed.
+
+    Its ETag is a hash of the encoded body, so every process gives the same ETag for the same data and a caller can
+    revalidate against whichever process it reaches.
+    """
+
+    def __init__(self, value):
+        start = time.perf_counter()
+        self.data = json.dumps(value, sort_keys=True).encode('utf-8')
+        self.etag = hashlib.sha1(self.data).hexdigest()
+        self.gzip = REFERENCE_DATA_GZIP
+        self._gzipped = None
+        record_phase('serialize', time.perf_counter() - start)
+
+    @property
+    def gzipped(self):
+        """The gzipped copy, compressed the first time a caller that accepts gzip is served. None if gzip is off."""
+        if self._gzipped is None and self.gzip:
+            start = time.perf_counter()
+            self._gzipped = gzip.compress(self.data)
+            record_phase('serialize', time.perf_counter() - start)
+        return self._gzipped
+
+
+def encoded_response(body):
+    """Returns a response serving the given EncodedBody, gzipped if the caller accepts it, or a 304 if the request's
+    If-None-Match holds its ETag.
+    """
+    etag = body.etag
+    response = not_modified(etag)
+    if response is not None:
+        return response
+
+    if body.gzip and request.accept_encodings['gzip']:
+        response = Response(response=body.gzipped, mimetype="application/json")
+        response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(etag + GZIP_ETAG_SUFFIX)
+    else:
+        response = Response(response=body.data, mimetype="application/json")
+        response.set_etag(etag)
+    if body.gzip:
+        response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,13 @@
+from jsonschema.validators import validator_for
+
+
+def schema_validator(schema):
+    """Returns a validator for the given schema, having checked the schema itself is valid.
+
+    jsonschema.validate checks the schema and builds a new validator every time it is called. Building the validator
+    once, when the module defining the schema is imported, leaves each request only the payload to check. Validators
+    are shared between requests, which is safe as long as the schema only refers to itself.
+    """
+    cls = validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
@@ -0,0 +1,32 @@
+from collections import OrderedDict
+from flask import g, has_app_context
+
+# The Server-Timing phase calls to each dependency are added to. Calls to authentication-api are left out, as they
+# are already part of the auth phase.
+DEPENDENCY_PHASES = {
+    'postgres': 'db',
+    'mint-api': 'mint',
+    'search-api': 'search'
+}
+
+
+def start_server_timing():
+    """Starts collecting phase timings for the current request."""
+    g.server_timing = OrderedDict()
+
+
+def record_phase(phase, seconds):
+    """Adds time spent in a phase to the current request's timings, if they are being collected.
+
+    Does nothing outside a request, or when the request isn't collecting timings.
+    """
+    if has_app_context():
+        timings = g.get('server_timing')
+        if timings is not None:
+            timings[phase] = timings.get(phase, 0) + seconds
+
+
+def server_timing_header(total_seconds):
+    """Returns a Server-Timing header value holding the current request's phase timings and total time, in ms."""
+    phases = list(g.get('server_timing', {}).items()) + [('total', total_seconds)]
+    return ', '.join('{0};dur={1:.2f}'.format(phase, seconds * 1000) for phase, seconds in phases)
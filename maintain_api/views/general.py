@@ -1,11 +1,26 @@
 from maintain_api.dependencies import postgres
+from maintain_api.config import HEALTH_CASCADE_MAX_WORKERS, HEALTH_CASCADE_CACHE_SECONDS, \
+    HEALTH_CASCADE_UNHEALTHY_CACHE_SECONDS, MAX_HEALTH_CASCADE
+from maintain_api.utilities.cache import LruCache
+from maintain_api.utilities.metrics import registry, PROMETHEUS_MIMETYPE
 from flask import request, Blueprint, Response, g
 from flask import current_app
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 import json
 import datetime
+import threading
+import time
 
 general = Blueprint('general', __name__)
 
+# Shared by every cascade request, so the number of probes running at once stays bounded however many arrive together
+probe_executor = ThreadPoolExecutor(max_workers=HEALTH_CASCADE_MAX_WORKERS)
+
+# Recent cascade results per depth, and the runs currently in progress (as futures other callers can wait on)
+cascade_cache = LruCache(int(MAX_HEALTH_CASCADE) + 1, HEALTH_CASCADE_CACHE_SECONDS)
+cascade_in_flight = {}
+cascade_lock = threading.Lock()
+
 
 @general.route("/health")
 def check_status():
@@ -17,86 +32,31 @@ def check_status():
     }), mimetype='application/json', status=200)
 
 
+@general.route("/metrics")
+def metrics():
+    """Request, status and dependency timing metrics for every worker process, in the Prometheus text format."""
+    return Response(response=registry.render(), content_type=PROMETHEUS_MIMETYPE, status=200)
+
+
 @general.route("/health/cascade/<str_depth>")
 def cascade_health(str_depth):  # pragma: no cover
     depth = int(str_depth)
 
     if (depth < 0) or (depth > int(current_app.config.get("MAX_HEALTH_CASCADE"))):
         current_app.logger.info(depth)
-        current_app.logger.error("Cascade depth {} out of allowed range (0 - {})".format(
-            depth, current_app.config.get("MAX_HEALTH_CASCADE")))
+        current_app.logger.error("Cascade depth %s out of allowed range (0 - %s)",
+                                 depth, current_app.config.get("MAX_HEALTH_CASCADE"))
         return Response(response=json.dumps({
             "app": current_app.config.get("APP_NAME"),
             "cascade_depth": str_depth,
             "status": "ERROR",
             "timestamp": str(datetime.datetime.now())
         }), mimetype='application/json', status=500)
-    dbs = []
-    services = []
-    overall_status = 200  # if we encounter a failure at any point then this will be set to != 200
-    if current_app.config.get("DEPENDENCIES") is not None:
-        for dependency, value in current_app.config.get("DEPENDENCIES").items():
-            if "postgres" in value:
-                # postgres db url - try calling current timestamp routine
-                db = dict()
-                db["name"] = dependency
-                try:
-                    db_timestamp = postgres.get_current_timestamp()
-                    # trim microseconds to 3 to match java
-                    db["current_timestamp"] = db_timestamp.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + 'Z'
-                    db["status"] = "OK"
-                except Exception as e:
-                    message = "Error during health cascade on request to database: {}; full error: {}."
-                    current_app.logger.error(message.format(dependency, e))
-                    overall_status = 500
-                    db["status"] = "BAD"
-                finally:
-                    dbs.append(db)
-            else:
-                if depth > 0:
-                    # As there is an inconsistant approach to url variables we need to check to see if we have a
-                    # trailing '/' and add one if not
-                    if value[-1] != '/':
-                        value = value + '/'
-
-                    # Setup our service entry
-                    service = {
-                        "name": dependency,
-                        "type": "http"
-                    }
-                    try:
-                        resp = g.requests.get(value + 'health/cascade/' + str(depth - 1))  # Try and request the health
-                    except ConnectionAbortedError as e:  # More specific logging statement for abortion error
-                        message = "Connection Aborted during health cascade on attempt to connect to {}; " + \
-                                  "full error: {}"
-                        current_app.logger.error(message.format(dependency, e))
-                        service["status"] = "UNKNOWN"
-                        overall_status = 500
-                        service["status_code"] = None
-                        service["content_type"] = None
-                        service["content"] = None
-                    except Exception as e:  # Generic catch-all exception
-                        message = "Unknown error occured during health cascade on request to {}; full error: {}"
-                        current_app.logger.error(message.format(dependency, e))
-                        service["status"] = "UNKNOWN"
-                        overall_status = 500
-                        service["status_code"] = None
-                        service["content_type"] = None
-                        service["content"] = None
-                    else:   # Everything worked
-                        service["status_code"] = resp.status_code
-                        service["content_type"] = resp.headers["content-type"]
-                        service["content"] = resp.json()
-                        if resp.status_code == 200:  # Happy route, happy service, happy status_code.
-                            service["status"] = "OK"
-                        elif resp.status_code == 500:  # Something went wrong
-                            service["status"] = "BAD"
-                            overall_status = 500
-                        else:   # Who knows what happened.
-                            service["status"] = "UNKNOWN"
-                            overall_status = 500
-                    finally:
-                        services.append(service)
+
+    # Cascades are cached for a few seconds (unhealthy ones for less), and concurrent callers for the same depth share
+    # a single run of the probes, so frequent health checks don't multiply into database and downstream load.
+    probed_at, (dbs, services, overall_status) = get_cascade(depth)
+
     response_json = {
         "cascade_depth": depth,
         "server_timestamp": str(datetime.datetime.now()),
@@ -105,10 +65,156 @@ def cascade_health(str_depth):  # pragma: no cover
         "headers": request.headers.to_list(),
         "commit": current_app.config.get("COMMIT"),
         "db": dbs,
-        "services": services
+        "services": services,
+        "cache_age": round(time.monotonic() - probed_at, 3)
     }
     if overall_status == 500:
         response_json['status'] = "BAD"
     else:
         response_json['status'] = "OK"
     return Response(response=json.dumps(response_json), mimetype='application/json', status=overall_status)
+
+
+def get_cascade(depth):
+    """Returns (probed_at, probe results) for the given depth, from the cache or from a single in-flight run."""
+    with cascade_lock:
+        cached = cascade_cache.get(depth)
+        if cached is not None:
+            return cached
+        in_flight = cascade_in_flight.get(depth)
+        owner = in_flight is None
+        if owner:
+            in_flight = cascade_in_flight[depth] = Future()
+
+    if not owner:
+        return in_flight.result()
+
+    try:
+        cached = (time.monotonic(), run_probes(depth))
+        # Unhealthy runs are kept for less time, so a recovered dependency is seen soon
+        if cached[1][2] == 200:
+            cascade_cache.set(depth, cached)
+        else:
+            cascade_cache.set(depth, cached, HEALTH_CASCADE_UNHEALTHY_CACHE_SECONDS)
+        in_flight.set_result(cached)
+        return cached
+    except Exception as e:
+        in_flight.set_exception(e)
+        raise
+    finally:
+        with cascade_lock:
+            del cascade_in_flight[depth]
+
+
+def run_probes(depth):
+    """Probes every dependency, returning (dbs, services, overall_status) for the cascade response."""
+    # Every probe runs at once, so the cascade takes as long as the slowest probe rather than the sum of them all.
+    # Each probe enforces its own timeout: the database probe on its pool checkout and statement, and a service
+    # probe on connecting (one probe timeout) and reading (the whole budget of the downstream cascade, at depth - 1).
+    # The overall budget, one probe timeout more than that, is only a backstop for a probe that overruns anyway.
+    probe_timeout = current_app.config["HEALTH_CASCADE_PROBE_TIMEOUT_SECONDS"]
+    budget = probe_timeout * (depth + 1)
+    app = current_app._get_current_object()
+    probes = []
+    if current_app.config.get("DEPENDENCIES") is not None:
+        for dependency, value in current_app.config.get("DEPENDENCIES").items():
+            if "postgres" in value:
+                probes.append(("db", dependency, probe_executor.submit(check_database, app, dependency)))
+            elif depth > 0:
+                # As there is an inconsistant approach to url variables we need to check to see if we have a
+                # trailing '/' and add one if not
+                if value[-1] != '/':
+                    value = value + '/'
+                probes.append(("service", dependency, probe_executor.submit(
+                    check_service, g.requests, dependency, value + 'health/cascade/' + str(depth - 1),
+                    (probe_timeout, probe_timeout * depth))))
+
+    wait([future for _, _, future in probes], timeout=budget)
+
+    dbs = []
+    services = []
+    overall_status = 200  # if we encounter a failure at any point then this will be set to != 200
+    for probe_type, dependency, future in probes:
+        if future.done():
+            result, ok, error = future.result()
+        else:
+            future.cancel()
+            result, ok, error = timed_out(probe_type, dependency, budget)
+        if error:
+            current_app.logger.error(error)
+        if not ok:
+            overall_status = 500
+        if probe_type == "db":
+            dbs.append(result)
+        else:
+            services.append(result)
+    return dbs, services, overall_status
+
+
+# The probes below run on the probe pool, outside of the request, so they return any error message for the request
+# thread to log rather than logging it themselves. Each returns a tuple of (cascade entry, ok, error message).
+
+def check_database(app, dependency):
+    """Probes the database by asking it for its current timestamp, and reports on the connection pool."""
+    db = {"name": dependency}
+    with app.app_context():
+        try:
+            db_timestamp, checkout_seconds = postgres.select_current_timestamp()
+        except Exception as e:
+            message = "Error during health cascade on request to database: {}; full error: {}."
+            db["status"] = "BAD"
+            db["pool"] = postgres.get_pool_status()
+            return db, False, message.format(dependency, e)
+        db["pool"] = postgres.get_pool_status()
+
+    db["pool"]["wait_time_ms"] = round(checkout_seconds * 1000, 3)
+    # trim microseconds to 3 to match java
+    db["current_timestamp"] = db_timestamp.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + 'Z'
+    db["status"] = "OK"
+    return db, True, None
+
+
+def check_service(requester, dependency, url, timeout):
+    """Probes another service by requesting its own health cascade."""
+    # Setup our service entry
+    service = {
+        "name": dependency,
+        "type": "http"
+    }
+    try:
+        resp = requester.get(url, timeout=timeout)  # Try and request the health
+    except ConnectionAbortedError as e:  # More specific logging statement for abortion error
+        message = "Connection Aborted during health cascade on attempt to connect to {}; full error: {}"
+        return unknown_service(service), False, message.format(dependency, e)
+    except Exception as e:  # Generic catch-all exception
+        message = "Unknown error occured during health cascade on request to {}; full error: {}"
+        return unknown_service(service), False, message.format(dependency, e)
+
+    # Everything worked
+    service["status_code"] = resp.status_code
+    service["content_type"] = resp.headers["content-type"]
+    service["content"] = resp.json()
+    if resp.status_code == 200:  # Happy route, happy service, happy status_code.
+        service["status"] = "OK"
+        return service, True, None
+    elif resp.status_code == 500:  # Something went wrong
+        service["status"] = "BAD"
+    else:   # Who knows what happened.
+        service["status"] = "UNKNOWN"
+    return service, False, None
+
+
+def unknown_service(service):
+    service["status"] = "UNKNOWN"
+    service["status_code"] = None
+    service["content_type"] = None
+    service["content"] = None
+    return service
+
+
+def timed_out(probe_type, dependency, budget):
+    """Builds the entry for a probe that did not finish within the cascade's budget."""
+    message = "Health cascade probe of {} did not finish within {} seconds".format(dependency, budget)
+    if probe_type == "db":
+        return {"name": dependency, "status": "BAD"}, False, message
+    return unknown_service({"name": dependency, "type": "http"}), False, message
@@ -1,14 +1,25 @@
-from flask import Blueprint, Response, current_app, request
+from flask import Blueprint, current_app, request
 from maintain_api.models import Categories, StatutoryProvision, Instruments, \
     CategoryStatProvisionMapping, CategoryInstrumentsMapping
 from maintain_api.exceptions import ApplicationError
 from sqlalchemy import func
-import json
+from collections import OrderedDict
 from maintain_api.extensions import db
-from jsonschema import validate, ValidationError
+from jsonschema import ValidationError
+from maintain_api.utilities.schema import schema_validator
+from maintain_api.config import REFERENCE_DATA_CACHE_TIMEOUT_MINUTES
+from maintain_api.utilities.cache import LruCache
+from maintain_api.utilities.reference_data import table_versions, encoded_response, EncodedBody, \
+    CATEGORIES_TABLE
+from maintain_api.utilities.category_tree import category_tree, CATEGORY_TREE_TABLES
 
 categories = Blueprint('categories', __name__, url_prefix='/v1.0/maintain/categories')
 
+# Encoded top level category list keyed by table version, so a write by any process replaces it on the next read
+categories_body_cache = LruCache(1, REFERENCE_DATA_CACHE_TIMEOUT_MINUTES * 60)
+# Encoded full category tree, the same way
+category_tree_body_cache = LruCache(1, REFERENCE_DATA_CACHE_TIMEOUT_MINUTES * 60)
+
 CATEGORY_SCHEMA = {
     "type": "object",
     "properties": {
@@ -33,26 +44,132 @@ CATEGORY_SCHEMA = {
     "required": ["name", "display-name", "display-order", "permission", "provisions", "instruments"]
 }
 
+CATEGORY_VALIDATOR = schema_validator(CATEGORY_SCHEMA)
+
+
+def resolve_mappings(provisions, instruments):
+    """Returns the ids of the given provision titles and instrument names, matched ignoring case.
+
+    Uses one query for each table however many names are given, and raises a single 404 naming everything that does
+    not exist.
+    """
+    provision_ids = resolve_names(StatutoryProvision, 'title', provisions)
+    instrument_ids = resolve_names(Instruments, 'name', instruments)
+
+    missing = ["Statutory provision '{0}' does not exist.".format(prov)
+               for prov in provisions if prov.lower() not in provision_ids]
+    missing += ["Instrument '{0}' does not exist.".format(instrument)
+                for instrument in instruments if instrument.lower() not in instrument_ids]
+    if missing:
+        message = " ".join(missing)
+        current_app.logger.info(message)
+        raise ApplicationError(message, 404, 404)
+
+    # A name given twice only maps once
+    return list(OrderedDict.fromkeys(provision_ids[prov.lower()] for prov in provisions)), \
+        list(OrderedDict.fromkeys(instrument_ids[instrument.lower()] for instrument in instruments))
+
+
+def resolve_names(model, attribute, names):
+    if not names:
+        return {}
+
+    rows = model.query \
+        .filter(func.lower(getattr(model, attribute)).in_(set(name.lower() for name in names))) \
+        .all()
+
+    ids = {}
+    for row in rows:
+        ids.setdefault(getattr(row, attribute).lower(), row.id)
+    return ids
+
+
+def update_mappings(category, provision_ids, instrument_ids):
+    """Brings the category's mappings in line with the given ids, deleting and inserting only the ones that change.
+
+    Reading the category's current mappings takes one small query for each table.
+    """
+    current_provision_ids = set(mapping.statutory_provision_id for mapping in category.provisions)
+    current_instrument_ids = set(mapping.instruments_id for mapping in category.instruments)
+
+    removed_provision_ids = sorted(current_provision_ids.difference(provision_ids))
+    if removed_provision_ids:
+        CategoryStatProvisionMapping.query \
+            .filter(CategoryStatProvisionMapping.category_id == category.id,
+                    CategoryStatProvisionMapping.statutory_provision_id.in_(removed_provision_ids)) \
+            .delete(synchronize_session=False)
+
+    removed_instrument_ids = sorted(current_instrument_ids.difference(instrument_ids))
+    if removed_instrument_ids:
+        CategoryInstrumentsMapping.query \
+            .filter(CategoryInstrumentsMapping.category_id == category.id,
+                    CategoryInstrumentsMapping.instruments_id.in_(removed_instrument_ids)) \
+            .delete(synchronize_session=False)
+
+    insert_mappings(category.id,
+                    [provision_id for provision_id in provision_ids if provision_id not in current_provision_ids],
+                    [instrument_id for instrument_id in instrument_ids if instrument_id not in current_instrument_ids])
+
+
+def delete_category_tree(category_id):
+    """Deletes a category along with every category below it, at any depth, and all of their mappings.
+
+    Takes four statements however large the tree is: a recursive query for the ids in the tree, then one delete for
+    each table. Returns the number of categories, provision mappings and instrument mappings deleted.
+    """
+    tree = db.session.query(Categories.id) \
+        .filter(Categories.id == category_id) \
+        .cte(name="category_tree", recursive=True)
+    tree = tree.union_all(db.session.query(Categories.id).filter(Categories.parent_id == tree.c.id))
+    category_ids = [row.id for row in db.session.query(tree.c.id).all()]
+
+    instruments = CategoryInstrumentsMapping.query \
+        .filter(CategoryInstrumentsMapping.category_id.in_(category_ids)) \
+        .delete(synchronize_session=False)
+    provisions = CategoryStatProvisionMapping.query \
+        .filter(CategoryStatProvisionMapping.category_id.in_(category_ids)) \
+        .delete(synchronize_session=False)
+    # Parents and children go in the same statement, so the parent_id foreign key holds once it completes
+    categories = Categories.query \
+        .filter(Categories.id.in_(category_ids)) \
+        .delete(synchronize_session=False)
+    return categories, provisions, instruments
+
+
+def insert_mappings(category_id, provision_ids, instrument_ids):
+    """Adds the category's provision and instrument mappings with one bulk insert for each table."""
+    if provision_ids:
+        db.session.bulk_insert_mappings(CategoryStatProvisionMapping, [
+            {"category_id": category_id, "statutory_provision_id": provision_id} for provision_id in provision_ids])
+    if instrument_ids:
+        db.session.bulk_insert_mappings(CategoryInstrumentsMapping, [
+            {"category_id": category_id, "instruments_id": instrument_id} for instrument_id in instrument_ids])
+
 
 @categories.route('', methods=['GET'])
 def get_all_categories():
     current_app.logger.info("Get all categories")
 
-    all_categories = Categories.query\
-        .filter(Categories.parent_id == None) \
-        .order_by(Categories.display_order) \
-        .all()  # noqa: E711 - Ignore "is None vs ==" linting error, is None does not produce valid sql in sqlAlchmey
-
-    results = []
-    for category in all_categories:
-        result_json = {
-            "permission": category.permission,
-            "display-name": category.display_name,
-            "name": category.name
-        }
-        results.append(result_json)
+    version = table_versions.get(*CATEGORY_TREE_TABLES)
+    body = categories_body_cache.get(version)
+    if body is None:
+        body = EncodedBody(category_tree.get(version).get_all())
+        categories_body_cache.set(version, body)
+
+    return encoded_response(body)
+
 
-    return Response(response=json.dumps(results), mimetype="application/json")
+@categories.route('/tree', methods=['GET'])
+def get_category_tree():
+    current_app.logger.info("Get category tree")
+
+    version = table_versions.get(*CATEGORY_TREE_TABLES)
+    body = category_tree_body_cache.get(version)
+    if body is None:
+        body = EncodedBody(category_tree.get(version).get_tree())
+        category_tree_body_cache.set(version, body)
+
+    return encoded_response(body)
 
 
 @categories.route('', methods=['POST'])
@@ -62,7 +179,7 @@ def add_categories():
     request_body = request.get_json()
 
     try:
-        validate(request_body, CATEGORY_SCHEMA)
+        CATEGORY_VALIDATOR.validate(request_body)
     except ValidationError as e:
         current_app.logger.info("Create category - payload failed validation")
         raise ApplicationError(e.message, 400, 400)
@@ -85,29 +202,15 @@ def add_categories():
             current_app.logger.info(message)
             raise ApplicationError(message, 409, 409)
 
+        provision_ids, instrument_ids = resolve_mappings(provisions, instruments)
+
         category = Categories(name, None, display_order, permission, display_name)
         db.session.add(category)
         db.session.flush()
 
-        for prov in provisions:
-            provision = StatutoryProvision.query\
-                .filter(func.lower(StatutoryProvision.title) == func.lower(prov)).first()
-            if provision is None:
-                message = "Statutory provision '{0}' does not exist.".format(prov)
-                current_app.logger.info(message)
-                raise ApplicationError(message, 404, 404)
-            mapping = CategoryStatProvisionMapping(category.id, provision.id)
-            db.session.add(mapping)
-
-        for instrument in instruments:
-            exists = Instruments.query.filter(func.lower(Instruments.name) == func.lower(instrument)).first()
-            if exists is None:
-                message = "Instrument '{0}' does not exist.".format(instrument)
-                current_app.logger.info(message)
-                raise ApplicationError(message, 404, 404)
-            mapping = CategoryInstrumentsMapping(category.id, exists.id)
-            db.session.add(mapping)
+        insert_mappings(category.id, provision_ids, instrument_ids)
 
+        table_versions.bump(CATEGORIES_TABLE)
         db.session.commit()
 
         return "", 201
@@ -120,50 +223,19 @@ def add_categories():
 
 @categories.route('/<category>', methods=['GET'])
 def get_category(category):
-    current_app.logger.info("Get category for {0}.".format(category))
+    current_app.logger.info("Get category for %s.", category)
 
-    category_obj = Categories.query \
-        .filter(func.lower(Categories.name) == func.lower(category)) \
-        .filter(Categories.parent_id == None) \
-        .first()  # noqa: E711 - Ignore "is None vs ==" linting error, is None does not produce valid sql in sqlAlchmey
+    body = category_tree.get().get_category_body(category)
 
-    if category_obj is None:
+    if body is None:
         raise ApplicationError("Category '{0}' not found.".format(category), 404, 404)
 
-    provisions = []
-    for provision_mapping in category_obj.provisions:
-        provisions.append(provision_mapping.provision.title)
-
-    instruments = []
-    for instruments_mapping in category_obj.instruments:
-        instruments.append(instruments_mapping.instrument.name)
-
-    children = []
-    for children_mapping in Categories.query\
-            .filter(Categories.parent_id == category_obj.id)\
-            .order_by(Categories.display_order).all():
-        children.append(
-            {
-                "name": children_mapping.name,
-                "display-name": children_mapping.display_name,
-                "permission": children_mapping.permission,
-
-            })
-
-    result = {
-        "name": category_obj.name,
-        "display-name": category_obj.display_name,
-        "permission": category_obj.permission,
-        "statutory-provisions": provisions,
-        "instruments": instruments,
-        "sub-categories": children}
-
-    return Response(response=json.dumps(result), mimetype="application/json")
+    return encoded_response(body)
 
 
 @categories.route('/<category>', methods=['DELETE'])
 def delete_category(category):
-    current_app.logger.info("Delete category for {0}.".format(category))
+    current_app.logger.info("Delete category for %s.", category)
 
     try:
         category = Categories.query \
@@ -174,22 +246,10 @@ def delete_category(category):
         if category is None:
             raise ApplicationError("Category '{0}' not found.".format(category), 404, 404)
 
-        sub_categories = Categories.query \
-            .filter(Categories.parent_id == category.id) \
-            .all()
-
-        for sub_category in sub_categories:
-            CategoryInstrumentsMapping.query\
-                .filter(CategoryInstrumentsMapping.category_id == sub_category.id).delete()
-            CategoryStatProvisionMapping.query\
-                .filter(CategoryStatProvisionMapping.category_id == sub_category.id).delete()
-            Categories.query\
-                .filter(Categories.id == sub_category.id).delete()
-
-        CategoryInstrumentsMapping.query.filter(CategoryInstrumentsMapping.category_id == category.id).delete()
-        CategoryStatProvisionMapping.query.filter(CategoryStatProvisionMapping.category_id == category.id).delete()
-        Categories.query.filter(Categories.id == category.id).delete()
+        deleted = delete_category_tree(category.id)
+        current_app.logger.info("Deleted %s categories, %s provision mappings and %s instrument mappings", *deleted)
 
+        table_versions.bump(CATEGORIES_TABLE)
         db.session.commit()
 
         return "", 204
@@ -207,7 +267,7 @@ def update_category(category_name):
     request_body = request.get_json()
 
     try:
-        validate(request_body, CATEGORY_SCHEMA)
+        CATEGORY_VALIDATOR.validate(request_body)
     except ValidationError as e:
         current_app.logger.info("Update category - payload failed validation")
         raise ApplicationError(e.message, 400, 400)
@@ -240,33 +300,16 @@ def update_category(category_name):
                 current_app.logger.info(message)
                 raise ApplicationError(message, 409, 409)
 
+        provision_ids, instrument_ids = resolve_mappings(provisions, instruments)
+
         category.name = name
         category.display_name = display_name
         category.permission = permission
         category.display_order = display_order
 
-        CategoryInstrumentsMapping.query.filter(CategoryInstrumentsMapping.category_id == category.id).delete()
-        CategoryStatProvisionMapping.query.filter(CategoryStatProvisionMapping.category_id == category.id).delete()
-
-        for prov in provisions:
-            provision = StatutoryProvision.query\
-                .filter(func.lower(StatutoryProvision.title) == func.lower(prov)).first()
-            if provision is None:
-                message = "Statutory provision '{0}' does not exist.".format(prov)
-                current_app.logger.info(message)
-                raise ApplicationError(message, 404, 404)
-            mapping = CategoryStatProvisionMapping(category.id, provision.id)
-            db.session.add(mapping)
-
-        for instrument in instruments:
-            exists = Instruments.query.filter(func.lower(Instruments.name) == func.lower(instrument)).first()
-            if exists is None:
-                message = "Instrument '{0}' does not exist.".format(instrument)
-                current_app.logger.info(message)
-                raise ApplicationError(message, 404, 404)
-            mapping = CategoryInstrumentsMapping(category.id, exists.id)
-            db.session.add(mapping)
+        update_mappings(category, provision_ids, instrument_ids)
 
+        table_versions.bump(CATEGORIES_TABLE)
         db.session.commit()
 
         return "", 204
@@ -283,7 +326,7 @@ def create_sub_category(category):
     request_body = request.get_json()
 
     try:
-        validate(request_body, CATEGORY_SCHEMA)
+        CATEGORY_VALIDATOR.validate(request_body)
     except ValidationError as e:
         current_app.logger.info("Create category - payload failed validation")
         raise ApplicationError(e.message, 400, 400)
@@ -316,30 +359,15 @@ def create_sub_category(category):
             current_app.logger.info(message)
             raise ApplicationError(message, 409, 409)
 
+        provision_ids, instrument_ids = resolve_mappings(provisions, instruments)
+
         category = Categories(name, parent_obj.id, display_order, permission, display_name)
         db.session.add(category)
         db.session.flush()
 
-        for prov in provisions:
-            provision = StatutoryProvision.query \
-                .filter(func.lower(StatutoryProvision.title) == func.lower(prov)).first()
-            if provision is None:
-                message = "Statutory provision '{0}' does not exist.".format(prov)
-                current_app.logger.info(message)
-                raise ApplicationError(message, 404, 404)
-            mapping = CategoryStatProvisionMapping(category.id, provision.id)
-            db.session.add(mapping)
-
-        for instrument in instruments:
-            exists = Instruments.query\
-                .filter(func.lower(Instruments.name) == func.lower(instrument)).first()
-            if exists is None:
-                message = "Instrument '{0}' does not exist.".format(instrument)
-                current_app.logger.info(message)
-                raise ApplicationError(message, 404, 404)
-            mapping = CategoryInstrumentsMapping(category.id, exists.id)
-            db.session.add(mapping)
+        insert_mappings(category.id, provision_ids, instrument_ids)
 
+        table_versions.bump(CATEGORIES_TABLE)
         db.session.commit()
 
         return "", 201
@@ -352,55 +380,20 @@ def create_sub_category(category):
 
 @categories.route('/<category>/sub-categories/<path:sub_category>', methods=['GET'])
 def get_sub_category(category, sub_category):
-    current_app.logger.info("Get category for {0}.".format(category))
+    current_app.logger.info("Get category for %s.", category)
 
-    category_obj = Categories.query \
-        .filter(func.lower(Categories.name) == func.lower(category)) \
-        .filter(Categories.parent_id == None) \
-        .first()  # noqa: E711 - Ignore "is None vs ==", is None does not produce valid sql in sqlAlchmey
+    tree = category_tree.get()
 
-    if category_obj is None:
+    if tree.get_category(category) is None:
         raise ApplicationError("Category '{0}' not found.".format(category), 404, 404)
 
-    sub_category_obj = Categories.query \
-        .filter(func.lower(Categories.name) == func.lower(sub_category)) \
-        .filter(Categories.parent_id == category_obj.id) \
-        .first()
+    body = tree.get_sub_category_body(category, sub_category)
 
-    if sub_category_obj is None:
+    if body is None:
         raise ApplicationError("Sub-category '{0}' not found for parent '{1}'".format(sub_category, category),
                                404, 404)
 
-    provisions = []
-    for provision_mapping in sub_category_obj.provisions:
-        provisions.append(provision_mapping.provision.title)
-
-    instruments = []
-    for instruments_mapping in sub_category_obj.instruments:
-        instruments.append(instruments_mapping.instrument.name)
-
-    children = []
-    for children_mapping in Categories.query \
-            .filter(Categories.parent_id == sub_category_obj.id) \
-            .order_by(Categories.display_order).all():
-        children.append(
-            {
-                "name": children_mapping.name,
-                "display-name": children_mapping.display_name,
-                "permission": children_mapping.permission,
-
-            })
-
-    result = {
-        "name": sub_category_obj.name,
-        "display-name": sub_category_obj.display_name,
-        "permission": sub_category_obj.permission,
-        "statutory-provisions": provisions,
-        "instruments": instruments,
-        "sub-categories": children,
-        "parent": category_obj.name}
-
-    return Response(response=json.dumps(result), mimetype="application/json")
+    return encoded_response(body)
 
 
 @categories.route('/<category>/sub-categories/<path:sub_category>', methods=['PUT'])
@@ -410,7 +403,7 @@ def update_sub_category(category, sub_category):
     request_body = request.get_json()
 
     try:
-        validate(request_body, CATEGORY_SCHEMA)
+        CATEGORY_VALIDATOR.validate(request_body)
     except ValidationError as e:
         current_app.logger.info("Update category - payload failed validation")
         raise ApplicationError(e.message, 400, 400)
@@ -452,34 +445,16 @@ def update_sub_category(category, sub_category):
                 current_app.logger.info(message)
                 raise ApplicationError(message, 409, 409)
 
+        provision_ids, instrument_ids = resolve_mappings(provisions, instruments)
+
         sub_category_obj.name = name
         sub_category_obj.display_name = display_name
         sub_category_obj.permission = permission
         sub_category_obj.display_order = display_order
 
-        CategoryInstrumentsMapping.query.filter(CategoryInstrumentsMapping.category_id == sub_category_obj.id).delete()
-        CategoryStatProvisionMapping.query.filter(
-            CategoryStatProvisionMapping.category_id == sub_category_obj.id).delete()
-
-        for prov in provisions:
-            provision = StatutoryProvision.query \
-                .filter(func.lower(StatutoryProvision.title) == func.lower(prov)).first()
-            if provision is None:
-                message = "Statutory provision '{0}' does not exist.".format(prov)
-                current_app.logger.info(message)
-                raise ApplicationError(message, 404, 404)
-            mapping = CategoryStatProvisionMapping(sub_category_obj.id, provision.id)
-            db.session.add(mapping)
-
-        for instrument in instruments:
-            exists = Instruments.query.filter(func.lower(Instruments.name) == func.lower(instrument)).first()
-            if exists is None:
-                message = "Instrument '{0}' does not exist.".format(instrument)
-                current_app.logger.info(message)
-                raise ApplicationError(message, 404, 404)
-            mapping = CategoryInstrumentsMapping(sub_category_obj.id, exists.id)
-            db.session.add(mapping)
+        update_mappings(sub_category_obj, provision_ids, instrument_ids)
 
+        table_versions.bump(CATEGORIES_TABLE)
         db.session.commit()
 
         return "", 204
@@ -492,7 +467,7 @@ def update_sub_category(category, sub_category):
 
 @categories.route('/<category>/sub-categories/<path:sub_category>', methods=['DELETE'])
 def delete_sub_category(category, sub_category):
-    current_app.logger.info("Delete category for {0}.".format(category))
+    current_app.logger.info("Delete category for %s.", category)
 
     try:
         category = Categories.query \
@@ -512,25 +487,10 @@ def delete_sub_category(category, sub_category):
             raise ApplicationError("Sub-category '{0}' not found for parent '{1}'"
                                    .format(sub_category, category), 404, 404)
 
-        sub_categories = Categories.query \
-            .filter(Categories.parent_id == sub_category_obj.id) \
-            .all()
-
-        for sub_category in sub_categories:
-            CategoryInstrumentsMapping.query \
-                .filter(CategoryInstrumentsMapping.category_id == sub_category.id).delete()
-            CategoryStatProvisionMapping.query \
-                .filter(CategoryStatProvisionMapping.category_id == sub_category.id).delete()
-            Categories.query \
-                .filter(Categories.id == sub_category.id).delete()
-
-        CategoryInstrumentsMapping.query\
-            .filter(CategoryInstrumentsMapping.category_id == sub_category_obj.id).delete()
-        CategoryStatProvisionMapping.query\
-            .filter(CategoryStatProvisionMapping.category_id == sub_category_obj.id).delete()
-        Categories.query\
-            .filter(Categories.id == sub_category_obj.id).delete()
+        deleted = delete_category_tree(sub_category_obj.id)
+        current_app.logger.info("Deleted %s categories, %s provision mappings and %s instrument mappings", *deleted)
 
+        table_versions.bump(CATEGORIES_TABLE)
         db.session.commit()
 
         return "", 204
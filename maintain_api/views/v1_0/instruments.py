@@ -1,13 +1,19 @@
-from flask import Blueprint, Response, current_app, request
+from flask import Blueprint, current_app, request
 from maintain_api.models import Instruments
 from maintain_api.exceptions import ApplicationError
 from sqlalchemy import func
-import json
-from jsonschema import validate, ValidationError
+from jsonschema import ValidationError
+from maintain_api.utilities.schema import schema_validator
 from maintain_api.extensions import db
+from maintain_api.config import REFERENCE_DATA_CACHE_TIMEOUT_MINUTES
+from maintain_api.utilities.cache import LruCache
+from maintain_api.utilities.reference_data import table_versions, encoded_response, EncodedBody, \
+    INSTRUMENTS_TABLE
 
 instruments_bp = Blueprint('instruments', __name__, url_prefix='/v1.0/maintain/instruments')
 
+# Encoded instrument list keyed by table version, so a write by any process replaces it on the next read
+instruments_body_cache = LruCache(1, REFERENCE_DATA_CACHE_TIMEOUT_MINUTES * 60)
 
 INSTRUMENT_SCHEMA = {
     "type": "object",
@@ -18,23 +24,32 @@ INSTRUMENT_SCHEMA = {
     "required": ["name"]
 }
 
+INSTRUMENT_VALIDATOR = schema_validator(INSTRUMENT_SCHEMA)
+
 
 @instruments_bp.route('', methods=['GET'])
 def get_all_instruments():
     current_app.logger.info("Get all instruments.")
-    instruments = Instruments.query \
-        .distinct(Instruments.name) \
-        .order_by(Instruments.name) \
-        .all()
 
-    if instruments is None or len(instruments) == 0:
-        raise ApplicationError("No instruments found.", 404, 404)
+    version = table_versions.get(INSTRUMENTS_TABLE)
+    body = instruments_body_cache.get(version)
+    if body is None:
+        instruments = Instruments.query \
+            .distinct(Instruments.name) \
+            .order_by(Instruments.name) \
+            .all()
+
+        if instruments is None or len(instruments) == 0:
+            raise ApplicationError("No instruments found.", 404, 404)
+
+        instruments_json = []
+        for instrument in instruments:
+            instruments_json.append(instrument.name)
 
-    instruments_json = []
-    for instrument in instruments:
-        instruments_json.append(instrument.name)
+        body = EncodedBody(instruments_json)
+        instruments_body_cache.set(version, body)
 
-    return Response(response=json.dumps(instruments_json), mimetype="application/json")
+    return encoded_response(body)
 
 
 @instruments_bp.route('', methods=['POST'])
@@ -44,7 +59,7 @@ def add_instrument():
     request_body = request.get_json()
 
     try:
-        validate(request_body, INSTRUMENT_SCHEMA)
+        INSTRUMENT_VALIDATOR.validate(request_body)
     except ValidationError as e:
         current_app.logger.info("Create instrument - payload failed validation")
         raise ApplicationError(e.message, 400, 400)
@@ -61,6 +76,7 @@ def add_instrument():
     instrument = Instruments(name)
 
     db.session.add(instrument)
+    table_versions.bump(INSTRUMENTS_TABLE)
     db.session.commit()
 
     return "", 201
@@ -78,6 +94,7 @@ def delete_instrument(instrument_name):
         raise ApplicationError(message, 404, 404)
 
     Instruments.query.filter(Instruments.id == instrument.id).delete()
+    table_versions.bump(INSTRUMENTS_TABLE)
     db.session.commit()
 
     return "", 204
@@ -85,12 +102,12 @@ def delete_instrument(instrument_name):
 
 @instruments_bp.route('/<instrument_name>', methods=['PUT'])
 def update_instrument(instrument_name):
-    current_app.logger.info("Update instrument {0}.".format(instrument_name))
+    current_app.logger.info("Update instrument %s.", instrument_name)
 
     request_body = request.get_json()
 
     try:
-        validate(request_body, INSTRUMENT_SCHEMA)
+        INSTRUMENT_VALIDATOR.validate(request_body)
     except ValidationError as e:
         current_app.logger.info("Update instrument - payload failed validation")
         raise ApplicationError(e.message, 400, 400)
@@ -112,6 +129,7 @@ def update_instrument(instrument_name):
             raise ApplicationError(message, 409, 409)
 
     instrument.name = name
+    table_versions.bump(INSTRUMENTS_TABLE)
     db.session.commit()
 
     return "", 204
@@ -0,0 +1,127 @@
+from flask import Blueprint, Response, current_app, stream_with_context
+from maintain_api.models import Categories, StatutoryProvision, Instruments, \
+    CategoryStatProvisionMapping, CategoryInstrumentsMapping
+from collections import OrderedDict
+from itertools import groupby
+import json
+from maintain_api.extensions import db
+from maintain_api.views.v1_0.reference_data_import import NDJSON_MIMETYPE
+
+reference_data_export_bp = Blueprint('reference_data_export', __name__, url_prefix='/v1.0/maintain/reference-data')
+
+# Rows fetched from the database at a time
+EXPORT_BATCH_SIZE = 500
+
+
+@reference_data_export_bp.route('/export', methods=['GET'])
+def export_reference_data():
+    """Streams every statutory provision, instrument and category as NDJSON, in the format the import takes.
+
+    Provisions come first, then instruments, then one line for each top level category holding its whole tree of
+    sub-categories and their mappings. Rows are read in batches through server-side cursors and written out as they
+    arrive, so only one top level category's tree is held in memory at a time.
+    """
+    current_app.logger.info("Export reference data")
+
+    return Response(stream_with_context(export_lines()), mimetype=NDJSON_MIMETYPE)
+
+
+def export_lines():
+    provisions = db.session.query(StatutoryProvision.title, StatutoryProvision.selectable) \
+        .order_by(StatutoryProvision.title) \
+        .yield_per(EXPORT_BATCH_SIZE)
+    for title, selectable in provisions:
+        yield export_line("statutory-provision", OrderedDict([("title", title), ("selectable", selectable)]))
+
+    instruments = db.session.query(Instruments.name) \
+        .order_by(Instruments.name) \
+        .yield_per(EXPORT_BATCH_SIZE)
+    for name, in instruments:
+        yield export_line("instrument", OrderedDict([("name", name)]))
+
+    for category in nest_categories(*category_queries()):
+        yield export_line("category", category)
+
+
+def export_line(key, value):
+    return json.dumps({key: value}) + "\n"
+
+
+def category_queries():
+    """Returns queries for every category, provision mapping and instrument mapping, each row starting with the id of
+    the top level category it comes under.
+
+    All three are in the same order of top level category, so they can be read side by side a tree at a time.
+    """
+    roots = db.session.query(Categories.id.label("root_id"), Categories.display_order.label("root_order"),
+                             Categories.id, Categories.name, Categories.display_name, Categories.parent_id,
+                             Categories.display_order, Categories.permission) \
+        .filter(Categories.parent_id == None) \
+        .cte(name="export_tree", recursive=True)  # noqa: E711 - is None does not produce valid sql in sqlAlchmey
+    tree = roots.union_all(
+        db.session.query(roots.c.root_id, roots.c.root_order, Categories.id, Categories.name,
+                         Categories.display_name, Categories.parent_id, Categories.display_order,
+                         Categories.permission)
+        .filter(Categories.parent_id == roots.c.id))
+    # Nulls last, to match the category endpoints
+    root_order = [tree.c.root_order.is_(None), tree.c.root_order, tree.c.root_id]
+
+    categories = db.session.query(tree.c.root_id, tree.c.id, tree.c.name, tree.c.display_name, tree.c.parent_id,
+                                  tree.c.display_order, tree.c.permission) \
+        .order_by(*root_order) \
+        .yield_per(EXPORT_BATCH_SIZE)
+    provisions = db.session.query(tree.c.root_id, CategoryStatProvisionMapping.category_id, StatutoryProvision.title) \
+        .join(CategoryStatProvisionMapping, CategoryStatProvisionMapping.category_id == tree.c.id) \
+        .join(StatutoryProvision, CategoryStatProvisionMapping.statutory_provision_id == StatutoryProvision.id) \
+        .order_by(*(root_order + [CategoryStatProvisionMapping.category_id, StatutoryProvision.title])) \
+        .yield_per(EXPORT_BATCH_SIZE)
+    instruments = db.session.query(tree.c.root_id, CategoryInstrumentsMapping.category_id, Instruments.name) \
+        .join(CategoryInstrumentsMapping, CategoryInstrumentsMapping.category_id == tree.c.id) \
+        .join(Instruments, CategoryInstrumentsMapping.instruments_id == Instruments.id) \
+        .order_by(*(root_order + [CategoryInstrumentsMapping.category_id, Instruments.name])) \
+        .yield_per(EXPORT_BATCH_SIZE)
+    return categories, provisions, instruments
+
+
+def nest_categories(categories, provisions, instruments):
+    """Yields each top level category with its sub-categories nested in full.
+
+    categories are (root_id, id, name, display_name, parent_id, display_order, permission) rows, provisions are
+    (root_id, category_id, title) rows and instruments are (root_id, category_id, name) rows, all grouped by root_id in
+    the same order. A top level category without mappings has no provision or instrument rows.
+    """
+    provision_groups = groupby(provisions, key=lambda row: row[0])
+    instrument_groups = groupby(instruments, key=lambda row: row[0])
+    provision_group = next(provision_groups, None)
+    instrument_group = next(instrument_groups, None)
+
+    for root_id, rows in groupby(categories, key=lambda row: row[0]):
+        titles = {}
+        if provision_group is not None and provision_group[0] == root_id:
+            for _, category_id, title in provision_group[1]:
+                titles.setdefault(category_id, []).append(title)
+            provision_group = next(provision_groups, None)
+        names = {}
+        if instrument_group is not None and instrument_group[0] == root_id:
+            for _, category_id, name in instrument_group[1]:
+                names.setdefault(category_id, []).append(name)
+            instrument_group = next(instrument_groups, None)
+
+        # Children in display order, nulls last, the same as the category tree snapshot
+        children = {}
+        for row in sorted(rows, key=lambda row: (row[5] is None, row[5] or 0, row[1])):
+            children.setdefault(row[4], []).append(row)
+        for row in children.get(None, []):
+            yield export_category(row, titles, names, children)
+
+
+def export_category(row, titles, names, children):
+    return OrderedDict([
+        ("name", row[2]),
+        ("display-name", row[3]),
+        ("display-order", row[5]),
+        ("permission", row[6]),
+        ("provisions", titles.get(row[1], [])),
+        ("instruments", names.get(row[1], [])),
+        ("sub-categories", [export_category(child, titles, names, children) for child in children.get(row[1], [])])
+    ])
@@ -0,0 +1,334 @@
+from flask import Blueprint, Response, current_app, request
+from maintain_api.models import Categories, StatutoryProvision, Instruments, \
+    CategoryStatProvisionMapping, CategoryInstrumentsMapping
+from maintain_api.exceptions import ApplicationError
+from sqlalchemy import func, tuple_
+from collections import OrderedDict
+import json
+from maintain_api.extensions import db
+from jsonschema import ValidationError
+from maintain_api.utilities.schema import schema_validator
+from maintain_api.utilities.reference_data import table_versions, CATEGORIES_TABLE, INSTRUMENTS_TABLE, \
+    PROVISIONS_TABLE
+from maintain_api.views.v1_0.categories import CATEGORY_SCHEMA, resolve_names
+from maintain_api.views.v1_0.instruments import INSTRUMENT_SCHEMA
+from maintain_api.views.v1_0.statutory_provisions import STAT_PROV_SCHEMA
+
+reference_data_import_bp = Blueprint('reference_data_import', __name__, url_prefix='/v1.0/maintain/reference-data')
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# The single key each NDJSON line is given, and the document list its value goes in
+NDJSON_KEYS = OrderedDict([
+    ("statutory-provision", "statutory-provisions"),
+    ("instrument", "instruments"),
+    ("category", "categories")
+])
+
+# Items are the same as the single item endpoints take, and categories can hold their sub-categories to any depth.
+# Categories without a display order are exported with a null one, so the import takes those too.
+IMPORT_CATEGORY_SCHEMA = dict(CATEGORY_SCHEMA, properties=dict(CATEGORY_SCHEMA["properties"], **{
+    "display-order": {"type": ["integer", "null"]},
+    "sub-categories": {
+        "type": "array",
+        "items": {"$ref": "#/definitions/category"}
+    }
+}))
+
+IMPORT_SCHEMA = {
+    "type": "object",
+    "definitions": {
+        "category": IMPORT_CATEGORY_SCHEMA
+    },
+    "properties": {
+        "statutory-provisions": {
+            "type": "array",
+            "items": STAT_PROV_SCHEMA
+        },
+        "instruments": {
+            "type": "array",
+            "items": INSTRUMENT_SCHEMA
+        },
+        "categories": {
+            "type": "array",
+            "items": {"$ref": "#/definitions/category"}
+        }
+    },
+    "additionalProperties": False
+}
+
+IMPORT_VALIDATOR = schema_validator(IMPORT_SCHEMA)
+
+CREATED = "created"
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+ERROR = "error"
+
+
+@reference_data_import_bp.route('/import', methods=['POST'])
+def import_reference_data():
+    """Creates or updates statutory provisions, instruments and categories in bulk, in a single transaction.
+
+    Takes a JSON document with optional "statutory-provisions", "instruments" and "categories" lists, or the same
+    items as NDJSON, one {"statutory-provision": ...}, {"instrument": ...} or {"category": ...} object per line.
+    Items are matched to existing ones by name, ignoring case, and anything not in the import is left alone.
+
+    Responds with the result of every item. If any item fails, nothing is applied and the response is a 400.
+    """
+    current_app.logger.info("Import reference data")
+
+    if request.mimetype == NDJSON_MIMETYPE:
+        document = read_ndjson(request.get_data(as_text=True))
+    else:
+        document = request.get_json()
+
+    try:
+        IMPORT_VALIDATOR.validate(document)
+    except ValidationError as e:
+        current_app.logger.info("Import reference data - payload failed validation")
+        raise ApplicationError(e.message, 400, 400)
+
+    try:
+        # Provisions and instruments go first, so categories can be mapped to ones created by the same import
+        report = OrderedDict([
+            ("statutory-provisions", upsert_named(StatutoryProvision, "title", "Statutory provision",
+                                                  document.get("statutory-provisions", []), ["title", "selectable"])),
+            ("instruments", upsert_named(Instruments, "name", "Instrument", document.get("instruments", []),
+                                         ["name"])),
+            ("categories", upsert_categories(document.get("categories", [])))
+        ])
+
+        failed = sum(1 for results in report.values() for result in results if result["result"] == ERROR)
+        if failed:
+            current_app.logger.info("Import reference data - %s items failed, rolling back transaction", failed)
+            db.session.rollback()
+            return Response(response=json.dumps(report), status=400, mimetype="application/json")
+
+        for key, table in [("statutory-provisions", PROVISIONS_TABLE), ("instruments", INSTRUMENTS_TABLE),
+                           ("categories", CATEGORIES_TABLE)]:
+            if any(result["result"] != UNCHANGED for result in report[key]):
+                table_versions.bump(table)
+        db.session.commit()
+
+        return Response(response=json.dumps(report), status=200, mimetype="application/json")
+
+    except Exception:
+        current_app.logger.info("Rolling back transaction")
+        db.session.rollback()
+        raise
+
+
+def read_ndjson(text):
+    """Gathers NDJSON lines into the equivalent import document."""
+    document = OrderedDict((key, []) for key in NDJSON_KEYS.values())
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            raise ApplicationError("Line {0} is not valid JSON.".format(number), 400, 400)
+
+        if not isinstance(entry, dict) or len(entry) != 1 or next(iter(entry)) not in NDJSON_KEYS:
+            message = "Line {0} must be an object with a single 'statutory-provision', 'instrument' or 'category' " \
+                "key.".format(number)
+            raise ApplicationError(message, 400, 400)
+
+        key, value = entry.popitem()
+        document[NDJSON_KEYS[key]].append(value)
+    return document
+
+
+def item_result(attribute, value, result, error=None, **extra):
+    item = OrderedDict([(attribute, value)])
+    item.update(sorted(extra.items()))
+    item["result"] = result
+    if error is not None:
+        item["error"] = error
+    return item
+
+
+def upsert_named(model, attribute, label, items, fields):
+    """Creates or updates the given items, matched to existing rows on the named attribute ignoring case.
+
+    Takes one query to find the existing rows, then at most one bulk insert and one bulk update. fields are the item
+    keys written to the model's attributes of the same name.
+    """
+    existing = {}
+    if items:
+        rows = model.query \
+            .filter(func.lower(getattr(model, attribute)).in_(set(item[attribute].lower() for item in items))) \
+            .all()
+        for row in rows:
+            existing.setdefault(getattr(row, attribute).lower(), row)
+
+    results = []
+    inserts = []
+    updates = []
+    seen = set()
+    for item in items:
+        name = item[attribute]
+        if name.lower() in seen:
+            message = "{0} '{1}' is given more than once.".format(label, name)
+            results.append(item_result(attribute, name, ERROR, message))
+            continue
+        seen.add(name.lower())
+
+        values = dict((field, item[field]) for field in fields)
+        row = existing.get(name.lower())
+        if row is None:
+            inserts.append(values)
+            results.append(item_result(attribute, name, CREATED))
+        elif any(getattr(row, field) != value for field, value in values.items()):
+            values["id"] = row.id
+            updates.append(values)
+            results.append(item_result(attribute, name, UPDATED))
+        else:
+            results.append(item_result(attribute, name, UNCHANGED))
+
+    if inserts:
+        db.session.bulk_insert_mappings(model, inserts)
+    if updates:
+        db.session.bulk_update_mappings(model, updates)
+    return results
+
+
+def upsert_categories(items):
+    """Creates or updates the given categories and their sub-categories, along with their mappings.
+
+    Works down the tree a level at a time, taking one query to find the level's existing categories, then at most one
+    bulk insert, one query reading back the new ids and one bulk update. Names are resolved with one query for each
+    table up front, and the mappings brought in line with a few statements per table once every level is done.
+    """
+    provision_ids = resolve_names(StatutoryProvision, 'title', list(names_in(items, "provisions")))
+    instrument_ids = resolve_names(Instruments, 'name', list(names_in(items, "instruments")))
+
+    results = []
+    mappings = OrderedDict()
+    existing_results = {}
+    level = [(item, None, None) for item in items]
+    while level:
+        names = set(item["name"].lower() for item, _, _ in level)
+        parent_ids = None if level[0][1] is None else sorted(set(parent_id for _, parent_id, _ in level))
+        rows = in_level(Categories.query, names, parent_ids).all()
+        existing = {}
+        for row in rows:
+            existing.setdefault((row.parent_id, row.name.lower()), row)
+
+        imported = []
+        inserts = []
+        updates = []
+        seen = set()
+        for item, parent_id, parent in level:
+            name = item["name"]
+            errors = []
+            if (parent_id, name.lower()) in seen:
+                errors.append("Category '{0}' is given more than once.".format(name))
+            seen.add((parent_id, name.lower()))
+            errors += ["Statutory provision '{0}' does not exist.".format(prov)
+                       for prov in item["provisions"] if prov.lower() not in provision_ids]
+            errors += ["Instrument '{0}' does not exist.".format(instrument)
+                       for instrument in item["instruments"] if instrument.lower() not in instrument_ids]
+            if errors:
+                # Its sub-categories are left out, the import won't be applied anyway
+                results.append(item_result("name", name, ERROR, " ".join(errors), parent=parent))
+                continue
+
+            values = {
+                "name": name,
+                "display_name": item["display-name"],
+                "display_order": item["display-order"],
+                "permission": item["permission"],
+                "parent_id": parent_id
+            }
+            row = existing.get((parent_id, name.lower()))
+            if row is None:
+                inserts.append(values)
+                result = item_result("name", name, CREATED, parent=parent)
+            elif any(getattr(row, field) != value for field, value in values.items()):
+                values["id"] = row.id
+                updates.append(values)
+                result = item_result("name", name, UPDATED, parent=parent)
+            else:
+                values["id"] = row.id
+                result = item_result("name", name, UNCHANGED, parent=parent)
+            if row is not None:
+                existing_results[row.id] = result
+            results.append(result)
+            imported.append((item, values))
+
+        if inserts:
+            db.session.bulk_insert_mappings(Categories, inserts)
+            # Their sub-categories and mappings need the new ids. Reading them back in one query keeps the insert a
+            # single batch, where having it return them would insert a row at a time.
+            new_ids = dict(((parent_id, name.lower()), category_id) for category_id, parent_id, name in in_level(
+                db.session.query(Categories.id, Categories.parent_id, Categories.name),
+                set(values["name"].lower() for values in inserts), parent_ids).all())
+            for values in inserts:
+                values["id"] = new_ids[(values["parent_id"], values["name"].lower())]
+        if updates:
+            db.session.bulk_update_mappings(Categories, updates)
+
+        level = []
+        for item, values in imported:
+            # A name given twice only maps once
+            mappings[values["id"]] = (
+                list(OrderedDict.fromkeys(provision_ids[prov.lower()] for prov in item["provisions"])),
+                list(OrderedDict.fromkeys(instrument_ids[instrument.lower()] for instrument in item["instruments"])))
+            level += [(child, values["id"], item["name"]) for child in item.get("sub-categories", [])]
+
+    changed = sync_mappings(CategoryStatProvisionMapping, "statutory_provision_id", existing_results,
+                            OrderedDict((category_id, ids[0]) for category_id, ids in mappings.items()))
+    changed |= sync_mappings(CategoryInstrumentsMapping, "instruments_id", existing_results,
+                             OrderedDict((category_id, ids[1]) for category_id, ids in mappings.items()))
+    for category_id in changed:
+        if existing_results[category_id]["result"] == UNCHANGED:
+            existing_results[category_id]["result"] = UPDATED
+    return results
+
+
+def in_level(query, names, parent_ids):
+    """Filters a Categories query to those with the given lower case names under the given parents, or at the top
+    level when parent_ids is None."""
+    query = query.filter(func.lower(Categories.name).in_(names))
+    if parent_ids is None:
+        return query.filter(Categories.parent_id == None)  # noqa: E711 - is None does not produce valid sql
+    return query.filter(Categories.parent_id.in_(parent_ids))
+
+
+def names_in(items, key):
+    for item in items:
+        for name in item[key]:
+            yield name
+        for name in names_in(item.get("sub-categories", []), key):
+            yield name
+
+
+def sync_mappings(model, column, existing, wanted):
+    """Brings one mapping table in line with the wanted ids for each category, deleting and inserting only the
+    mappings that change.
+
+    existing holds the categories that were already there, the only ones which can have mappings to remove. Returns
+    the ids of those whose mappings changed.
+    """
+    current = set()
+    if existing:
+        current = set(db.session.query(model.category_id, getattr(model, column))
+                      .filter(model.category_id.in_(sorted(existing)))
+                      .all())
+    wanted_pairs = set((category_id, mapped_id) for category_id, ids in wanted.items() for mapped_id in ids)
+
+    removed = sorted(current.difference(wanted_pairs))
+    if removed:
+        model.query \
+            .filter(tuple_(model.category_id, getattr(model, column)).in_(removed)) \
+            .delete(synchronize_session=False)
+
+    added = [(category_id, mapped_id) for category_id, ids in wanted.items() for mapped_id in ids
+             if (category_id, mapped_id) not in current]
+    if added:
+        db.session.bulk_insert_mappings(model, [
+            {"category_id": category_id, column: mapped_id} for category_id, mapped_id in added])
+
+    return set(category_id for category_id, _ in removed + added if category_id in existing)
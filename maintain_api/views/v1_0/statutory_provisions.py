@@ -1,13 +1,25 @@
-from flask import Blueprint, Response, current_app, request
+from flask import Blueprint, current_app, request
 from maintain_api.models import StatutoryProvision
 from maintain_api.exceptions import ApplicationError
+from maintain_api.config import STATUTORY_PROVISION_CACHE_TIMEOUT_MINUTES
+from maintain_api.utilities.cache import LruCache
+from maintain_api.utilities.reference_data import table_versions, encoded_response, EncodedBody, \
+    PROVISIONS_TABLE
 from sqlalchemy import func
-import json
 from maintain_api.extensions import db
-from jsonschema import validate, ValidationError
+from jsonschema import ValidationError
+from maintain_api.utilities.schema import schema_validator
 
 statutory_provision_bp = Blueprint('statutory_provisions', __name__, url_prefix='/statutory-provisions')
 
+# Encoded provision titles keyed by table version and the selectable filter (None for all provisions), so a write by
+# any process replaces them on the next read
+provision_cache = LruCache(10, STATUTORY_PROVISION_CACHE_TIMEOUT_MINUTES * 60)
+
+# The selectable query parameter values taken for true and false, ignoring case, as postgres takes them for a boolean
+SELECTABLE_VALUES = {'true': True, 't': True, 'yes': True, 'y': True, 'on': True, '1': True,
+                     'false': False, 'f': False, 'no': False, 'n': False, 'off': False, '0': False}
+
 
 STAT_PROV_SCHEMA = {
     "type": "object",
@@ -19,33 +31,45 @@ STAT_PROV_SCHEMA = {
     "required": ["title", "selectable"]
 }
 
+STAT_PROV_VALIDATOR = schema_validator(STAT_PROV_SCHEMA)
+
 
 @statutory_provision_bp.route('/statutory-provisions', methods=['GET'])
 def get_all_statutory_provisions():
     current_app.logger.info("Get all statutory provisions.")
 
     selectable = request.args.get('selectable')
-
-    if selectable is None:
-        provisions = StatutoryProvision.query \
-            .distinct(StatutoryProvision.title) \
-            .order_by(StatutoryProvision.title) \
-            .all()
-    else:
-        provisions = StatutoryProvision.query \
-            .distinct(StatutoryProvision.title) \
-            .filter(StatutoryProvision.selectable == selectable) \
-            .order_by(StatutoryProvision.title) \
-            .all()
-
-    if provisions is None or len(provisions) == 0:
-        raise ApplicationError("No provisions found.", 404, 404)
-
-    provisions_json = []
-    for provision in provisions:
-        provisions_json.append(provision.title)
-
-    return Response(response=json.dumps(provisions_json), mimetype="application/json")
+    if selectable is not None:
+        if selectable.lower() not in SELECTABLE_VALUES:
+            raise ApplicationError("selectable must be true or false.", 400, 400)
+        selectable = SELECTABLE_VALUES[selectable.lower()]
+
+    cache_key = (table_versions.get(PROVISIONS_TABLE), selectable)
+    body = provision_cache.get(cache_key)
+    if body is None:
+        if selectable is None:
+            provisions = StatutoryProvision.query \
+                .distinct(StatutoryProvision.title) \
+                .order_by(StatutoryProvision.title) \
+                .all()
+        else:
+            provisions = StatutoryProvision.query \
+                .distinct(StatutoryProvision.title) \
+                .filter(StatutoryProvision.selectable == selectable) \
+                .order_by(StatutoryProvision.title) \
+                .all()
+
+        if provisions is None or len(provisions) == 0:
+            raise ApplicationError("No provisions found.", 404, 404)
+
+        provisions_json = []
+        for provision in provisions:
+            provisions_json.append(provision.title)
+
+        body = EncodedBody(provisions_json)
+        provision_cache.set(cache_key, body)
+
+    return encoded_response(body)
 
 
 @statutory_provision_bp.route('/statutory-provisions', methods=['POST'])
@@ -55,7 +79,7 @@ def add_statutory_provisions():
     request_body = request.get_json()
 
     try:
-        validate(request_body, STAT_PROV_SCHEMA)
+        STAT_PROV_VALIDATOR.validate(request_body)
     except ValidationError as e:
         current_app.logger.info("Add statutory provision - payload failed validation")
         raise ApplicationError(e.message, 400, 400)
@@ -73,6 +97,7 @@ def add_statutory_provisions():
     stat_prov = StatutoryProvision(title, selectable)
 
     db.session.add(stat_prov)
+    table_versions.bump(PROVISIONS_TABLE)
     db.session.commit()
 
     return "", 201
@@ -80,7 +105,7 @@ def add_statutory_provisions():
 
 @statutory_provision_bp.route('/statutory-provisions/<stat_prov>', methods=['DELETE'])
 def delete_statutory_provisions(stat_prov):
-    current_app.logger.info("Delete statutory provision {0}.".format(stat_prov))
+    current_app.logger.info("Delete statutory provision %s.", stat_prov)
 
     provision = StatutoryProvision.query.filter(func.lower(StatutoryProvision.title) == func.lower(stat_prov)).first()
 
@@ -90,6 +115,7 @@ def delete_statutory_provisions(stat_prov):
         raise ApplicationError(message, 404, 404)
 
     StatutoryProvision.query.filter(StatutoryProvision.id == provision.id).delete()
+    table_versions.bump(PROVISIONS_TABLE)
     db.session.commit()
 
     return "", 204
@@ -97,12 +123,12 @@ def delete_statutory_provisions(stat_prov):
 
 @statutory_provision_bp.route('/statutory-provisions/<stat_prov>', methods=['PUT'])
 def update_statutory_provisions(stat_prov):
-    current_app.logger.info("Update statutory provision {0}.".format(stat_prov))
+    current_app.logger.info("Update statutory provision %s.", stat_prov)
 
     request_body = request.get_json()
 
     try:
-        validate(request_body, STAT_PROV_SCHEMA)
+        STAT_PROV_VALIDATOR.validate(request_body)
     except ValidationError as e:
         current_app.logger.info("Update statutory provision - payload failed validation")
         raise ApplicationError(e.message, 400, 400)
@@ -126,6 +152,7 @@ def update_statutory_provisions(stat_prov):
 
     provision.title = title
     provision.selectable = selectable
+    table_versions.bump(PROVISIONS_TABLE)
     db.session.commit()
 
     return "", 204
@@ -51,9 +51,9 @@ def update_land_charge(land_charge_id):
             # return result from Mint api
             built_resp = result
     else:
-        current_app.logger.warning("Cannot change local-land-charge field for charge '{}'".format(land_charge_id))
+        current_app.logger.warning("Cannot change local-land-charge field for charge '%s'", land_charge_id)
         raise ApplicationError("Cannot change local-land-charge field", "U100", 400)
 
-    current_app.logger.info("Returning update response for charge '{}'".format(land_charge_id))
+    current_app.logger.info("Returning update response for charge '%s'", land_charge_id)
 
     return json.dumps(built_resp, sort_keys=True, separators=(',', ':')), status, {'Content-Type': 'application/json'}
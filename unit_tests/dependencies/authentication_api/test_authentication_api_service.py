@@ -0,0 +1,28 @@
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+from maintain_api.dependencies.authentication_api.authentication_api_service import AuthenticationApiService
+
+AUTHENTICATION_API_PATH = 'maintain_api.dependencies.authentication_api.authentication_api_service'
+
+
+class TestAuthenticationApi(TestCase):
+
+    @patch('{}.http_client'.format(AUTHENTICATION_API_PATH))
+    def test_get_signing_keys(self, mock_http_client):
+        response = MagicMock()
+        response.json.return_value = {"keys": [{"kid": "abc", "kty": "RSA"}]}
+        mock_http_client.for_request.return_value.get.return_value = response
+
+        keys = AuthenticationApiService.get_signing_keys()
+
+        self.assertEqual(keys, [{"kid": "abc", "kty": "RSA"}])
+        response.raise_for_status.assert_called()
+
+    @patch('{}.http_client'.format(AUTHENTICATION_API_PATH))
+    def test_get_signing_keys_error(self, mock_http_client):
+        response = MagicMock()
+        response.raise_for_status.side_effect = Exception('test exception')
+        mock_http_client.for_request.return_value.get.return_value = response
+
+        with self.assertRaises(Exception):
+            AuthenticationApiService.get_signing_keys()
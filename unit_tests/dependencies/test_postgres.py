@@ -0,0 +1,105 @@
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+from sqlalchemy import exc
+from maintain_api.main import app
+from maintain_api.dependencies import postgres
+from maintain_api.exceptions import ApplicationError
+import datetime
+import psycopg2
+import threading
+
+POSTGRES_PATH = 'maintain_api.dependencies.postgres'
+TIMESTAMP = datetime.datetime(2018, 1, 2, 3, 4, 5)
+
+
+class TestPostgres(TestCase):
+
+    @patch('{}.db'.format(POSTGRES_PATH))
+    def test_select_current_timestamp(self, mock_db):
+        conn = mock_db.engine.connect.return_value
+        conn.execute.return_value.scalar.return_value = TIMESTAMP
+
+        with app.app_context():
+            timestamp, checkout_seconds = postgres.select_current_timestamp()
+
+        self.assertEqual(timestamp, TIMESTAMP)
+        self.assertGreaterEqual(checkout_seconds, 0)
+        conn.begin.return_value.rollback.assert_called()
+        conn.close.assert_called()
+        self.assertIn("statement_timeout", conn.execute.call_args_list[0][0][0])
+
+    @patch('{}.db'.format(POSTGRES_PATH))
+    def test_select_current_timestamp_stale_connection(self, mock_db):
+        stale = MagicMock()
+        stale.execute.side_effect = exc.OperationalError("SELECT", {}, psycopg2.OperationalError("closed"),
+                                                         connection_invalidated=True)
+        fresh = MagicMock()
+        fresh.execute.return_value.scalar.return_value = TIMESTAMP
+        mock_db.engine.connect.side_effect = [stale, fresh]
+
+        with app.app_context():
+            timestamp, checkout_seconds = postgres.select_current_timestamp()
+
+        self.assertEqual(timestamp, TIMESTAMP)
+        stale.close.assert_called()
+        fresh.close.assert_called()
+
+    @patch('{}.db'.format(POSTGRES_PATH))
+    def test_select_current_timestamp_error(self, mock_db):
+        mock_db.engine.connect.side_effect = exc.OperationalError("SELECT", {},
+                                                                  psycopg2.OperationalError("refused"))
+
+        with app.app_context():
+            with self.assertRaises(ApplicationError) as context:
+                postgres.select_current_timestamp()
+
+        self.assertEqual(context.exception.message, "Database error: refused")
+        self.assertEqual(mock_db.engine.connect.call_count, 1)
+
+    def test_checkout(self):
+        engine = MagicMock()
+
+        self.assertEqual(postgres.checkout(engine, 1), engine.connect.return_value)
+
+    def test_checkout_error(self):
+        engine = MagicMock()
+        engine.connect.side_effect = exc.TimeoutError("QueuePool limit reached")
+
+        with self.assertRaises(exc.TimeoutError):
+            postgres.checkout(engine, 1)
+
+    def test_checkout_timeout(self):
+        released = threading.Event()
+        connection = MagicMock()
+        connection.close.side_effect = released.set
+        engine = MagicMock()
+        engine.connect.side_effect = lambda: released.wait(0.1) or connection
+
+        with self.assertRaises(ApplicationError) as context:
+            postgres.checkout(engine, 0.01)
+
+        self.assertEqual(context.exception.message, "Database error: no pooled connection within 0.01 seconds")
+        # The connection that turns up too late goes back to the pool
+        self.assertTrue(released.wait(1))
+
+    @patch('{}.checkout'.format(POSTGRES_PATH))
+    @patch('{}.db'.format(POSTGRES_PATH))
+    def test_select_current_timestamp_checkout_timeout(self, mock_db, mock_checkout):
+        conn = mock_checkout.return_value
+        conn.execute.return_value.scalar.return_value = TIMESTAMP
+
+        with app.app_context():
+            postgres.select_current_timestamp()
+            timeout = app.config['HEALTH_CASCADE_PROBE_TIMEOUT_SECONDS']
+
+        mock_checkout.assert_called_with(mock_db.engine, timeout)
+        self.assertIn("= {:d}".format(int(timeout * 1000)), conn.execute.call_args_list[0][0][0])
+
+    @patch('{}.db'.format(POSTGRES_PATH))
+    def test_get_pool_status(self, mock_db):
+        mock_db.engine.pool.size.return_value = 5
+        mock_db.engine.pool.checkedout.return_value = 2
+        mock_db.engine.pool.overflow.return_value = -3
+        mock_db.engine.pool.checkedin.return_value = 1
+
+        self.assertEqual(postgres.get_pool_status(), {"size": 5, "checked_out": 2, "overflow": -3, "idle": 1})
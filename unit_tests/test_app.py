@@ -0,0 +1,161 @@
+from unittest import TestCase
+from unittest.mock import patch
+from maintain_api.main import app
+from maintain_api.app import before_request, jwt_cache
+from maintain_api.exceptions import ApplicationError
+from jwt_validation.exceptions import ValidationFailure
+import base64
+import json
+import time
+
+
+def build_authorization(claims):
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode('utf-8')).decode('ascii').rstrip('=')
+    return 'Bearer eyJhbGciOiJSUzI1NiJ9.{}.signature'.format(payload)
+
+
+class TestBeforeRequest(TestCase):
+
+    def setUp(self):
+        jwt_cache.invalidate()
+
+    @patch('maintain_api.app.validate')
+    def test_health_not_validated(self, mock_validate):
+        with app.test_request_context('/health'):
+            before_request()
+        mock_validate.assert_not_called()
+
+    @patch('maintain_api.app.validate')
+    def test_missing_authorization(self, mock_validate):
+        with app.test_request_context('/v1.0/maintain/categories'):
+            with self.assertRaises(ApplicationError) as context:
+                before_request()
+        self.assertEqual(context.exception.http_code, 401)
+        mock_validate.assert_not_called()
+
+    @patch('maintain_api.app.validate')
+    def test_validation_failure_not_cached(self, mock_validate):
+        mock_validate.side_effect = ValidationFailure("Invalid token")
+        headers = {'Authorization': build_authorization({'exp': time.time() + 600})}
+
+        for _ in range(2):
+            with app.test_request_context('/v1.0/maintain/categories', headers=headers):
+                with self.assertRaises(ApplicationError):
+                    before_request()
+
+        self.assertEqual(mock_validate.call_count, 2)
+        self.assertEqual(len(jwt_cache), 0)
+
+    @patch('maintain_api.app.validate')
+    def test_validation_cached(self, mock_validate):
+        headers = {'Authorization': build_authorization({'exp': time.time() + 600})}
+        hits = jwt_cache.hits
+
+        for _ in range(2):
+            with app.test_request_context('/v1.0/maintain/categories', headers=headers):
+                before_request()
+
+        mock_validate.assert_called_once()
+        self.assertEqual(jwt_cache.hits, hits + 1)
+
+    @patch('maintain_api.app.validate')
+    def test_token_without_expiry_not_cached(self, mock_validate):
+        headers = {'Authorization': 'Fake JWT'}
+
+        for _ in range(2):
+            with app.test_request_context('/v1.0/maintain/categories', headers=headers):
+                before_request()
+
+        self.assertEqual(mock_validate.call_count, 2)
+
+    @patch('maintain_api.app.validate')
+    def test_expired_token_not_cached(self, mock_validate):
+        headers = {'Authorization': build_authorization({'exp': time.time() - 1})}
+
+        with app.test_request_context('/v1.0/maintain/categories', headers=headers):
+            before_request()
+
+        self.assertEqual(len(jwt_cache), 0)
+
+    @patch('maintain_api.app.token_verifier')
+    @patch('maintain_api.app.validate')
+    def test_local_verification(self, mock_validate, mock_verifier):
+        mock_verifier.verify.return_value = True
+
+        with app.test_request_context('/v1.0/maintain/categories', headers={'Authorization': 'Bearer abc.def.ghi'}):
+            before_request()
+
+        mock_verifier.verify.assert_called_with('abc.def.ghi')
+        mock_validate.assert_not_called()
+
+    @patch('maintain_api.app.token_verifier')
+    @patch('maintain_api.app.validate')
+    def test_local_verification_inconclusive(self, mock_validate, mock_verifier):
+        mock_verifier.verify.return_value = False
+
+        with app.test_request_context('/v1.0/maintain/categories', headers={'Authorization': 'Bearer abc.def.ghi'}):
+            before_request()
+
+        mock_validate.assert_called()
+
+    @patch('maintain_api.app.token_verifier')
+    @patch('maintain_api.app.validate')
+    def test_local_verification_failure(self, mock_validate, mock_verifier):
+        mock_verifier.verify.side_effect = ApplicationError("Token has expired", "AUTH1", 401)
+
+        with app.test_request_context('/v1.0/maintain/categories', headers={'Authorization': 'Bearer abc.def.ghi'}):
+            with self.assertRaises(ApplicationError) as context:
+                before_request()
+
+        self.assertEqual(context.exception.http_code, 401)
+        mock_validate.assert_not_called()
+
+
+class TestServerTiming(TestCase):
+
+    def setUp(self):
+        jwt_cache.invalidate()
+        self.client = app.test_client()
+
+    @patch.dict(app.config, {'SERVER_TIMING': False})
+    def test_header_off(self):
+        response = self.client.get('/health')
+
+        self.assertNotIn('Server-Timing', response.headers)
+
+    @patch.dict(app.config, {'SERVER_TIMING': True})
+    def test_header_total(self):
+        response = self.client.get('/health')
+
+        self.assertRegex(response.headers['Server-Timing'], r'^total;dur=\d+\.\d\d$')
+
+    @patch.dict(app.config, {'SERVER_TIMING': True})
+    @patch('maintain_api.app.validate')
+    def test_header_auth(self, mock_validate):
+        # Fails after authentication, so nothing but the auth phase is recorded
+        response = self.client.get('/v1.0/maintain/unknown', headers={'Authorization': 'Fake JWT'})
+
+        mock_validate.assert_called()
+        self.assertRegex(response.headers['Server-Timing'], r'^auth;dur=\d+\.\d\d, total;dur=\d+\.\d\d$')
+
+
+class TestRequestCompleteLog(TestCase):
+
+    def setUp(self):
+        jwt_cache.invalidate()
+        self.client = app.test_client()
+
+    @patch('maintain_api.app.validate')
+    def test_request_logged(self, mock_validate):
+        with patch.object(app.logger, 'info') as mock_info:
+            self.client.get('/v1.0/maintain/unknown', headers={'Authorization': 'Fake JWT'})
+
+        self.assertIn("Request complete - status %s in %.1fms", [call[0][0] for call in mock_info.call_args_list])
+
+    def test_health_not_logged(self):
+        for path in ['/health', '/metrics']:
+            with patch.object(app.logger, 'info') as mock_info:
+                self.client.get(path)
+
+            self.assertNotIn("Request complete - status %s in %.1fms",
+                             [call[0][0] for call in mock_info.call_args_list])
@@ -3,6 +3,9 @@ from flask_testing import TestCase
 from flask import url_for
 from mock import patch
 from unittest.mock import MagicMock
+from maintain_api.utilities.reference_data import table_versions, CATEGORIES_TABLE
+from maintain_api.utilities.category_tree import category_tree, CategoryTree
+from maintain_api.views.v1_0.categories import categories_body_cache, category_tree_body_cache
 import json
 
 
@@ -11,18 +14,31 @@ class TestCategories(TestCase):
         main.app.testing = True
         return main.app
 
-    @patch('maintain_api.app.validate')
-    @patch('maintain_api.views.v1_0.categories.Categories')
-    def test_get_all_categories(self, mock_categories, mock_validate):
-        mock_category = MagicMock()
-        mock_category.name = "abc"
-        mock_category.display_name = "Display"
-        mock_category.permission = "test permission"
+    def setUp(self):
+        category_tree.invalidate()
+        categories_body_cache.invalidate()
+        category_tree_body_cache.invalidate()
+        # The versions committed to the database, by any process
+        self.versions = {}
 
-        mock_categories.query \
-            .filter.return_value \
-            .order_by.return_value \
-            .all.return_value = [mock_category]
+        def get_versions(*tables):
+            return '.'.join(str(self.versions.get(table, 0)) for table in tables)
+
+        def bump_versions(*tables):
+            for table in tables:
+                self.versions[table] = self.versions.get(table, 0) + 1
+
+        for patcher in [patch.object(table_versions, 'get', side_effect=get_versions),
+                        patch.object(table_versions, 'bump', side_effect=bump_versions)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.utilities.category_tree.load_category_tree')
+    def test_get_all_categories(self, mock_load, mock_validate):
+        mock_load.side_effect = lambda version: CategoryTree(
+            version, [(1, "abc", "Display", None, 1, "test permission"),
+                      (2, "child", "Child", 1, 1, None)], [], [])
 
         response = self.client.get(url_for('categories.get_all_categories'),
                                    headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
@@ -34,6 +50,92 @@ class TestCategories(TestCase):
         self.assertEqual("test permission", response.json[0]['permission'])
         mock_validate.assert_called()
 
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.utilities.category_tree.load_category_tree')
+    def test_get_all_categories_not_modified(self, mock_load, mock_validate):
+        mock_load.side_effect = lambda version: CategoryTree(
+            version, [(1, "abc", "Display", None, 1, "test permission")], [], [])
+
+        response = self.client.get(url_for('categories.get_all_categories'),
+                                   headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+        etag = response.headers['ETag']
+
+        response = self.client.get(url_for('categories.get_all_categories'),
+                                   headers={'Authorization': 'Fake JWT', 'If-None-Match': etag})
+
+        self.assertStatus(response, 304)
+        mock_load.assert_called_once()
+
+        # A new version with the same data, as another process would build, has the same ETag
+        self.versions[CATEGORIES_TABLE] = 1
+
+        response = self.client.get(url_for('categories.get_all_categories'),
+                                   headers={'Authorization': 'Fake JWT', 'If-None-Match': etag})
+
+        self.assertStatus(response, 304)
+        self.assertEqual(2, mock_load.call_count)
+
+        mock_load.side_effect = lambda version: CategoryTree(
+            version, [(1, "abc", "Changed", None, 1, "test permission")], [], [])
+        self.versions[CATEGORIES_TABLE] = 2
+
+        response = self.client.get(url_for('categories.get_all_categories'),
+                                   headers={'Authorization': 'Fake JWT', 'If-None-Match': etag})
+
+        self.assertStatus(response, 200)
+        self.assertNotEqual(etag, response.headers['ETag'])
+
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.utilities.category_tree.load_category_tree')
+    def test_get_all_categories_served_from_snapshot(self, mock_load, mock_validate):
+        mock_load.side_effect = lambda version: CategoryTree(
+            version, [(1, "abc", "Display", None, 1, "test permission")], [], [])
+
+        for _ in range(3):
+            response = self.client.get(url_for('categories.get_all_categories'),
+                                       headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+            self.assertStatus(response, 200)
+
+        mock_load.assert_called_once()
+
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.utilities.category_tree.load_category_tree')
+    def test_get_category_tree(self, mock_load, mock_validate):
+        mock_load.side_effect = lambda version: CategoryTree(
+            version, [(1, "abc", "Display", None, 1, "test permission"),
+                      (2, "child", "Child", 1, 1, None),
+                      (3, "grandchild", "Grandchild", 2, 1, None)],
+            [(2, "Provision")], [(3, "Instrument")])
+
+        response = self.client.get(url_for('categories.get_category_tree'),
+                                   headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+
+        self.assertStatus(response, 200)
+        self.assertEqual(1, len(response.json))
+        child = response.json[0]['sub-categories'][0]
+        self.assertEqual("child", child['name'])
+        self.assertEqual(["Provision"], child['statutory-provisions'])
+        self.assertEqual("grandchild", child['sub-categories'][0]['name'])
+        self.assertEqual(["Instrument"], child['sub-categories'][0]['instruments'])
+        self.assertEqual([], child['sub-categories'][0]['sub-categories'])
+        mock_validate.assert_called()
+
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.utilities.category_tree.load_category_tree')
+    def test_get_category_tree_not_modified(self, mock_load, mock_validate):
+        mock_load.side_effect = lambda version: CategoryTree(
+            version, [(1, "abc", "Display", None, 1, "test permission")], [], [])
+
+        response = self.client.get(url_for('categories.get_category_tree'),
+                                   headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+        etag = response.headers['ETag']
+
+        response = self.client.get(url_for('categories.get_category_tree'),
+                                   headers={'Authorization': 'Fake JWT', 'If-None-Match': etag})
+
+        self.assertStatus(response, 304)
+        mock_load.assert_called_once()
+
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.categories.Instruments')
     @patch('maintain_api.views.v1_0.categories.StatutoryProvision')
@@ -65,8 +167,8 @@ class TestCategories(TestCase):
         mock_db.session.commit.assert_called()
         mock_validate.assert_called()
         mock_categories.query.filter.return_value.first.assert_not_called()
-        mock_instruments.query.filter.return_value.first.assert_not_called()
-        mock_provisions.query.filter.return_value.first.assert_not_called()
+        mock_instruments.query.filter.return_value.all.assert_not_called()
+        mock_provisions.query.filter.return_value.all.assert_not_called()
 
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.categories.Instruments')
@@ -90,7 +192,8 @@ class TestCategories(TestCase):
 
         mock_provision = MagicMock()
         mock_provision.id = 1
-        mock_provisions.query.filter.return_value.first.return_value = mock_provision
+        mock_provision.title = "abc"
+        mock_provisions.query.filter.return_value.all.return_value = [mock_provision]
 
         response = self.client.post(url_for('categories.add_categories'),
                                     data=json.dumps(data),
@@ -102,9 +205,10 @@ class TestCategories(TestCase):
         mock_db.session.flush.assert_called()
         mock_db.session.commit.assert_called()
         mock_validate.assert_called()
-        mock_provisions.query.filter.return_value.first.assert_called()
+        mock_provisions.query.filter.return_value.all.assert_called_once()
+        mock_db.session.bulk_insert_mappings.assert_called_once()
         mock_categories.query.filter.return_value.first.assert_not_called()
-        mock_instruments.query.filter.return_value.first.assert_not_called()
+        mock_instruments.query.filter.return_value.all.assert_not_called()
 
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.categories.Instruments')
@@ -128,7 +232,8 @@ class TestCategories(TestCase):
 
         mock_instrument = MagicMock()
         mock_instrument.id = 1
-        mock_instruments.query.filter.return_value.first.return_value = mock_instrument
+        mock_instrument.name = "abc"
+        mock_instruments.query.filter.return_value.all.return_value = [mock_instrument]
 
         response = self.client.post(url_for('categories.add_categories'),
                                     data=json.dumps(data),
@@ -140,9 +245,10 @@ class TestCategories(TestCase):
         mock_db.session.flush.assert_called()
         mock_db.session.commit.assert_called()
         mock_validate.assert_called()
-        mock_instruments.query.filter.return_value.first.assert_called()
+        mock_instruments.query.filter.return_value.all.assert_called_once()
+        mock_db.session.bulk_insert_mappings.assert_called_once()
         mock_categories.query.filter.return_value.first.assert_not_called()
-        mock_provisions.query.filter.return_value.first.assert_not_called()
+        mock_provisions.query.filter.return_value.all.assert_not_called()
 
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.categories.Instruments')
@@ -175,8 +281,8 @@ class TestCategories(TestCase):
         mock_db.session.flush.assert_not_called()
         mock_db.session.commit.assert_not_called()
         mock_categories.query.filter.return_value.first.assert_not_called()
-        mock_instruments.query.filter.return_value.first.assert_not_called()
-        mock_provisions.query.filter.return_value.first.assert_not_called()
+        mock_instruments.query.filter.return_value.all.assert_not_called()
+        mock_provisions.query.filter.return_value.all.assert_not_called()
 
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.categories.Instruments')
@@ -209,8 +315,8 @@ class TestCategories(TestCase):
         mock_db.session.flush.assert_not_called()
         mock_db.session.commit.assert_not_called()
         mock_categories.query.filter.return_value.first.assert_not_called()
-        mock_instruments.query.filter.return_value.first.assert_not_called()
-        mock_provisions.query.filter.return_value.first.assert_not_called()
+        mock_instruments.query.filter.return_value.all.assert_not_called()
+        mock_provisions.query.filter.return_value.all.assert_not_called()
         mock_db.session.rollback.assert_called()
 
     @patch('maintain_api.app.validate')
@@ -233,7 +339,7 @@ class TestCategories(TestCase):
             .filter.return_value \
             .first.return_value = None
 
-        mock_instruments.query.filter.return_value.first.return_value = None
+        mock_instruments.query.filter.return_value.all.return_value = []
 
         response = self.client.post(url_for('categories.add_categories'),
                                     data=json.dumps(data),
@@ -241,13 +347,13 @@ class TestCategories(TestCase):
 
         self.assertStatus(response, 404)
 
-        mock_db.session.add.assert_called()
-        mock_db.session.flush.assert_called()
+        mock_db.session.add.assert_not_called()
+        mock_db.session.flush.assert_not_called()
         mock_db.session.commit.assert_not_called()
         mock_validate.assert_called()
-        mock_instruments.query.filter.return_value.first.assert_called()
+        mock_instruments.query.filter.return_value.all.assert_called_once()
         mock_categories.query.filter.return_value.first.assert_not_called()
-        mock_provisions.query.filter.return_value.first.assert_not_called()
+        mock_provisions.query.filter.return_value.all.assert_not_called()
         mock_db.session.rollback.assert_called()
 
     @patch('maintain_api.app.validate')
@@ -270,7 +376,7 @@ class TestCategories(TestCase):
             .filter.return_value \
             .first.return_value = None
 
-        mock_provisions.query.filter.return_value.first.return_value = None
+        mock_provisions.query.filter.return_value.all.return_value = []
 
         response = self.client.post(url_for('categories.add_categories'),
                                     data=json.dumps(data),
@@ -278,31 +384,21 @@ class TestCategories(TestCase):
 
         self.assertStatus(response, 404)
 
-        mock_db.session.add.assert_called()
-        mock_db.session.flush.assert_called()
+        mock_db.session.add.assert_not_called()
+        mock_db.session.flush.assert_not_called()
         mock_db.session.commit.assert_not_called()
         mock_validate.assert_called()
-        mock_provisions.query.filter.return_value.first.assert_called()
+        mock_provisions.query.filter.return_value.all.assert_called_once()
         mock_categories.query.filter.return_value.first.assert_not_called()
-        mock_instruments.query.filter.return_value.first.assert_not_called()
+        mock_instruments.query.filter.return_value.all.assert_not_called()
         mock_db.session.rollback.assert_called()
 
     @patch('maintain_api.app.validate')
-    @patch('maintain_api.views.v1_0.categories.Categories')
-    def test_get_category_no_sub_categories_or_mapping(self, mock_categories, mock_validate):
-
-        mock_category = MagicMock()
-        mock_category.id = 1
-        mock_category.name = "abc"
-        mock_category.display_name = "display"
-        mock_category.permission = "permission"
-        mock_category.parent_id = None
-        mock_category.provisions = []
-        mock_category.instruments = []
-
-        mock_categories.query.filter.return_value.filter.return_value.first.return_value = mock_category
+    @patch('maintain_api.utilities.category_tree.load_category_tree')
+    def test_get_category_no_sub_categories_or_mapping(self, mock_load, mock_validate):
 
-        mock_categories.query.filter.return_value.order_by.return_value.all.return_value = []
+        mock_load.side_effect = lambda version: CategoryTree(
+            version, [(1, "abc", "display", None, 1, "permission")], [], [])
 
         response = self.client.get(url_for('categories.get_category', category="abc"),
                                    headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
@@ -317,34 +413,17 @@ class TestCategories(TestCase):
         mock_validate.assert_called()
 
     @patch('maintain_api.app.validate')
-    @patch('maintain_api.views.v1_0.categories.Categories')
-    def test_get_category_with_all_mapping(self, mock_categories, mock_validate):
-
-        mock_provision_mapping = MagicMock()
-        mock_provision_mapping.provision.title = "abc"
-
-        mock_instrument_mapping = MagicMock()
-        mock_instrument_mapping.instrument.name = "def"
-
-        mock_category = MagicMock()
-        mock_category.id = 1
-        mock_category.name = "abc"
-        mock_category.display_name = "display"
-        mock_category.permission = "permission"
-        mock_category.parent_id = 1
-        mock_category.provisions = [mock_provision_mapping]
-        mock_category.instruments = [mock_instrument_mapping]
-
-        mock_sub_category = MagicMock()
-        mock_sub_category.name = "Child"
-        mock_sub_category.display_name = "child display"
-        mock_sub_category.permission = "child permission"
+    @patch('maintain_api.utilities.category_tree.load_category_tree')
+    def test_get_category_with_all_mapping(self, mock_load, mock_validate):
 
-        mock_categories.query.filter.return_value.filter.return_value.first.return_value = mock_category
-
-        mock_categories.query.filter.return_value.order_by.return_value.all.return_value = [mock_sub_category]
+        mock_load.side_effect = lambda version: CategoryTree(
+            version,
+            [(1, "abc", "display", None, 1, "permission"),
+             (2, "Child", "child display", 1, 1, "child permission")],
+            [(1, "abc")],
+            [(1, "def")])
 
-        response = self.client.get(url_for('categories.get_category', category="abc"),
+        response = self.client.get(url_for('categories.get_category', category="ABC"),
                                    headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
 
         self.assertStatus(response, 200)
@@ -359,10 +438,12 @@ class TestCategories(TestCase):
         mock_validate.assert_called()
 
     @patch('maintain_api.app.validate')
-    @patch('maintain_api.views.v1_0.categories.Categories')
-    def test_get_category_404(self, mock_categories, mock_validate):
+    @patch('maintain_api.utilities.category_tree.load_category_tree')
+    def test_get_category_404(self, mock_load, mock_validate):
 
-        mock_categories.query.filter.return_value.filter.return_value.first.return_value = None
+        # Sub-categories are not top level categories
+        mock_load.side_effect = lambda version: CategoryTree(
+            version, [(1, "parent", "display", None, 1, None), (2, "abc", "display", 1, 1, None)], [], [])
 
         response = self.client.get(url_for('categories.get_category', category="abc"),
                                    headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
@@ -389,22 +470,26 @@ class TestCategories(TestCase):
 
         mock_categories.query.filter.return_value.filter.return_value.first.return_value = mock_category
 
-        mock_categories.query\
-            .filter.return_value\
-            .all.return_value = [mock_sub_category1, mock_sub_category2]
+        mock_grandchild = MagicMock()
+        mock_grandchild.id = 4
+
+        # Ids found by the recursive query for the category's tree
+        mock_db.session.query.return_value.all.return_value = [
+            mock_category, mock_sub_category1, mock_sub_category2, mock_grandchild]
+        mock_categories.query.filter.return_value.delete.return_value = 4
 
         response = self.client.delete(url_for('categories.delete_category', category="abc"),
                                       headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
 
         self.assertStatus(response, 204)
-        mock_instruments.query.filter.return_value.delete.assert_called()
-        self.assertEqual(3, mock_instruments.query.filter.return_value.delete.call_count)
+        mock_instruments.category_id.in_.assert_called_with([1, 2, 3, 4])
+        mock_instruments.query.filter.return_value.delete.assert_called_once_with(synchronize_session=False)
 
-        mock_provisions.query.filter.return_value.delete.assert_called()
-        self.assertEqual(3, mock_provisions.query.filter.return_value.delete.call_count)
+        mock_provisions.category_id.in_.assert_called_with([1, 2, 3, 4])
+        mock_provisions.query.filter.return_value.delete.assert_called_once_with(synchronize_session=False)
 
-        mock_categories.query.filter.return_value.delete.assert_called()
-        self.assertEqual(3, mock_categories.query.filter.return_value.delete.call_count)
+        mock_categories.id.in_.assert_called_with([1, 2, 3, 4])
+        mock_categories.query.filter.return_value.delete.assert_called_once_with(synchronize_session=False)
 
         mock_db.session.commit.assert_called()
         mock_validate.assert_called()
@@ -422,14 +507,13 @@ class TestCategories(TestCase):
 
         mock_categories.query.filter.return_value.first.return_value = mock_category
 
-        mock_categories.query \
-            .filter.return_value \
-            .all.return_value = []
+        mock_db.session.query.return_value.all.return_value = [mock_category]
 
         response = self.client.delete(url_for('categories.delete_category', category="abc"),
                                       headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
 
         self.assertStatus(response, 204)
+        mock_instruments.category_id.in_.assert_called_with([1])
         mock_instruments.query.filter.return_value.delete.assert_called()
         self.assertEqual(1, mock_instruments.query.filter.return_value.delete.call_count)
 
@@ -498,16 +582,15 @@ class TestCategories(TestCase):
         self.assertStatus(response, 204)
 
         mock_db.session.commit.assert_called()
-        mock_prov_map.query.filter.return_value.delete.assert_called()
-        self.assertEqual(1, mock_prov_map.query.filter.return_value.delete.call_count)
-        mock_instrument_map.query.filter.return_value.delete.assert_called()
-        self.assertEqual(1, mock_instrument_map.query.filter.return_value.delete.call_count)
+        mock_prov_map.query.filter.return_value.delete.assert_not_called()
+        mock_instrument_map.query.filter.return_value.delete.assert_not_called()
         mock_categories.query.filter.return_value.filter.return_value.first.assert_called()
         self.assertEqual(1, mock_categories.query.filter.return_value.filter.return_value.first.call_count)
 
+        mock_db.session.bulk_insert_mappings.assert_not_called()
         mock_validate.assert_called()
-        mock_instruments.query.filter.return_value.first.assert_not_called()
-        mock_provisions.query.filter.return_value.first.assert_not_called()
+        mock_instruments.query.filter.return_value.all.assert_not_called()
+        mock_provisions.query.filter.return_value.all.assert_not_called()
 
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.categories.CategoryInstrumentsMapping')
@@ -537,13 +620,15 @@ class TestCategories(TestCase):
 
         mock_stat_prov = MagicMock()
         mock_stat_prov.id = 1
+        mock_stat_prov.title = "abc"
         mock_instrument = MagicMock()
-        mock_instrument.id = 1
+        mock_instrument.id = 2
+        mock_instrument.name = "def"
 
         mock_categories.query.filter.return_value.filter.return_value.first.return_value = mock_category
 
-        mock_instruments.query.filter.return_value.first.return_value = mock_instrument
-        mock_provisions.query.filter.return_value.first.return_value = mock_stat_prov
+        mock_instruments.query.filter.return_value.all.return_value = [mock_instrument]
+        mock_provisions.query.filter.return_value.all.return_value = [mock_stat_prov]
 
         response = self.client.put(url_for('categories.update_category', category_name="Planning"),
                                    data=json.dumps(data),
@@ -552,16 +637,78 @@ class TestCategories(TestCase):
         self.assertStatus(response, 204)
 
         mock_db.session.commit.assert_called()
-        mock_prov_map.query.filter.return_value.delete.assert_called()
-        self.assertEqual(1, mock_prov_map.query.filter.return_value.delete.call_count)
-        mock_instrument_map.query.filter.return_value.delete.assert_called()
-        self.assertEqual(1, mock_instrument_map.query.filter.return_value.delete.call_count)
+        mock_prov_map.query.filter.return_value.delete.assert_not_called()
+        mock_instrument_map.query.filter.return_value.delete.assert_not_called()
         mock_categories.query.filter.return_value.filter.return_value.first.assert_called()
         self.assertEqual(1, mock_categories.query.filter.return_value.filter.return_value.first.call_count)
 
         mock_validate.assert_called()
-        mock_instruments.query.filter.return_value.first.assert_called()
-        mock_provisions.query.filter.return_value.first.assert_called()
+        mock_instruments.query.filter.return_value.all.assert_called_once()
+        mock_provisions.query.filter.return_value.all.assert_called_once()
+        mock_db.session.bulk_insert_mappings.assert_any_call(
+            mock_prov_map, [{"category_id": 1, "statutory_provision_id": 1}])
+        mock_db.session.bulk_insert_mappings.assert_any_call(
+            mock_instrument_map, [{"category_id": 1, "instruments_id": 2}])
+
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.views.v1_0.categories.CategoryInstrumentsMapping')
+    @patch('maintain_api.views.v1_0.categories.CategoryStatProvisionMapping')
+    @patch('maintain_api.views.v1_0.categories.Instruments')
+    @patch('maintain_api.views.v1_0.categories.StatutoryProvision')
+    @patch('maintain_api.views.v1_0.categories.db')
+    @patch('maintain_api.views.v1_0.categories.Categories')
+    def test_update_category_changed_maps(self, mock_categories, mock_db, mock_provisions, mock_instruments,
+                                          mock_prov_map, mock_instrument_map, mock_validate):
+
+        data = {"name": "Planning",
+                "display-name": "Planning",
+                "display-order": 11,
+                "permission": None,
+                "provisions": ["abc", "ghi"],
+                "instruments": ["def"]}
+
+        mock_current_prov_1 = MagicMock()
+        mock_current_prov_1.statutory_provision_id = 1
+        mock_current_prov_2 = MagicMock()
+        mock_current_prov_2.statutory_provision_id = 3
+        mock_current_instrument = MagicMock()
+        mock_current_instrument.instruments_id = 2
+
+        mock_category = MagicMock()
+        mock_category.id = 1
+        mock_category.name = "Planning"
+        mock_category.provisions = [mock_current_prov_1, mock_current_prov_2]
+        mock_category.instruments = [mock_current_instrument]
+
+        mock_stat_prov_1 = MagicMock()
+        mock_stat_prov_1.id = 1
+        mock_stat_prov_1.title = "abc"
+        mock_stat_prov_2 = MagicMock()
+        mock_stat_prov_2.id = 4
+        mock_stat_prov_2.title = "ghi"
+        mock_instrument = MagicMock()
+        mock_instrument.id = 2
+        mock_instrument.name = "def"
+
+        mock_categories.query.filter.return_value.filter.return_value.first.return_value = mock_category
+
+        mock_instruments.query.filter.return_value.all.return_value = [mock_instrument]
+        mock_provisions.query.filter.return_value.all.return_value = [mock_stat_prov_1, mock_stat_prov_2]
+
+        response = self.client.put(url_for('categories.update_category', category_name="Planning"),
+                                   data=json.dumps(data),
+                                   headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+
+        self.assertStatus(response, 204)
+
+        # Only the provision that is no longer wanted is deleted, and only the new one inserted
+        mock_prov_map.statutory_provision_id.in_.assert_called_once_with([3])
+        mock_prov_map.query.filter.return_value.delete.assert_called_once_with(synchronize_session=False)
+        mock_instrument_map.query.filter.return_value.delete.assert_not_called()
+        mock_db.session.bulk_insert_mappings.assert_called_once_with(
+            mock_prov_map, [{"category_id": 1, "statutory_provision_id": 4}])
+        mock_db.session.commit.assert_called()
+        mock_validate.assert_called()
 
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.categories.CategoryInstrumentsMapping')
@@ -599,8 +746,8 @@ class TestCategories(TestCase):
         self.assertEqual(0, mock_categories.query.filter.return_value.first.call_count)
 
         mock_validate.assert_called()
-        mock_instruments.query.filter.return_value.first.assert_not_called()
-        mock_provisions.query.filter.return_value.first.assert_not_called()
+        mock_instruments.query.filter.return_value.all.assert_not_called()
+        mock_provisions.query.filter.return_value.all.assert_not_called()
 
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.categories.CategoryInstrumentsMapping')
@@ -638,8 +785,8 @@ class TestCategories(TestCase):
         self.assertEqual(1, mock_categories.query.filter.return_value.filter.return_value.first.call_count)
 
         mock_validate.assert_called()
-        mock_instruments.query.filter.return_value.first.assert_not_called()
-        mock_provisions.query.filter.return_value.first.assert_not_called()
+        mock_instruments.query.filter.return_value.all.assert_not_called()
+        mock_provisions.query.filter.return_value.all.assert_not_called()
 
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.categories.CategoryInstrumentsMapping')
@@ -669,11 +816,12 @@ class TestCategories(TestCase):
 
         mock_stat_prov = MagicMock()
         mock_stat_prov.id = 1
+        mock_stat_prov.title = "abc"
 
         mock_categories.query.filter.return_value.filter.return_value.first.return_value = mock_category
 
-        mock_instruments.query.filter.return_value.first.return_value = None
-        mock_provisions.query.filter.return_value.first.return_value = mock_stat_prov
+        mock_instruments.query.filter.return_value.all.return_value = []
+        mock_provisions.query.filter.return_value.all.return_value = [mock_stat_prov]
 
         response = self.client.put(url_for('categories.update_category', category_name="Planning"),
                                    data=json.dumps(data),
@@ -683,16 +831,14 @@ class TestCategories(TestCase):
 
         mock_db.session.flush.assert_not_called()
         mock_db.session.commit.assert_not_called()
-        mock_prov_map.query.filter.return_value.delete.assert_called()
-        self.assertEqual(1, mock_prov_map.query.filter.return_value.delete.call_count)
-        mock_instrument_map.query.filter.return_value.delete.assert_called()
-        self.assertEqual(1, mock_instrument_map.query.filter.return_value.delete.call_count)
+        mock_prov_map.query.filter.return_value.delete.assert_not_called()
+        mock_instrument_map.query.filter.return_value.delete.assert_not_called()
         mock_categories.query.filter.return_value.filter.return_value.first.assert_called()
         self.assertEqual(1, mock_categories.query.filter.return_value.filter.return_value.first.call_count)
 
         mock_validate.assert_called()
-        mock_instruments.query.filter.return_value.first.assert_called()
-        mock_provisions.query.filter.return_value.first.assert_called()
+        mock_instruments.query.filter.return_value.all.assert_called_once()
+        mock_provisions.query.filter.return_value.all.assert_called_once()
 
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.categories.CategoryInstrumentsMapping')
@@ -722,11 +868,12 @@ class TestCategories(TestCase):
 
         mock_instrument = MagicMock()
         mock_instrument.id = 1
+        mock_instrument.name = "def"
 
         mock_categories.query.filter.return_value.filter.return_value.first.return_value = mock_category
 
-        mock_instruments.query.filter.return_value.first.return_value = mock_instrument
-        mock_provisions.query.filter.return_value.first.return_value = None
+        mock_instruments.query.filter.return_value.all.return_value = [mock_instrument]
+        mock_provisions.query.filter.return_value.all.return_value = []
 
         response = self.client.put(url_for('categories.update_category', category_name="Planning"),
                                    data=json.dumps(data),
@@ -736,16 +883,14 @@ class TestCategories(TestCase):
 
         mock_db.session.flush.assert_not_called()
         mock_db.session.commit.assert_not_called()
-        mock_prov_map.query.filter.return_value.delete.assert_called()
-        self.assertEqual(1, mock_prov_map.query.filter.return_value.delete.call_count)
-        mock_instrument_map.query.filter.return_value.delete.assert_called()
-        self.assertEqual(1, mock_instrument_map.query.filter.return_value.delete.call_count)
+        mock_prov_map.query.filter.return_value.delete.assert_not_called()
+        mock_instrument_map.query.filter.return_value.delete.assert_not_called()
         mock_categories.query.filter.return_value.filter.return_value.first.assert_called()
         self.assertEqual(1, mock_categories.query.filter.return_value.filter.return_value.first.call_count)
 
         mock_validate.assert_called()
-        mock_instruments.query.filter.return_value.first.assert_not_called()
-        mock_provisions.query.filter.return_value.first.assert_called()
+        mock_instruments.query.filter.return_value.all.assert_called_once()
+        mock_provisions.query.filter.return_value.all.assert_called_once()
 
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.categories.CategoryInstrumentsMapping')
@@ -778,8 +923,8 @@ class TestCategories(TestCase):
 
         mock_categories.query.filter.return_value.filter.return_value.first.return_value = mock_category
 
-        mock_instruments.query.filter.return_value.first.return_value = mock_instrument
-        mock_provisions.query.filter.return_value.first.return_value = None
+        mock_instruments.query.filter.return_value.all.return_value = [mock_instrument]
+        mock_provisions.query.filter.return_value.all.return_value = []
 
         response = self.client.put(url_for('categories.update_category', category_name="Planning"),
                                    data=json.dumps(data),
@@ -797,8 +942,8 @@ class TestCategories(TestCase):
         self.assertEqual(2, mock_categories.query.filter.return_value.filter.return_value.first.call_count)
 
         mock_validate.assert_called()
-        mock_instruments.query.filter.return_value.first.assert_not_called()
-        mock_provisions.query.filter.return_value.first.assert_not_called()
+        mock_instruments.query.filter.return_value.all.assert_not_called()
+        mock_provisions.query.filter.return_value.all.assert_not_called()
 
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.categories.db')
@@ -878,11 +1023,12 @@ class TestCategories(TestCase):
         mock_validate.assert_called()
 
     @patch('maintain_api.app.validate')
+    @patch('maintain_api.views.v1_0.categories.Instruments')
     @patch('maintain_api.views.v1_0.categories.StatutoryProvision')
     @patch('maintain_api.views.v1_0.categories.db')
     @patch('maintain_api.views.v1_0.categories.Categories')
     def test_add_sub_category_provision_does_not_exist(self, mock_categories, mock_db, mock_provisions,
-                                                       mock_validate):
+                                                       mock_instruments, mock_validate):
 
         data = {"name": "New",
                 "display-name": "Planning",
@@ -893,7 +1039,12 @@ class TestCategories(TestCase):
 
         mock_categories.query.filter.return_value.filter.return_value.first.side_effect = [MagicMock(), None]
 
-        mock_provisions.query.filter.return_value.first.return_value = None
+        mock_provisions.query.filter.return_value.all.return_value = []
+
+        mock_instrument = MagicMock()
+        mock_instrument.id = 2
+        mock_instrument.name = "def"
+        mock_instruments.query.filter.return_value.all.return_value = [mock_instrument]
 
         response = self.client.post(url_for('categories.create_sub_category', category="Planning"),
                                     data=json.dumps(data),
@@ -901,10 +1052,11 @@ class TestCategories(TestCase):
 
         self.assertStatus(response, 404)
 
-        mock_db.session.flush.assert_called()
+        mock_db.session.flush.assert_not_called()
         mock_db.session.commit.assert_not_called()
         mock_categories.query.filter.return_value.filter.return_value.first.assert_called()
         self.assertEqual(2, mock_categories.query.filter.return_value.filter.return_value.first.call_count)
+        self.assertEqual("Statutory provision 'abc' does not exist.", response.json["error_message"])
         mock_validate.assert_called()
 
     @patch('maintain_api.app.validate')
@@ -927,8 +1079,12 @@ class TestCategories(TestCase):
 
         mock_categories.query.filter.return_value.filter.return_value.first.side_effect = [MagicMock(), None]
 
-        mock_instruments.query.filter.return_value.first.return_value = None
-        mock_provisions.query.filter.return_value.first.return_value = MagicMock()
+        mock_instruments.query.filter.return_value.all.return_value = []
+
+        mock_provision = MagicMock()
+        mock_provision.id = 1
+        mock_provision.title = "abc"
+        mock_provisions.query.filter.return_value.all.return_value = [mock_provision]
 
         response = self.client.post(url_for('categories.create_sub_category', category="Planning"),
                                     data=json.dumps(data),
@@ -936,16 +1092,15 @@ class TestCategories(TestCase):
 
         self.assertStatus(response, 404)
 
-        mock_db.session.flush.assert_called()
+        mock_db.session.flush.assert_not_called()
         mock_db.session.commit.assert_not_called()
         mock_categories.query.filter.return_value.filter.return_value.first.assert_called()
         self.assertEqual(2, mock_categories.query.filter.return_value.filter.return_value.first.call_count)
-        mock_provisions.query.filter.return_value.first.assert_called()
-        mock_instruments.query.filter.return_value.first.assert_called()
-        mock_db.session.add.assert_called()
+        mock_provisions.query.filter.return_value.all.assert_called_once()
+        mock_instruments.query.filter.return_value.all.assert_called_once()
+        mock_db.session.add.assert_not_called()
         mock_validate.assert_called()
-        mock_prov_map.assert_called()
-        mock_instrument_map.assert_not_called()
+        mock_db.session.bulk_insert_mappings.assert_not_called()
 
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.categories.CategoryInstrumentsMapping')
@@ -966,8 +1121,15 @@ class TestCategories(TestCase):
 
         mock_categories.query.filter.return_value.filter.return_value.first.side_effect = [MagicMock(), None]
 
-        mock_provisions.query.filter.return_value.first.return_value = MagicMock()
-        mock_instruments.query.filter.return_value.first.return_value = MagicMock()
+        mock_provision = MagicMock()
+        mock_provision.id = 1
+        mock_provision.title = "abc"
+        mock_provisions.query.filter.return_value.all.return_value = [mock_provision]
+
+        mock_instrument = MagicMock()
+        mock_instrument.id = 2
+        mock_instrument.name = "def"
+        mock_instruments.query.filter.return_value.all.return_value = [mock_instrument]
 
         response = self.client.post(url_for('categories.create_sub_category', category="Planning"),
                                     data=json.dumps(data),
@@ -979,76 +1141,55 @@ class TestCategories(TestCase):
         mock_db.session.commit.assert_called()
         mock_categories.query.filter.return_value.filter.return_value.first.assert_called()
         self.assertEqual(2, mock_categories.query.filter.return_value.filter.return_value.first.call_count)
-        mock_provisions.query.filter.return_value.first.assert_called()
-        mock_instruments.query.filter.return_value.first.assert_called()
+        mock_provisions.query.filter.return_value.all.assert_called_once()
+        mock_instruments.query.filter.return_value.all.assert_called_once()
         mock_db.session.add.assert_called()
         mock_validate.assert_called()
-        mock_prov_map.assert_called()
-        mock_instrument_map.assert_called()
+        mock_db.session.bulk_insert_mappings.assert_any_call(
+            mock_prov_map, [{"category_id": mock_categories.return_value.id, "statutory_provision_id": 1}])
+        mock_db.session.bulk_insert_mappings.assert_any_call(
+            mock_instrument_map, [{"category_id": mock_categories.return_value.id, "instruments_id": 2}])
 
     @patch('maintain_api.app.validate')
-    @patch('maintain_api.views.v1_0.categories.Categories')
-    def test_get_sub_category_parent_does_not_exist(self, mock_categories, mock_validate):
+    @patch('maintain_api.utilities.category_tree.load_category_tree')
+    def test_get_sub_category_parent_does_not_exist(self, mock_load, mock_validate):
 
-        mock_categories.query.filter.return_value.filter.return_value.first.side_effect = [None, None]
+        mock_load.side_effect = lambda version: CategoryTree(version, [], [], [])
 
         response = self.client.get(url_for('categories.get_sub_category', category="Planning", sub_category="abc"),
                                    headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
 
         self.assertStatus(response, 404)
-
-        mock_categories.query.filter.return_value.filter.return_value.first.assert_called()
-        self.assertEqual(1, mock_categories.query.filter.return_value.filter.return_value.first.call_count)
+        self.assertIn("Category 'Planning' not found.", response.data.decode())
         mock_validate.assert_called()
 
     @patch('maintain_api.app.validate')
-    @patch('maintain_api.views.v1_0.categories.Categories')
-    def test_get_sub_category_does_not_exist(self, mock_categories, mock_validate):
+    @patch('maintain_api.utilities.category_tree.load_category_tree')
+    def test_get_sub_category_does_not_exist(self, mock_load, mock_validate):
 
-        mock_categories.query.filter.return_value.filter.return_value.first.side_effect = [MagicMock(), None]
+        mock_load.side_effect = lambda version: CategoryTree(
+            version, [(1, "Planning", "Planning", None, 1, None)], [], [])
 
         response = self.client.get(url_for('categories.get_sub_category', category="Planning", sub_category="abc"),
                                    headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
 
         self.assertStatus(response, 404)
-
-        mock_categories.query.filter.return_value.filter.return_value.first.assert_called()
-        self.assertEqual(2, mock_categories.query.filter.return_value.filter.return_value.first.call_count)
+        self.assertIn("Sub-category 'abc' not found for parent 'Planning'", response.data.decode())
         mock_validate.assert_called()
 
     @patch('maintain_api.app.validate')
-    @patch('maintain_api.views.v1_0.categories.Categories')
-    def test_get_sub_category_successful(self, mock_categories, mock_validate):
-
-        mock_provision_mapping = MagicMock()
-        mock_provision_mapping.provision.title = "abc"
-
-        mock_instrument_mapping = MagicMock()
-        mock_instrument_mapping.instrument.name = "def"
-
-        mock_parent = MagicMock()
-        mock_parent.id = 1
-        mock_parent.name = "parent"
-
-        mock_category = MagicMock()
-        mock_category.id = 1
-        mock_category.name = "abc"
-        mock_category.display_name = "display"
-        mock_category.permission = "permission"
-        mock_category.parent_id = 1
-        mock_category.provisions = [mock_provision_mapping]
-        mock_category.instruments = [mock_instrument_mapping]
-
-        mock_sub_category = MagicMock()
-        mock_sub_category.name = "Child"
-        mock_sub_category.display_name = "child display"
-        mock_sub_category.permission = "child permission"
-
-        mock_categories.query.filter.return_value.filter.return_value.first.side_effect = [mock_parent, mock_category]
-
-        mock_categories.query.filter.return_value.order_by.return_value.all.return_value = [mock_sub_category]
-
-        response = self.client.get(url_for('categories.get_sub_category', category="Planning", sub_category="abc"),
+    @patch('maintain_api.utilities.category_tree.load_category_tree')
+    def test_get_sub_category_successful(self, mock_load, mock_validate):
+
+        mock_load.side_effect = lambda version: CategoryTree(
+            version,
+            [(1, "parent", "parent display", None, 1, None),
+             (2, "abc", "display", 1, 1, "permission"),
+             (3, "Child", "child display", 2, 1, "child permission")],
+            [(2, "abc")],
+            [(2, "def")])
+
+        response = self.client.get(url_for('categories.get_sub_category', category="Parent", sub_category="abc"),
                                    headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
 
         self.assertStatus(response, 200)
@@ -1061,10 +1202,7 @@ class TestCategories(TestCase):
         self.assertEqual("Child", response.json["sub-categories"][0]['name'])
         self.assertEqual("child display", response.json["sub-categories"][0]['display-name'])
         self.assertEqual("child permission", response.json["sub-categories"][0]['permission'])
-
-        mock_categories.query.filter.return_value.filter.return_value.first.assert_called()
-        self.assertEqual(2, mock_categories.query.filter.return_value.filter.return_value.first.call_count)
-        mock_categories.query.filter.return_value.order_by.return_value.all.assert_called()
+        self.assertEqual("parent", response.json["parent"])
         mock_validate.assert_called()
 
     @patch('maintain_api.app.validate')
@@ -1216,8 +1354,8 @@ class TestCategories(TestCase):
         mock_categories.query.filter.return_value.filter.return_value.first.side_effect = [
             mock_parent, mock_category, MagicMock()]
 
-        mock_provisions.query.filter.return_value.first.return_value = None
-        mock_instruments.query.filter.return_value.first.return_value = None
+        mock_provisions.query.filter.return_value.all.return_value = []
+        mock_instruments.query.filter.return_value.all.return_value = []
 
         data = {"name": "New",
                 "display-name": "Planning",
@@ -1231,14 +1369,15 @@ class TestCategories(TestCase):
                                    headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
 
         self.assertStatus(response, 404)
+        self.assertEqual("Statutory provision 'abc' does not exist. Instrument 'def' does not exist.",
+                         response.json["error_message"])
 
         mock_categories.query.filter.return_value.filter.return_value.first.assert_called()
         mock_validate.assert_called()
         mock_db.session.rollback.assert_called()
-        mock_provisions.query.filter.return_value.first.assert_called()
-        mock_instruments.query.filter.return_value.first.assert_not_called()
-        mock_prov_map.assert_not_called()
-        mock_instrument_map.assert_not_called()
+        mock_provisions.query.filter.return_value.all.assert_called_once()
+        mock_instruments.query.filter.return_value.all.assert_called_once()
+        mock_db.session.bulk_insert_mappings.assert_not_called()
 
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.categories.CategoryInstrumentsMapping')
@@ -1273,8 +1412,12 @@ class TestCategories(TestCase):
         mock_categories.query.filter.return_value.filter.return_value.first.side_effect = [
             mock_parent, mock_category, MagicMock()]
 
-        mock_provisions.query.filter.return_value.first.return_value = MagicMock()
-        mock_instruments.query.filter.return_value.first.return_value = None
+        mock_provision = MagicMock()
+        mock_provision.id = 1
+        mock_provision.title = "abc"
+        mock_provisions.query.filter.return_value.all.return_value = [mock_provision]
+
+        mock_instruments.query.filter.return_value.all.return_value = []
 
         data = {"name": "New",
                 "display-name": "Planning",
@@ -1292,10 +1435,9 @@ class TestCategories(TestCase):
         mock_categories.query.filter.return_value.filter.return_value.first.assert_called()
         mock_validate.assert_called()
         mock_db.session.rollback.assert_called()
-        mock_provisions.query.filter.return_value.first.assert_called()
-        mock_instruments.query.filter.return_value.first.assert_called()
-        mock_prov_map.assert_called()
-        mock_instrument_map.assert_not_called()
+        mock_provisions.query.filter.return_value.all.assert_called_once()
+        mock_instruments.query.filter.return_value.all.assert_called_once()
+        mock_db.session.bulk_insert_mappings.assert_not_called()
 
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.categories.CategoryInstrumentsMapping')
@@ -1329,8 +1471,15 @@ class TestCategories(TestCase):
         mock_categories.query.filter.return_value.filter.return_value.first.side_effect = [
             mock_parent, mock_category, MagicMock()]
 
-        mock_provisions.query.filter.return_value.first.return_value = MagicMock()
-        mock_instruments.query.filter.return_value.first.return_value = MagicMock()
+        mock_provision = MagicMock()
+        mock_provision.id = 1
+        mock_provision.title = "abc"
+        mock_provisions.query.filter.return_value.all.return_value = [mock_provision]
+
+        mock_instrument = MagicMock()
+        mock_instrument.id = 2
+        mock_instrument.name = "def"
+        mock_instruments.query.filter.return_value.all.return_value = [mock_instrument]
 
         data = {"name": "New",
                 "display-name": "Planning",
@@ -1348,10 +1497,12 @@ class TestCategories(TestCase):
         mock_categories.query.filter.return_value.filter.return_value.first.assert_called()
         mock_validate.assert_called()
         mock_db.session.rollback.assert_not_called()
-        mock_provisions.query.filter.return_value.first.assert_called()
-        mock_instruments.query.filter.return_value.first.assert_called()
-        mock_prov_map.assert_called()
-        mock_instrument_map.assert_called()
+        mock_provisions.query.filter.return_value.all.assert_called_once()
+        mock_instruments.query.filter.return_value.all.assert_called_once()
+        mock_db.session.bulk_insert_mappings.assert_any_call(
+            mock_prov_map, [{"category_id": 1, "statutory_provision_id": 1}])
+        mock_db.session.bulk_insert_mappings.assert_any_call(
+            mock_instrument_map, [{"category_id": 1, "instruments_id": 2}])
 
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.categories.db')
@@ -1417,7 +1568,7 @@ class TestCategories(TestCase):
         mock_category.instruments = [mock_instrument_mapping]
 
         mock_categories.query.filter.return_value.filter.return_value.first.side_effect = [mock_parent, mock_category]
-        mock_categories.query.filter.return_value.all.return_value = []
+        mock_db.session.query.return_value.all.return_value = [mock_category]
 
         response = self.client.delete(url_for('categories.delete_sub_category',
                                               category="Planning", sub_category="abc"),
@@ -1430,6 +1581,7 @@ class TestCategories(TestCase):
         mock_validate.assert_called()
         mock_db.session.rollback.assert_not_called()
 
+        mock_prov_map.category_id.in_.assert_called_with([1])
         mock_prov_map.query.filter.return_value.delete.assert_called()
         self.assertEqual(1, mock_prov_map.query.filter.return_value.delete.call_count)
         mock_instrument_map.query.filter.return_value.delete.assert_called()
@@ -1463,13 +1615,13 @@ class TestCategories(TestCase):
         mock_category.instruments = [mock_instrument_mapping]
 
         mock_child1 = MagicMock()
-        mock_child1.id = 1
+        mock_child1.id = 2
 
         mock_child2 = MagicMock()
-        mock_child2.id = 2
+        mock_child2.id = 3
 
         mock_categories.query.filter.return_value.filter.return_value.first.side_effect = [mock_parent, mock_category]
-        mock_categories.query.filter.return_value.all.return_value = [mock_child1, mock_child2]
+        mock_db.session.query.return_value.all.return_value = [mock_category, mock_child1, mock_child2]
 
         response = self.client.delete(url_for('categories.delete_sub_category',
                                               category="Planning", sub_category="abc"),
@@ -1482,7 +1634,9 @@ class TestCategories(TestCase):
         mock_validate.assert_called()
         mock_db.session.rollback.assert_not_called()
 
-        mock_prov_map.query.filter.return_value.delete.assert_called()
-        self.assertEqual(3, mock_prov_map.query.filter.return_value.delete.call_count)
-        mock_instrument_map.query.filter.return_value.delete.assert_called()
-        self.assertEqual(3, mock_instrument_map.query.filter.return_value.delete.call_count)
+        mock_prov_map.category_id.in_.assert_called_with([1, 2, 3])
+        mock_prov_map.query.filter.return_value.delete.assert_called_once_with(synchronize_session=False)
+        mock_instrument_map.category_id.in_.assert_called_with([1, 2, 3])
+        mock_instrument_map.query.filter.return_value.delete.assert_called_once_with(synchronize_session=False)
+        mock_categories.id.in_.assert_called_with([1, 2, 3])
+        mock_categories.query.filter.return_value.delete.assert_called_once_with(synchronize_session=False)
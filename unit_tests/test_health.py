@@ -1,4 +1,10 @@
+from flask import g
 from maintain_api.main import app
+from maintain_api.config import HEALTH_CASCADE_UNHEALTHY_CACHE_SECONDS
+from maintain_api.views.general import check_database, check_service, timed_out, get_cascade, cascade_cache, \
+    run_probes
+from unittest.mock import patch, MagicMock
+import datetime
 import unittest
 
 
@@ -6,6 +12,144 @@ class TestHealth(unittest.TestCase):
 
     def setUp(self):
         self.app = app.test_client()
+        cascade_cache.invalidate()
 
     def test_health(self):
         self.assertEqual((self.app.get('/health')).status_code, 200)
+
+    def test_metrics(self):
+        self.app.get('/health')
+        response = self.app.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/plain')
+        body = response.get_data(as_text=True)
+        self.assertIn('maintain_api_http_requests_total{endpoint="general.check_status",method="GET",status="200"}',
+                      body)
+        self.assertIn('maintain_api_http_request_duration_seconds_count{endpoint="general.check_status",method="GET"}',
+                      body)
+
+    @patch('maintain_api.views.general.postgres')
+    def test_check_database(self, mock_postgres):
+        mock_postgres.select_current_timestamp.return_value = datetime.datetime(2018, 1, 2, 3, 4, 5, 678901), 0.0015
+        mock_postgres.get_pool_status.return_value = {"size": 5, "checked_out": 1, "overflow": -4, "idle": 0}
+
+        result, ok, error = check_database(app, "postgres")
+
+        self.assertTrue(ok)
+        self.assertIsNone(error)
+        self.assertEqual(result, {"name": "postgres", "status": "OK", "current_timestamp": "2018-01-02T03:04:05.678Z",
+                                  "pool": {"size": 5, "checked_out": 1, "overflow": -4, "idle": 0,
+                                           "wait_time_ms": 1.5}})
+
+    @patch('maintain_api.views.general.postgres')
+    def test_check_database_error(self, mock_postgres):
+        mock_postgres.select_current_timestamp.side_effect = Exception("test exception")
+        mock_postgres.get_pool_status.return_value = {"size": 5, "checked_out": 5, "overflow": 10, "idle": 0}
+
+        result, ok, error = check_database(app, "postgres")
+
+        self.assertFalse(ok)
+        self.assertIn("test exception", error)
+        self.assertEqual(result, {"name": "postgres", "status": "BAD",
+                                  "pool": {"size": 5, "checked_out": 5, "overflow": 10, "idle": 0}})
+
+    def test_check_service(self):
+        requester = MagicMock()
+        requester.get.return_value.status_code = 200
+        requester.get.return_value.headers = {"content-type": "application/json"}
+        requester.get.return_value.json.return_value = {"status": "OK"}
+
+        result, ok, error = check_service(requester, "mint-api", "http://mint-api/health/cascade/0", 4)
+
+        self.assertTrue(ok)
+        self.assertIsNone(error)
+        self.assertEqual(result["status"], "OK")
+        self.assertEqual(result["content"], {"status": "OK"})
+        requester.get.assert_called_with("http://mint-api/health/cascade/0", timeout=4)
+
+    def test_check_service_bad(self):
+        requester = MagicMock()
+        requester.get.return_value.status_code = 500
+        requester.get.return_value.headers = {"content-type": "application/json"}
+
+        result, ok, error = check_service(requester, "mint-api", "http://mint-api/health/cascade/0", 4)
+
+        self.assertFalse(ok)
+        self.assertEqual(result["status"], "BAD")
+
+    def test_check_service_error(self):
+        requester = MagicMock()
+        requester.get.side_effect = Exception("test exception")
+
+        result, ok, error = check_service(requester, "mint-api", "http://mint-api/health/cascade/0", 4)
+
+        self.assertFalse(ok)
+        self.assertIn("test exception", error)
+        self.assertEqual(result["status"], "UNKNOWN")
+        self.assertIsNone(result["status_code"])
+
+    def test_timed_out(self):
+        result, ok, error = timed_out("service", "search-api", 4)
+
+        self.assertFalse(ok)
+        self.assertIn("search-api", error)
+        self.assertEqual(result["status"], "UNKNOWN")
+
+    @patch('maintain_api.views.general.run_probes')
+    def test_get_cascade_cached(self, mock_run_probes):
+        mock_run_probes.return_value = ([], [], 200)
+
+        with app.test_request_context():
+            first = get_cascade(1)
+            second = get_cascade(1)
+            get_cascade(2)
+
+        self.assertEqual(first, second)
+        self.assertEqual(first[1], ([], [], 200))
+        self.assertEqual(mock_run_probes.call_count, 2)
+
+    @patch('maintain_api.views.general.run_probes')
+    def test_get_cascade_error_not_cached(self, mock_run_probes):
+        mock_run_probes.side_effect = Exception("test exception")
+
+        with app.test_request_context():
+            with self.assertRaises(Exception):
+                get_cascade(1)
+            with self.assertRaises(Exception):
+                get_cascade(1)
+
+        self.assertEqual(mock_run_probes.call_count, 2)
+
+    @patch('maintain_api.utilities.cache.time')
+    @patch('maintain_api.views.general.run_probes')
+    def test_get_cascade_bad_cached_briefly(self, mock_run_probes, mock_time):
+        mock_run_probes.side_effect = [([], [], 500), ([], [], 200)]
+        mock_time.monotonic.return_value = 100
+
+        with app.test_request_context():
+            first = get_cascade(1)
+            # Polls during an outage share the unhealthy result for HEALTH_CASCADE_UNHEALTHY_CACHE_SECONDS
+            self.assertEqual(first, get_cascade(1))
+            mock_time.monotonic.return_value = 100 + HEALTH_CASCADE_UNHEALTHY_CACHE_SECONDS
+            second = get_cascade(1)
+
+        self.assertEqual(first[1], ([], [], 500))
+        self.assertEqual(second[1], ([], [], 200))
+        self.assertEqual(mock_run_probes.call_count, 2)
+
+    def test_run_probes_service_timeout(self):
+        requester = MagicMock()
+        requester.get.return_value.status_code = 200
+        requester.get.return_value.headers = {"content-type": "application/json"}
+        requester.get.return_value.json.return_value = {"status": "OK"}
+
+        with patch.dict(app.config, {"DEPENDENCIES": {"mint-api": "http://mint-api"},
+                                     "HEALTH_CASCADE_PROBE_TIMEOUT_SECONDS": 2}):
+            with app.test_request_context():
+                g.requests = requester
+                dbs, services, status = run_probes(3)
+
+        self.assertEqual(status, 200)
+        # Connecting gets one probe timeout, reading the downstream cascade's whole budget
+        requester.get.assert_called_with("http://mint-api/health/cascade/2", timeout=(2, 6))
@@ -3,6 +3,8 @@ from flask_testing import TestCase
 from flask import url_for
 from mock import patch
 from unittest.mock import MagicMock
+from maintain_api.utilities.reference_data import table_versions, INSTRUMENTS_TABLE
+from maintain_api.views.v1_0.instruments import instruments_body_cache
 
 
 class TestInstruments(TestCase):
@@ -10,6 +12,23 @@ class TestInstruments(TestCase):
         main.app.testing = True
         return main.app
 
+    def setUp(self):
+        instruments_body_cache.invalidate()
+        # The versions committed to the database, by any process
+        self.versions = {}
+
+        def get_versions(*tables):
+            return '.'.join(str(self.versions.get(table, 0)) for table in tables)
+
+        def bump_versions(*tables):
+            for table in tables:
+                self.versions[table] = self.versions.get(table, 0) + 1
+
+        for patcher in [patch.object(table_versions, 'get', side_effect=get_versions),
+                        patch.object(table_versions, 'bump', side_effect=bump_versions)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.instruments.Instruments')
     def test_get_all_instruments(self, mock_instruments, mock_validate):
@@ -28,6 +47,42 @@ class TestInstruments(TestCase):
         self.assertStatus(response, 200)
         mock_validate.assert_called()
 
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.views.v1_0.instruments.db')
+    @patch('maintain_api.views.v1_0.instruments.Instruments')
+    def test_get_all_instruments_not_modified(self, mock_instruments, mock_db, mock_validate):
+        mock_instrument = MagicMock()
+        mock_instrument.name = "abc"
+
+        mock_instruments.query \
+            .distinct.return_value \
+            .order_by.return_value \
+            .all.return_value = [mock_instrument]
+
+        response = self.client.get(url_for('instruments.get_all_instruments'),
+                                   headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+        etag = response.headers['ETag']
+
+        response = self.client.get(url_for('instruments.get_all_instruments'),
+                                   headers={'Authorization': 'Fake JWT', 'If-None-Match': etag})
+
+        self.assertStatus(response, 304)
+        mock_instruments.query.distinct.return_value.order_by.return_value.all.assert_called_once()
+
+        mock_instruments.query.filter.return_value.all.return_value = []
+        self.client.post(url_for('instruments.add_instrument'), data='{"name":"def"}',
+                         headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+        mock_new_instrument = MagicMock()
+        mock_new_instrument.name = "def"
+        mock_instruments.query.distinct.return_value.order_by.return_value.all.return_value = [
+            mock_instrument, mock_new_instrument]
+
+        response = self.client.get(url_for('instruments.get_all_instruments'),
+                                   headers={'Authorization': 'Fake JWT', 'If-None-Match': etag})
+
+        self.assertStatus(response, 200)
+        self.assertNotEqual(etag, response.headers['ETag'])
+
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.instruments.Instruments')
     def test_no_instruments(self, mock_instruments, mock_validate):
@@ -63,6 +118,20 @@ class TestInstruments(TestCase):
         mock_db.session.commit.assert_called()
         mock_validate.assert_called()
 
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.views.v1_0.instruments.db')
+    @patch('maintain_api.views.v1_0.instruments.Instruments')
+    def test_add_instruments_bumps_version_in_transaction(self, mock_instruments, mock_db, mock_validate):
+        mock_instruments.query.filter.return_value.all.return_value = []
+        # The version must be bumped before the commit, so other processes see it along with the new instrument
+        versions_at_commit = []
+        mock_db.session.commit.side_effect = lambda: versions_at_commit.append(dict(self.versions))
+
+        self.client.post(url_for('instruments.add_instrument'), data='{"name":"abc"}',
+                         headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+
+        self.assertEqual([{INSTRUMENTS_TABLE: 1}], versions_at_commit)
+
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.instruments.db')
     @patch('maintain_api.views.v1_0.instruments.Instruments')
@@ -0,0 +1,128 @@
+import collections
+import json
+import logging
+import sys
+import time
+import traceback
+import unittest
+from flask import g
+from maintain_api.extensions import ContextualFilter, JsonFormatter, JsonAuditFormatter
+from maintain_api.main import app
+from maintain_api.utilities.query_stats import QueryStats
+
+
+def make_record(msg, *args, level=logging.INFO, exc_info=None):
+    return logging.LogRecord('maintain_api', level, '/path/views.py', 12, msg, args, exc_info, 'get_thing')
+
+
+def timed_record(created, msg, *args, **kwargs):
+    record = make_record(msg, *args, **kwargs)
+    record.created = created
+    record.msecs = (created - int(created)) * 1000
+    return record
+
+
+def previous_format(formatter, record, audit=False):
+    """How the JSON formatters built lines before they wrote them straight into a template."""
+    entry = collections.OrderedDict([
+        ('timestamp', logging.Formatter.formatTime(formatter, record)),
+        ('level', 'AUDIT' if audit else record.levelname),
+        ('traceid', record.trace_id),
+        ('message', record.getMessage())])
+    if not audit:
+        entry['exception'] = traceback.format_exception(*record.exc_info) if record.exc_info else None
+    return json.dumps(entry)
+
+
+class TestLogFormatting(unittest.TestCase):
+
+    def test_filter_without_request(self):
+        """Should give records outside a request no trace id and leave the message alone"""
+        record = make_record("hello %s", "world")
+        ContextualFilter().filter(record)
+
+        self.assertEqual('N/A', record.trace_id)
+        self.assertEqual("hello %s", record.msg)
+        self.assertEqual("hello world", json.loads(JsonFormatter().format(record))['message'])
+
+    def test_filter_with_request(self):
+        """Should keep the request details as attributes, and only add them to the message when formatting"""
+        with app.test_request_context('/v1.0/maintain/categories', method='POST'):
+            g.trace_id = 'trace'
+            record = make_record("hello %s", "world")
+            ContextualFilter().filter(record)
+
+        self.assertEqual("hello %s", record.msg)
+        self.assertEqual('categories.add_categories', record.endpoint)
+        self.assertEqual('POST', record.method)
+        expected = "Endpoint: categories.add_categories, Method: POST, Caller: views.get_thing[12], hello world"
+        self.assertEqual(expected, json.loads(JsonFormatter().format(record))['message'])
+        self.assertEqual(expected, json.loads(JsonAuditFormatter().format(record))['message'])
+        self.assertEqual('trace', json.loads(JsonFormatter().format(record))['traceid'])
+
+    def test_format_message_without_args(self):
+        """Should leave a message without arguments as it is, even if it has a % in it"""
+        record = make_record("Category '100%' not found.")
+        ContextualFilter().filter(record)
+
+        self.assertEqual("Category '100%' not found.", json.loads(JsonFormatter().format(record))['message'])
+
+    def test_format_query_stats(self):
+        """Should add the request's database statement count and time to a record carrying them"""
+        record = make_record("Request complete")
+        ContextualFilter().filter(record)
+        record.query_stats = QueryStats()
+        record.query_stats.add(0.0012344)
+        record.query_stats.add(0.002)
+
+        line = json.loads(JsonFormatter().format(record))
+
+        self.assertEqual(list(line.keys())[-2:], ['db_statements', 'db_time_ms'])
+        self.assertEqual(line['db_statements'], 2)
+        self.assertEqual(line['db_time_ms'], 3.234)
+
+
+class TestJsonFormatterOutput(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            raise ValueError("bad \"value\"")
+        except ValueError:
+            exc_info = sys.exc_info()
+
+        self.records = []
+        for created in [1476784299.0, 1476784299.1084, 1476784299.9999, 1476784300.5, 1476784299.25]:
+            for msg, args in [("plain", ()), ("with %s and %d", ("args", 3)), ("quotes \" and \\ slash", ()),
+                              ("unicode \u00a3 \u2014 \U0001f600", ()), ("control \n\t\x00", ()),
+                              ("100% without args", ()), ("", ())]:
+                for trace_id in ['N/A', '9d7626a3242b4001bc5cdc95cc293272', 'odd "trace" \u00e9', 42, None]:
+                    record = timed_record(created, msg, *args)
+                    record.trace_id = trace_id
+                    self.records.append(record)
+        for level in [logging.DEBUG, logging.WARNING, logging.ERROR, 51]:
+            record = timed_record(1476784299.5, "failed", level=level, exc_info=exc_info)
+            record.trace_id = 'N/A'
+            self.records.append(record)
+
+    def test_golden(self):
+        """Should write exactly these lines"""
+        formatter = JsonFormatter()
+        formatter.converter = time.gmtime
+        record = timed_record(1476784299.1084, "hello %s", "w\u00f6rld \"quoted\"")
+        record.trace_id = 'abc'
+
+        self.assertEqual('{"timestamp": "2016-10-18 09:51:39,108", "level": "INFO", "traceid": "abc", '
+                         '"message": "hello w\\u00f6rld \\"quoted\\"", "exception": null}', formatter.format(record))
+
+        formatter = JsonAuditFormatter()
+        formatter.converter = time.gmtime
+        self.assertEqual('{"timestamp": "2016-10-18 09:51:39,108", "level": "AUDIT", "traceid": "abc", '
+                         '"message": "hello w\\u00f6rld \\"quoted\\""}', formatter.format(record))
+
+    def test_same_as_previous_format(self):
+        """Should write the same bytes the formatters wrote when they built a dict for json.dumps"""
+        formatter = JsonFormatter()
+        audit_formatter = JsonAuditFormatter()
+        for record in self.records:
+            self.assertEqual(previous_format(formatter, record), formatter.format(record))
+            self.assertEqual(previous_format(audit_formatter, record, audit=True), audit_formatter.format(record))
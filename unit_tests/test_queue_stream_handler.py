@@ -0,0 +1,98 @@
+import logging
+import threading
+import unittest
+from maintain_api.extensions import QueueStreamHandler
+
+
+class BlockingStream(object):
+    """A stream that holds up every write until released, like a log collector that has stopped reading."""
+
+    def __init__(self):
+        self.lines = []
+        self.writing = threading.Event()
+        self.released = threading.Event()
+
+    def write(self, text):
+        self.writing.set()
+        self.released.wait(5)
+        self.lines.append(text)
+
+    def flush(self):
+        pass
+
+
+class TestQueueStreamHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = BlockingStream()
+        self.logger = logging.getLogger('test_queue_stream_handler')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+
+    def tearDown(self):
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+            handler.close()
+
+    def add_handler(self, capacity, block_seconds=0):
+        handler = QueueStreamHandler(self.stream, capacity, block_seconds)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.logger.addHandler(handler)
+        return handler
+
+    def test_writes_on_background_thread(self):
+        handler = self.add_handler(10)
+        self.stream.released.set()
+
+        self.logger.info("one %s", "arg")
+        self.logger.info("two")
+        handler.close()
+
+        self.assertEqual("one arg\ntwo\n", "".join(self.stream.lines))
+        self.assertEqual(0, handler.dropped)
+
+    def test_drops_when_full(self):
+        handler = self.add_handler(2)
+
+        self.logger.info("one")
+        self.assertTrue(self.stream.writing.wait(5))
+        # The writer is stuck on "one", so the queue fills and the last record is dropped
+        self.logger.info("two")
+        self.logger.info("three")
+        self.logger.info("four")
+        self.assertEqual(1, handler.dropped)
+
+        self.stream.released.set()
+        handler.queue.join()
+        self.logger.info("five")
+        handler.close()
+
+        self.assertEqual("one\ntwo\nthree\nDropped 1 log records, the log queue was full\nfive\n",
+                         "".join(self.stream.lines))
+
+    def test_waits_for_room(self):
+        handler = self.add_handler(1, block_seconds=5)
+
+        self.logger.info("one")
+        self.assertTrue(self.stream.writing.wait(5))
+        self.logger.info("two")
+        threading.Timer(0.1, self.stream.released.set).start()
+        self.logger.info("three")
+        handler.close()
+
+        self.assertEqual("one\ntwo\nthree\n", "".join(self.stream.lines))
+        self.assertEqual(0, handler.dropped)
+
+    def test_never_drops(self):
+        handler = self.add_handler(1, block_seconds=None)
+
+        self.logger.info("one")
+        self.assertTrue(self.stream.writing.wait(5))
+        self.logger.info("two")
+        threading.Timer(0.5, self.stream.released.set).start()
+        # Waits for the writer to make room, with no timeout
+        self.logger.info("three")
+        handler.close()
+
+        self.assertEqual("one\ntwo\nthree\n", "".join(self.stream.lines))
+        self.assertEqual(0, handler.dropped)
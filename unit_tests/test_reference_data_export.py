@@ -0,0 +1,91 @@
+from maintain_api import main
+from flask_testing import TestCase
+from flask import url_for
+from mock import patch
+from maintain_api.views.v1_0.reference_data_export import nest_categories
+from unittest.mock import MagicMock
+import json
+
+
+class TestReferenceDataExport(TestCase):
+    def create_app(self):
+        main.app.testing = True
+        return main.app
+
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.views.v1_0.reference_data_export.category_queries')
+    @patch('maintain_api.views.v1_0.reference_data_export.db')
+    def test_export_reference_data(self, mock_db, mock_category_queries, mock_validate):
+        mock_db.session.query.return_value.order_by.return_value.yield_per.side_effect = [
+            [("Act A", True), ("Act B", False)],
+            [("Deed",)]
+        ]
+        mock_category_queries.return_value = ([(1, 1, "Planning", "Planning", None, 1, None)],
+                                              [(1, 1, "Act A")], [])
+
+        response = self.client.get(url_for('reference_data_export.export_reference_data'),
+                                   headers={'Authorization': 'Fake JWT'})
+
+        self.assertStatus(response, 200)
+        self.assertEqual("application/x-ndjson", response.mimetype)
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual([
+            {"statutory-provision": {"title": "Act A", "selectable": True}},
+            {"statutory-provision": {"title": "Act B", "selectable": False}},
+            {"instrument": {"name": "Deed"}},
+            {"category": {"name": "Planning", "display-name": "Planning", "display-order": 1, "permission": None,
+                          "provisions": ["Act A"], "instruments": [], "sub-categories": []}}
+        ], lines)
+
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.views.v1_0.reference_data_import.Instruments')
+    @patch('maintain_api.views.v1_0.reference_data_import.StatutoryProvision')
+    @patch('maintain_api.views.v1_0.reference_data_import.Categories')
+    @patch('maintain_api.views.v1_0.reference_data_import.db')
+    @patch('maintain_api.views.v1_0.reference_data_export.category_queries')
+    @patch('maintain_api.views.v1_0.reference_data_export.db')
+    def test_export_round_trip_null_display_order(self, mock_export_db, mock_category_queries, mock_import_db,
+                                                  mock_categories, mock_provisions, mock_instruments, mock_validate):
+        mock_export_db.session.query.return_value.order_by.return_value.yield_per.side_effect = [[], []]
+        mock_category_queries.return_value = ([(1, 1, "Planning", "Planning", None, None, None)], [], [])
+
+        response = self.client.get(url_for('reference_data_export.export_reference_data'),
+                                   headers={'Authorization': 'Fake JWT'})
+
+        self.assertStatus(response, 200)
+        self.assertIsNone(json.loads(response.data.decode())["category"]["display-order"])
+
+        existing = MagicMock(id=1, parent_id=None, display_name="Planning", display_order=None, permission=None)
+        existing.name = "Planning"
+        mock_categories.query.filter.return_value.filter.return_value.all.return_value = [existing]
+        mock_provisions.query.filter.return_value.all.return_value = []
+        mock_instruments.query.filter.return_value.all.return_value = []
+        mock_import_db.session.query.return_value.filter.return_value.all.return_value = []
+
+        response = self.client.post(url_for('reference_data_import.import_reference_data'), data=response.data,
+                                    headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/x-ndjson'})
+
+        self.assertStatus(response, 200)
+        self.assertEqual([{"name": "Planning", "parent": None, "result": "unchanged"}], response.json["categories"])
+
+    def test_nest_categories(self):
+        categories = [
+            (1, 1, "Planning", "Planning display", None, 2, "permission"),
+            (1, 3, "Tree", "Tree display", 1, None, None),
+            (1, 4, "Listed", "Listed display", 1, 1, None),
+            (1, 5, "Grade", "Grade display", 4, 1, None),
+            (2, 2, "Land", "Land display", None, 1, None)
+        ]
+        provisions = [(1, 1, "Act A"), (1, 5, "Act B")]
+        instruments = [(2, 2, "Deed")]
+
+        result = list(nest_categories(categories, provisions, instruments))
+
+        self.assertEqual(["Planning", "Land"], [category["name"] for category in result])
+        self.assertEqual(["Act A"], result[0]["provisions"])
+        self.assertEqual(["Listed", "Tree"], [category["name"] for category in result[0]["sub-categories"]])
+        self.assertEqual({"name": "Grade", "display-name": "Grade display", "display-order": 1, "permission": None,
+                          "provisions": ["Act B"], "instruments": [], "sub-categories": []},
+                         result[0]["sub-categories"][0]["sub-categories"][0])
+        self.assertEqual(["Deed"], result[1]["instruments"])
+        self.assertEqual([], result[1]["provisions"])
@@ -0,0 +1,167 @@
+from maintain_api import main
+from flask_testing import TestCase
+from flask import url_for
+from mock import patch
+from unittest.mock import MagicMock
+from maintain_api.utilities.reference_data import table_versions, INSTRUMENTS_TABLE, PROVISIONS_TABLE
+import json
+
+
+def named(attribute, value, **attributes):
+    row = MagicMock()
+    setattr(row, attribute, value)
+    for key, attribute_value in attributes.items():
+        setattr(row, key, attribute_value)
+    return row
+
+
+class TestReferenceDataImport(TestCase):
+    def create_app(self):
+        main.app.testing = True
+        return main.app
+
+    def setUp(self):
+        patcher = patch.object(table_versions, 'bump')
+        self.mock_bump = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('maintain_api.app.validate')
+    def test_import_invalid_payload(self, mock_validate):
+        data = {"instruments": [{"title": "Deed"}]}
+
+        response = self.client.post(url_for('reference_data_import.import_reference_data'), data=json.dumps(data),
+                                    headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+
+        self.assertStatus(response, 400)
+
+    @patch('maintain_api.app.validate')
+    def test_import_ndjson_invalid_line(self, mock_validate):
+        data = '{"instrument": {"name": "Deed"}}\n{"unknown": {}}\n'
+
+        response = self.client.post(url_for('reference_data_import.import_reference_data'), data=data,
+                                    headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/x-ndjson'})
+
+        self.assertStatus(response, 400)
+        self.assertIn("Line 2", response.json["error_message"])
+
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.views.v1_0.reference_data_import.db')
+    @patch('maintain_api.views.v1_0.reference_data_import.Instruments')
+    @patch('maintain_api.views.v1_0.reference_data_import.StatutoryProvision')
+    def test_import_provisions_and_instruments(self, mock_provisions, mock_instruments, mock_db, mock_validate):
+        mock_provisions.query.filter.return_value.all.return_value = [
+            named("title", "Act A", id=1, selectable=True),
+            named("title", "Act B", id=2, selectable=True)
+        ]
+        mock_instruments.query.filter.return_value.all.return_value = []
+
+        data = {"statutory-provisions": [{"title": "act a", "selectable": True},
+                                         {"title": "Act B", "selectable": True},
+                                         {"title": "Act C", "selectable": False}],
+                "instruments": [{"name": "Deed"}]}
+
+        response = self.client.post(url_for('reference_data_import.import_reference_data'), data=json.dumps(data),
+                                    headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+
+        self.assertStatus(response, 200)
+        self.assertEqual(["updated", "unchanged", "created"],
+                         [result["result"] for result in response.json["statutory-provisions"]])
+        self.assertEqual([{"name": "Deed", "result": "created"}], response.json["instruments"])
+        mock_db.session.bulk_insert_mappings.assert_any_call(mock_provisions,
+                                                             [{"title": "Act C", "selectable": False}])
+        mock_db.session.bulk_update_mappings.assert_called_with(mock_provisions,
+                                                                [{"id": 1, "title": "act a", "selectable": True}])
+        mock_db.session.bulk_insert_mappings.assert_any_call(mock_instruments, [{"name": "Deed"}])
+        mock_db.session.commit.assert_called()
+        self.mock_bump.assert_any_call(PROVISIONS_TABLE)
+        self.mock_bump.assert_any_call(INSTRUMENTS_TABLE)
+
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.views.v1_0.reference_data_import.db')
+    @patch('maintain_api.views.v1_0.reference_data_import.Instruments')
+    def test_import_duplicate_item(self, mock_instruments, mock_db, mock_validate):
+        mock_instruments.query.filter.return_value.all.return_value = []
+
+        data = {"instruments": [{"name": "Deed"}, {"name": "DEED"}]}
+
+        response = self.client.post(url_for('reference_data_import.import_reference_data'), data=json.dumps(data),
+                                    headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+
+        self.assertStatus(response, 400)
+        self.assertEqual("error", response.json["instruments"][1]["result"])
+        mock_db.session.rollback.assert_called()
+        mock_db.session.commit.assert_not_called()
+
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.views.v1_0.reference_data_import.Instruments')
+    @patch('maintain_api.views.v1_0.reference_data_import.StatutoryProvision')
+    @patch('maintain_api.views.v1_0.reference_data_import.db')
+    @patch('maintain_api.views.v1_0.reference_data_import.Categories')
+    def test_import_category_mapping_does_not_exist(self, mock_categories, mock_db, mock_provisions,
+                                                    mock_instruments, mock_validate):
+        mock_provisions.query.filter.return_value.all.return_value = []
+        mock_instruments.query.filter.return_value.all.return_value = []
+        mock_categories.query.filter.return_value.filter.return_value.all.return_value = []
+
+        data = {"categories": [{"name": "Planning",
+                                "display-name": "Planning",
+                                "display-order": 1,
+                                "permission": None,
+                                "provisions": ["Missing"],
+                                "instruments": []}]}
+
+        response = self.client.post(url_for('reference_data_import.import_reference_data'), data=json.dumps(data),
+                                    headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+
+        self.assertStatus(response, 400)
+        self.assertEqual({"name": "Planning", "parent": None, "result": "error",
+                          "error": "Statutory provision 'Missing' does not exist."}, response.json["categories"][0])
+        mock_db.session.rollback.assert_called()
+        mock_db.session.commit.assert_not_called()
+
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.views.v1_0.reference_data_import.CategoryStatProvisionMapping')
+    @patch('maintain_api.views.v1_0.reference_data_import.Instruments')
+    @patch('maintain_api.views.v1_0.reference_data_import.StatutoryProvision')
+    @patch('maintain_api.views.v1_0.reference_data_import.db')
+    @patch('maintain_api.views.v1_0.reference_data_import.Categories')
+    def test_import_category_with_sub_category(self, mock_categories, mock_db, mock_provisions,
+                                               mock_instruments, mock_mapping, mock_validate):
+        mock_provisions.query.filter.return_value.all.return_value = [named("title", "Act A", id=7)]
+        mock_instruments.query.filter.return_value.all.return_value = []
+        mock_categories.query.filter.return_value.filter.return_value.all.side_effect = [
+            [named("name", "Planning", id=1, parent_id=None, display_name="Planning", display_order=1,
+                   permission=None)],
+            []
+        ]
+        mock_db.session.query.return_value.filter.return_value.all.return_value = []
+
+        data = {"categories": [{"name": "Planning",
+                                "display-name": "Planning",
+                                "display-order": 1,
+                                "permission": None,
+                                "provisions": [],
+                                "instruments": [],
+                                "sub-categories": [{"name": "Listed",
+                                                    "display-name": "Listed",
+                                                    "display-order": 1,
+                                                    "permission": None,
+                                                    "provisions": ["Act A"],
+                                                    "instruments": []}]}]}
+
+        # The new sub-category's id is read back after it is inserted
+        mock_db.session.query.return_value.filter.return_value.filter.return_value.all.return_value = [
+            (2, 1, "Listed")]
+
+        response = self.client.post(url_for('reference_data_import.import_reference_data'), data=json.dumps(data),
+                                    headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+
+        self.assertStatus(response, 200)
+        self.assertEqual([{"name": "Planning", "parent": None, "result": "unchanged"},
+                          {"name": "Listed", "parent": "Planning", "result": "created"}], response.json["categories"])
+        mock_db.session.bulk_insert_mappings.assert_any_call(mock_categories, [
+            {"name": "Listed", "display_name": "Listed", "display_order": 1, "permission": None, "parent_id": 1,
+             "id": 2}])
+        mock_db.session.bulk_insert_mappings.assert_any_call(mock_mapping,
+                                                             [{"category_id": 2, "statutory_provision_id": 7}])
+        mock_db.session.commit.assert_called()
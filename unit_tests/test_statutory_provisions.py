@@ -3,6 +3,10 @@ from flask_testing import TestCase
 from flask import url_for
 from mock import patch
 from unittest.mock import MagicMock
+from maintain_api.utilities.reference_data import table_versions, PROVISIONS_TABLE
+from maintain_api.views.v1_0.statutory_provisions import provision_cache
+import gzip
+import json
 
 
 class TestStatutoryProvisions(TestCase):
@@ -10,6 +14,23 @@ class TestStatutoryProvisions(TestCase):
         main.app.testing = True
         return main.app
 
+    def setUp(self):
+        provision_cache.invalidate()
+        # The versions committed to the database, by any process
+        self.versions = {}
+
+        def get_versions(*tables):
+            return '.'.join(str(self.versions.get(table, 0)) for table in tables)
+
+        def bump_versions(*tables):
+            for table in tables:
+                self.versions[table] = self.versions.get(table, 0) + 1
+
+        for patcher in [patch.object(table_versions, 'get', side_effect=get_versions),
+                        patch.object(table_versions, 'bump', side_effect=bump_versions)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.statutory_provisions.StatutoryProvision')
     def test_get_all_statutory_provisions(self, mock_stat_provs, mock_validate):
@@ -51,6 +72,181 @@ class TestStatutoryProvisions(TestCase):
         mock_stat_provs.query.distinct.return_value.filter.return_value.order_by.return_value.all.assert_called()
         mock_stat_provs.query.distinct.return_value.order_by.return_value.all.assert_not_called()
 
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.views.v1_0.statutory_provisions.StatutoryProvision')
+    def test_get_statutory_provisions_cached(self, mock_stat_provs, mock_validate):
+        mock_stat_prov = MagicMock()
+        mock_stat_prov.title = "abc"
+
+        mock_stat_provs.query \
+            .distinct.return_value \
+            .order_by.return_value \
+            .all.return_value = [mock_stat_prov]
+
+        mock_stat_provs.query \
+            .distinct.return_value \
+            .filter.return_value \
+            .order_by.return_value \
+            .all.return_value = [mock_stat_prov]
+
+        for _ in range(2):
+            response = self.client.get(url_for('statutory_provisions.get_all_statutory_provisions'),
+                                       headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+            self.assertStatus(response, 200)
+            self.assertEqual(["abc"], response.json)
+
+        mock_stat_provs.query.distinct.return_value.order_by.return_value.all.assert_called_once()
+
+        response = self.client.get(url_for('statutory_provisions.get_all_statutory_provisions', selectable=True),
+                                   headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+
+        self.assertStatus(response, 200)
+        mock_stat_provs.query.distinct.return_value.filter.return_value.order_by.return_value.all.assert_called()
+
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.views.v1_0.statutory_provisions.StatutoryProvision')
+    def test_get_statutory_provisions_selectable_normalised(self, mock_stat_provs, mock_validate):
+        mock_stat_prov = MagicMock()
+        mock_stat_prov.title = "abc"
+        query = mock_stat_provs.query.distinct.return_value.filter.return_value.order_by.return_value
+        query.all.return_value = [mock_stat_prov]
+
+        for selectable in ['true', 'True', 'TRUE']:
+            response = self.client.get(url_for('statutory_provisions.get_all_statutory_provisions',
+                                               selectable=selectable),
+                                       headers={'Authorization': 'Fake JWT'})
+            self.assertStatus(response, 200)
+
+        query.all.assert_called_once()
+        self.assertEqual(1, len(provision_cache))
+
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.views.v1_0.statutory_provisions.StatutoryProvision')
+    def test_get_statutory_provisions_selectable_invalid(self, mock_stat_provs, mock_validate):
+        response = self.client.get(url_for('statutory_provisions.get_all_statutory_provisions', selectable='maybe'),
+                                   headers={'Authorization': 'Fake JWT'})
+
+        self.assertStatus(response, 400)
+        mock_stat_provs.query.distinct.assert_not_called()
+
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.views.v1_0.statutory_provisions.StatutoryProvision')
+    def test_get_statutory_provisions_other_process_write(self, mock_stat_provs, mock_validate):
+        mock_stat_prov = MagicMock()
+        mock_stat_prov.title = "abc"
+        query = mock_stat_provs.query.distinct.return_value.order_by.return_value
+        query.all.return_value = [mock_stat_prov]
+
+        self.client.get(url_for('statutory_provisions.get_all_statutory_provisions'),
+                        headers={'Authorization': 'Fake JWT'})
+        # Committed by another process, which can't touch this one's cache
+        mock_stat_prov.title = "def"
+        self.versions[PROVISIONS_TABLE] = 1
+        response = self.client.get(url_for('statutory_provisions.get_all_statutory_provisions'),
+                                   headers={'Authorization': 'Fake JWT'})
+
+        self.assertEqual(["def"], response.json)
+        self.assertEqual(2, query.all.call_count)
+
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.views.v1_0.statutory_provisions.StatutoryProvision')
+    def test_get_statutory_provisions_gzip(self, mock_stat_provs, mock_validate):
+        mock_stat_prov = MagicMock()
+        mock_stat_prov.title = "abc"
+
+        mock_stat_provs.query \
+            .distinct.return_value \
+            .order_by.return_value \
+            .all.return_value = [mock_stat_prov]
+
+        response = self.client.get(url_for('statutory_provisions.get_all_statutory_provisions'),
+                                   headers={'Authorization': 'Fake JWT', 'Accept-Encoding': 'gzip'})
+
+        self.assertStatus(response, 200)
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+        self.assertEqual(["abc"], json.loads(gzip.decompress(response.data).decode()))
+        etag = response.headers['ETag']
+
+        response = self.client.get(url_for('statutory_provisions.get_all_statutory_provisions'),
+                                   headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+
+        self.assertStatus(response, 200)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertNotEqual(etag, response.headers['ETag'])
+
+        response = self.client.get(url_for('statutory_provisions.get_all_statutory_provisions'),
+                                   headers={'Authorization': 'Fake JWT', 'If-None-Match': etag})
+
+        self.assertStatus(response, 304)
+        mock_stat_provs.query.distinct.return_value.order_by.return_value.all.assert_called_once()
+
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.views.v1_0.statutory_provisions.db')
+    @patch('maintain_api.views.v1_0.statutory_provisions.StatutoryProvision')
+    def test_statutory_provisions_cache_invalidated(self, mock_stat_provs, mock_db, mock_validate):
+        mock_stat_prov = MagicMock()
+        mock_stat_prov.title = "abc"
+
+        mock_stat_provs.query \
+            .distinct.return_value \
+            .order_by.return_value \
+            .all.return_value = [mock_stat_prov]
+
+        mock_stat_provs.query \
+            .filter.return_value \
+            .all.return_value = []
+
+        self.client.get(url_for('statutory_provisions.get_all_statutory_provisions'),
+                        headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+
+        response = self.client.post(url_for('statutory_provisions.add_statutory_provisions'),
+                                    data='{"title":"def", "selectable": false}',
+                                    headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+        self.assertStatus(response, 201)
+
+        self.client.get(url_for('statutory_provisions.get_all_statutory_provisions'),
+                        headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+
+        self.assertEqual(2, mock_stat_provs.query.distinct.return_value.order_by.return_value.all.call_count)
+
+    @patch('maintain_api.app.validate')
+    @patch('maintain_api.views.v1_0.statutory_provisions.db')
+    @patch('maintain_api.views.v1_0.statutory_provisions.StatutoryProvision')
+    def test_statutory_provisions_not_modified(self, mock_stat_provs, mock_db, mock_validate):
+        mock_stat_prov = MagicMock()
+        mock_stat_prov.title = "abc"
+
+        mock_stat_provs.query \
+            .distinct.return_value \
+            .order_by.return_value \
+            .all.return_value = [mock_stat_prov]
+
+        response = self.client.get(url_for('statutory_provisions.get_all_statutory_provisions'),
+                                   headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+        etag = response.headers['ETag']
+
+        response = self.client.get(url_for('statutory_provisions.get_all_statutory_provisions'),
+                                   headers={'Authorization': 'Fake JWT', 'If-None-Match': etag})
+
+        self.assertStatus(response, 304)
+        self.assertEqual(etag, response.headers['ETag'])
+
+        # The provision being renamed is found, and no other provision has the new title
+        mock_stat_provs.query \
+            .filter.return_value \
+            .first.side_effect = [mock_stat_prov, None]
+
+        self.client.put(url_for('statutory_provisions.update_statutory_provisions', stat_prov="abc"),
+                        data='{"title":"def", "selectable": false}',
+                        headers={'Authorization': 'Fake JWT', 'Content-Type': 'application/json'})
+        mock_stat_prov.title = "def"
+
+        response = self.client.get(url_for('statutory_provisions.get_all_statutory_provisions'),
+                                   headers={'Authorization': 'Fake JWT', 'If-None-Match': etag})
+
+        self.assertStatus(response, 200)
+        self.assertNotEqual(etag, response.headers['ETag'])
+
     @patch('maintain_api.app.validate')
     @patch('maintain_api.views.v1_0.statutory_provisions.StatutoryProvision')
     def test_no_statutory_provisions(self, mock_stat_provs, mock_validate):
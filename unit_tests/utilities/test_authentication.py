@@ -0,0 +1,123 @@
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+from maintain_api.exceptions import ApplicationError
+from maintain_api.utilities.authentication import authorization_cache_key, get_token, get_token_expiry, \
+    LocalTokenVerifier
+import base64
+import json
+import jwt
+import time
+
+AUTHENTICATION_PATH = 'maintain_api.utilities.authentication'
+
+
+def build_token(claims):
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode('utf-8')).decode('ascii').rstrip('=')
+    return 'eyJhbGciOiJub25lIn0.{}.signature'.format(payload)
+
+
+class TestAuthentication(TestCase):
+
+    def test_authorization_cache_key(self):
+        """Should return a stable digest that does not contain the token"""
+        key = authorization_cache_key('Bearer abc.def.ghi')
+        self.assertEqual(key, authorization_cache_key('Bearer abc.def.ghi'))
+        self.assertNotEqual(key, authorization_cache_key('Bearer abc.def.xyz'))
+        self.assertNotIn('abc', key)
+
+    def test_get_token_bearer(self):
+        """Should remove the Bearer scheme"""
+        self.assertEqual(get_token('Bearer abc.def.ghi'), 'abc.def.ghi')
+
+    def test_get_token_raw(self):
+        """Should return a header without a scheme unchanged"""
+        self.assertEqual(get_token('abc.def.ghi'), 'abc.def.ghi')
+
+    def test_get_token_expiry(self):
+        """Should return the exp claim of the token"""
+        self.assertEqual(get_token_expiry('Bearer ' + build_token({'exp': 1500000000, 'sub': 'abc'})), 1500000000)
+
+    def test_get_token_expiry_no_claim(self):
+        """Should return None if the token has no exp claim"""
+        self.assertIsNone(get_token_expiry(build_token({'sub': 'abc'})))
+
+    def test_get_token_expiry_not_numeric(self):
+        """Should return None if the exp claim is not a number"""
+        self.assertIsNone(get_token_expiry(build_token({'exp': 'tomorrow'})))
+        self.assertIsNone(get_token_expiry(build_token({'exp': True})))
+
+    def test_get_token_expiry_not_jwt(self):
+        """Should return None if the header does not hold a JWT"""
+        self.assertIsNone(get_token_expiry('Fake JWT'))
+        self.assertIsNone(get_token_expiry('abc.!!!.def'))
+        self.assertIsNone(get_token_expiry(build_token(['not', 'a', 'dict'])))
+
+
+class TestLocalTokenVerifier(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.private_key = rsa.generate_private_key(65537, 2048, default_backend())
+        jwk = json.loads(RSAAlgorithm.to_jwk(cls.private_key.public_key()))
+        jwk['kid'] = 'key-1'
+        cls.jwks = [jwk]
+
+    def setUp(self):
+        self.fetch_keys = MagicMock(return_value=self.jwks)
+        self.verifier = LocalTokenVerifier(self.fetch_keys, 60)
+        self.verifier.load_keys()
+
+    def sign(self, claims, kid='key-1', key=None):
+        token = jwt.encode(claims, key or self.private_key, algorithm='RS256', headers={'kid': kid})
+        return token.decode('ascii') if isinstance(token, bytes) else token
+
+    def test_verify_valid(self):
+        """Should verify a token signed with a known key"""
+        self.assertTrue(self.verifier.verify(self.sign({'exp': time.time() + 600})))
+
+    def test_verify_expired(self):
+        """Should reject an expired token"""
+        with self.assertRaises(ApplicationError) as context:
+            self.verifier.verify(self.sign({'exp': time.time() - 600}))
+        self.assertEqual(context.exception.http_code, 401)
+
+    def test_verify_bad_signature(self):
+        """Should reject a token signed with a different key than its key id"""
+        other_key = rsa.generate_private_key(65537, 2048, default_backend())
+        with self.assertRaises(ApplicationError) as context:
+            self.verifier.verify(self.sign({'exp': time.time() + 600}, key=other_key))
+        self.assertEqual(context.exception.http_code, 401)
+
+    def test_verify_not_jwt(self):
+        """Should be inconclusive for something that isn't a JWT"""
+        self.assertFalse(self.verifier.verify('Fake JWT'))
+
+    def test_verify_symmetric_algorithm(self):
+        """Should be inconclusive for a token not signed with an RSA algorithm"""
+        token = jwt.encode({'exp': time.time() + 600}, 'secret', algorithm='HS256', headers={'kid': 'key-1'})
+        token = token.decode('ascii') if isinstance(token, bytes) else token
+        self.assertFalse(self.verifier.verify(token))
+
+    @patch('{}.LocalTokenVerifier.refresh'.format(AUTHENTICATION_PATH))
+    def test_verify_unknown_key(self, mock_refresh):
+        """Should be inconclusive, and refresh the keys, for an unknown key id"""
+        self.assertFalse(self.verifier.verify(self.sign({'exp': time.time() + 600}, kid='key-2')))
+        mock_refresh.assert_called_once_with()
+
+    @patch('{}.threading'.format(AUTHENTICATION_PATH))
+    def test_refresh_rate_limited(self, mock_threading):
+        """Should only start one refresh within the refresh interval"""
+        verifier = LocalTokenVerifier(self.fetch_keys, 60)
+        verifier.refresh()
+        verifier.refresh()
+        mock_threading.Thread.assert_called_once_with(target=verifier.load_keys, name='signing-key-refresh')
+        mock_threading.Thread.return_value.start.assert_called_once_with()
+
+    def test_load_keys_failure_keeps_keys(self):
+        """Should keep the current keys if they can't be fetched"""
+        self.fetch_keys.side_effect = Exception('test exception')
+        self.verifier.load_keys()
+        self.assertTrue(self.verifier.verify(self.sign({'exp': time.time() + 600})))
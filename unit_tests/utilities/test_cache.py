@@ -0,0 +1,82 @@
+from unittest import TestCase
+from unittest.mock import patch
+from maintain_api.utilities.cache import LruCache
+
+CACHE_PATH = 'maintain_api.utilities.cache'
+
+
+class TestLruCache(TestCase):
+
+    def test_get_miss(self):
+        """Should return None and count a miss for an unknown key"""
+        cache = LruCache(2, 60)
+        self.assertIsNone(cache.get('abc'))
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.hits, 0)
+
+    def test_get_hit(self):
+        """Should return the cached value and count a hit"""
+        cache = LruCache(2, 60)
+        cache.set('abc', 'value')
+        self.assertEqual(cache.get('abc'), 'value')
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 0)
+
+    def test_evicts_least_recently_used(self):
+        """Should evict the least recently used entry once max_size is exceeded"""
+        cache = LruCache(2, 60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    @patch('{}.time'.format(CACHE_PATH))
+    def test_entry_expires(self, mock_time):
+        """Should miss once the entry's time-to-live has passed"""
+        mock_time.monotonic.return_value = 100
+        cache = LruCache(2, 60)
+        cache.set('abc', 'value')
+        mock_time.monotonic.return_value = 160
+        self.assertIsNone(cache.get('abc'))
+        self.assertEqual(len(cache), 0)
+
+    @patch('{}.time'.format(CACHE_PATH))
+    def test_entry_ttl_can_only_shorten(self, mock_time):
+        """Should never keep an entry beyond the cache's own time-to-live"""
+        mock_time.monotonic.return_value = 100
+        cache = LruCache(2, 60)
+        cache.set('short', 'value', 10)
+        cache.set('long', 'value', 600)
+        mock_time.monotonic.return_value = 120
+        self.assertIsNone(cache.get('short'))
+        self.assertEqual(cache.get('long'), 'value')
+        mock_time.monotonic.return_value = 160
+        self.assertIsNone(cache.get('long'))
+
+    def test_expired_ttl_not_cached(self):
+        """Should not cache an entry whose time-to-live has already passed"""
+        cache = LruCache(2, 60)
+        cache.set('abc', 'value', -1)
+        self.assertEqual(len(cache), 0)
+
+    def test_disabled(self):
+        """Should not cache anything when max_size is 0"""
+        cache = LruCache(0, 60)
+        cache.set('abc', 'value')
+        self.assertIsNone(cache.get('abc'))
+
+    def test_invalidate(self):
+        """Should remove a single entry, or all entries when no key is given"""
+        cache = LruCache(3, 60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 3)
+        cache.invalidate('a')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 2)
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
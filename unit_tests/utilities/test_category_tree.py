@@ -0,0 +1,142 @@
+from unittest import TestCase
+from unittest.mock import patch
+from maintain_api.utilities.category_tree import CategoryTree, CategoryTreeCache
+from maintain_api.utilities.reference_data import table_versions, CATEGORIES_TABLE, PROVISIONS_TABLE
+import json
+
+CATEGORY_TREE_PATH = 'maintain_api.utilities.category_tree'
+
+ROWS = [
+    (1, "Planning", "Planning display", None, 2, "planning permission"),
+    (2, "Land", "Land display", None, 1, None),
+    (3, "Tree", "Tree display", 1, None, None),
+    (4, "Listed", "Listed display", 1, 1, "listed permission"),
+    (5, "Grade", "Grade display", 4, 1, None),
+    (6, "planning", "Duplicate display", None, 3, None)
+]
+PROVISIONS = [(1, "Provision A"), (1, "Provision B"), (4, "Provision C")]
+INSTRUMENTS = [(4, "Instrument A")]
+
+
+class TestCategoryTree(TestCase):
+
+    def setUp(self):
+        self.tree = CategoryTree('version', ROWS, PROVISIONS, INSTRUMENTS)
+
+    def test_get_all(self):
+        """Should return only the top level categories, in display order"""
+        self.assertEqual([
+            {"name": "Land", "display-name": "Land display", "permission": None},
+            {"name": "Planning", "display-name": "Planning display", "permission": "planning permission"},
+            {"name": "planning", "display-name": "Duplicate display", "permission": None}
+        ], self.tree.get_all())
+
+    def test_get_tree(self):
+        """Should return the top level categories in display order, with every level of sub-category nested in full"""
+        tree = self.tree.get_tree()
+        self.assertEqual(["Land", "Planning", "planning"], [category["name"] for category in tree])
+        self.assertEqual(["Provision A", "Provision B"], tree[1]["statutory-provisions"])
+        self.assertEqual(["Listed", "Tree"], [category["name"] for category in tree[1]["sub-categories"]])
+        self.assertEqual({
+            "name": "Grade",
+            "display-name": "Grade display",
+            "permission": None,
+            "statutory-provisions": [],
+            "instruments": [],
+            "sub-categories": []
+        }, tree[1]["sub-categories"][0]["sub-categories"][0])
+        self.assertEqual(["Instrument A"], tree[1]["sub-categories"][0]["instruments"])
+
+    def test_get_category(self):
+        """Should return a top level category matching the name case-insensitively, with children nulls last"""
+        self.assertEqual({
+            "name": "Planning",
+            "display-name": "Planning display",
+            "permission": "planning permission",
+            "statutory-provisions": ["Provision A", "Provision B"],
+            "instruments": [],
+            "sub-categories": [
+                {"name": "Listed", "display-name": "Listed display", "permission": "listed permission"},
+                {"name": "Tree", "display-name": "Tree display", "permission": None}
+            ]
+        }, self.tree.get_category("PLANNING"))
+
+    def test_get_category_not_top_level(self):
+        """Should not return sub-categories as top level categories"""
+        self.assertIsNone(self.tree.get_category("Listed"))
+        self.assertIsNone(self.tree.get_category("Unknown"))
+
+    def test_get_sub_category(self):
+        """Should return a sub-category by its path, including its parent's name"""
+        self.assertEqual({
+            "name": "Listed",
+            "display-name": "Listed display",
+            "permission": "listed permission",
+            "statutory-provisions": ["Provision C"],
+            "instruments": ["Instrument A"],
+            "sub-categories": [{"name": "Grade", "display-name": "Grade display", "permission": None}],
+            "parent": "Planning"
+        }, self.tree.get_sub_category("planning", "listed"))
+
+    def test_get_sub_category_wrong_parent(self):
+        """Should only return a sub-category under its own top level parent"""
+        self.assertIsNone(self.tree.get_sub_category("Land", "Listed"))
+        self.assertIsNone(self.tree.get_sub_category("Listed", "Grade"))
+
+    def test_get_category_body(self):
+        """Should encode a category the first time it is read, and give the same body after that"""
+        body = self.tree.get_category_body("planning")
+        self.assertEqual(self.tree.get_category("Planning"), json.loads(body.data.decode()))
+        self.assertIs(body, self.tree.get_category_body("PLANNING"))
+        self.assertIsNone(self.tree.get_category_body("unknown"))
+
+    def test_get_sub_category_body(self):
+        """Should encode a sub-category the first time it is read, and give the same body after that"""
+        body = self.tree.get_sub_category_body("planning", "listed")
+        self.assertEqual(self.tree.get_sub_category("Planning", "Listed"), json.loads(body.data.decode()))
+        self.assertIs(body, self.tree.get_sub_category_body("Planning", "Listed"))
+        self.assertIsNone(self.tree.get_sub_category_body("Land", "Listed"))
+
+
+class TestCategoryTreeCache(TestCase):
+
+    def setUp(self):
+        # The versions committed to the database, by any process
+        self.versions = {}
+        patcher = patch.object(table_versions, 'get', side_effect=lambda *tables: '.'.join(
+            str(self.versions.get(table, 0)) for table in tables))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('{}.load_category_tree'.format(CATEGORY_TREE_PATH))
+    def test_get_reuses_snapshot(self, mock_load):
+        """Should build the snapshot once while the tables are unchanged"""
+        mock_load.side_effect = lambda version: CategoryTree(version, ROWS, PROVISIONS, INSTRUMENTS)
+        cache = CategoryTreeCache()
+        tree = cache.get()
+        self.assertIs(tree, cache.get())
+        mock_load.assert_called_once()
+
+    @patch('{}.load_category_tree'.format(CATEGORY_TREE_PATH))
+    def test_get_rebuilds_after_write(self, mock_load):
+        """Should rebuild the snapshot once any process has committed a write to any of its tables"""
+        mock_load.side_effect = lambda version: CategoryTree(version, ROWS, PROVISIONS, INSTRUMENTS)
+        cache = CategoryTreeCache()
+        tree = cache.get()
+        self.versions[CATEGORIES_TABLE] = 1
+        self.assertIsNot(tree, cache.get())
+        self.versions[PROVISIONS_TABLE] = 1
+        cache.get()
+        self.assertEqual(3, mock_load.call_count)
+
+    @patch('{}.load_category_tree'.format(CATEGORY_TREE_PATH))
+    def test_get_retries_after_error(self, mock_load):
+        """Should raise if a rebuild fails, and try again on the next read"""
+        cache = CategoryTreeCache()
+        mock_load.side_effect = lambda version: CategoryTree(version, ROWS, PROVISIONS, INSTRUMENTS)
+        cache.get()
+        self.versions[CATEGORIES_TABLE] = 1
+        mock_load.side_effect = Exception("test")
+        self.assertRaises(Exception, cache.get)
+        mock_load.side_effect = lambda version: CategoryTree(version, ROWS, PROVISIONS, INSTRUMENTS)
+        self.assertIsNotNone(cache.get())
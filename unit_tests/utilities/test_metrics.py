@@ -0,0 +1,113 @@
+from unittest import TestCase
+from maintain_api.utilities.metrics import MetricsRegistry, ProcessValueStore
+import os
+import shutil
+import tempfile
+
+
+class TestMetrics(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.registry = MetricsRegistry(self.directory)
+
+    def test_counter(self):
+        """Should render a count for each combination of label values."""
+        counter = self.registry.counter('requests_total', 'Requests handled.', ['endpoint', 'status'])
+        counter.inc(('categories', 200))
+        counter.inc(('categories', 200))
+        counter.inc(('categories', 404))
+
+        self.assertEqual(self.registry.render(), '\n'.join([
+            '# HELP requests_total Requests handled.',
+            '# TYPE requests_total counter',
+            'requests_total{endpoint="categories",status="200"} 2',
+            'requests_total{endpoint="categories",status="404"} 1'
+        ]) + '\n')
+
+    def test_histogram(self):
+        """Should render cumulative bucket counts, with the sum and count of observations."""
+        histogram = self.registry.histogram('duration_seconds', 'Time taken.', ['dependency'], buckets=[0.1, 1])
+        histogram.observe(('mint-api',), 0.05)
+        histogram.observe(('mint-api',), 0.1)
+        histogram.observe(('mint-api',), 0.5)
+        histogram.observe(('mint-api',), 2.0)
+
+        self.assertEqual(self.registry.render(), '\n'.join([
+            '# HELP duration_seconds Time taken.',
+            '# TYPE duration_seconds histogram',
+            'duration_seconds_bucket{dependency="mint-api",le="0.1"} 2',
+            'duration_seconds_bucket{dependency="mint-api",le="1"} 3',
+            'duration_seconds_bucket{dependency="mint-api",le="+Inf"} 4',
+            'duration_seconds_sum{dependency="mint-api"} 2.65',
+            'duration_seconds_count{dependency="mint-api"} 4'
+        ]) + '\n')
+
+    def test_label_values_escaped(self):
+        """Should escape backslashes, quotes and newlines in label values."""
+        counter = self.registry.counter('requests_total', 'Requests handled.', ['endpoint'])
+        counter.inc(('a"b\\c\nd',))
+
+        self.assertIn('requests_total{endpoint="a\\"b\\\\c\\nd"} 1', self.registry.render())
+
+    def test_no_samples(self):
+        """Should render only the help and type of a metric nothing has been recorded against."""
+        self.registry.counter('requests_total', 'Requests handled.', ['endpoint'])
+
+        self.assertEqual(self.registry.render(),
+                         '# HELP requests_total Requests handled.\n# TYPE requests_total counter\n')
+
+    def test_summed_across_processes(self):
+        """Should render the totals of every process writing to the directory, whichever process renders them."""
+        counter = self.registry.counter('requests_total', 'Requests handled.', ['endpoint'])
+        histogram = self.registry.histogram('duration_seconds', 'Time taken.', [], buckets=[1])
+        counter.inc(('categories',))
+        histogram.observe((), 0.5)
+
+        pid = os.fork()
+        if pid == 0:
+            # The forked worker counts into a file of its own
+            counter.inc(('categories',), 2)
+            counter.inc(('instruments',))
+            histogram.observe((), 2.0)
+            os._exit(0)
+        os.waitpid(pid, 0)
+
+        self.assertEqual(2, len(os.listdir(self.directory)))
+        rendered = self.registry.render()
+        self.assertIn('requests_total{endpoint="categories"} 3\n', rendered)
+        self.assertIn('requests_total{endpoint="instruments"} 1\n', rendered)
+        self.assertIn('duration_seconds_bucket{le="1"} 1\n', rendered)
+        self.assertIn('duration_seconds_bucket{le="+Inf"} 2\n', rendered)
+        self.assertIn('duration_seconds_sum 2.5\n', rendered)
+
+
+class TestProcessValueStore(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_grows(self):
+        """Should grow its file when it runs out of room, keeping every value"""
+        store = ProcessValueStore(self.directory, initial_size=64)
+        for number in range(100):
+            store.add(('metric', ('label {0}'.format(number),), None), number)
+        store.add(('metric', ('label 1',), None), 1)
+
+        totals = store.read_all()
+        self.assertEqual(100, len(totals))
+        self.assertEqual(2, totals[('metric', ('label 1',), None)])
+        self.assertEqual(99, totals[('metric', ('label 99',), None)])
+
+    def test_reused_pid(self):
+        """Should carry on from an old file with the same pid, so totals never go down"""
+        ProcessValueStore(self.directory).add(('metric', (), None), 2)
+        store = ProcessValueStore(self.directory)
+        store.add(('metric', (), None), 1)
+        self.assertEqual({('metric', (), None): 3}, store.read_all())
+
+    def test_no_directory(self):
+        """Should read no values before anything has been written"""
+        self.assertEqual({}, ProcessValueStore(os.path.join(self.directory, 'missing')).read_all())
@@ -0,0 +1,47 @@
+from unittest import TestCase
+from unittest.mock import patch
+from flask import g
+from maintain_api.main import app
+from maintain_api.extensions import query_instrument
+from maintain_api.utilities.query_stats import start_query_stats
+from sqlalchemy import create_engine
+
+QUERY_STATS_PATH = 'maintain_api.utilities.query_stats'
+
+
+class TestQueryStats(TestCase):
+
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+
+    def test_statements_counted(self):
+        """Should count the statements run for the current request, and the time they took."""
+        with app.test_request_context('/health'):
+            start_query_stats()
+            self.engine.execute("SELECT 1")
+            self.engine.execute("SELECT 2")
+
+            self.assertEqual(g.query_stats.statements, 2)
+            self.assertGreater(g.query_stats.seconds, 0)
+
+    def test_statements_outside_request(self):
+        """Should not fail on statements run without a request."""
+        self.engine.execute("SELECT 1")
+
+    @patch.object(query_instrument, 'slow_statement_seconds', 0)
+    def test_slow_statement_logged(self):
+        """Should log statements taking longer than the threshold."""
+        with self.assertLogs(QUERY_STATS_PATH, 'WARNING') as logs:
+            self.engine.execute("SELECT 1")
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("Slow database statement took", logs.output[0])
+        self.assertIn("SELECT 1", logs.output[0])
+
+    @patch.object(query_instrument, 'slow_statement_seconds', 60)
+    def test_fast_statement_not_logged(self):
+        """Should not log statements within the threshold."""
+        with patch('{}.logger'.format(QUERY_STATS_PATH)) as mock_logger:
+            self.engine.execute("SELECT 1")
+
+        mock_logger.warning.assert_not_called()
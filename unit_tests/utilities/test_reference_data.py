@@ -0,0 +1,118 @@
+from flask import Flask
+from unittest import TestCase
+from unittest.mock import patch
+from maintain_api.utilities.reference_data import TableVersions, EncodedBody, encoded_response, not_modified
+import gzip
+
+REFERENCE_DATA_PATH = 'maintain_api.utilities.reference_data'
+
+
+class TestTableVersions(TestCase):
+
+    @patch('{}.db'.format(REFERENCE_DATA_PATH))
+    def test_get(self, mock_db):
+        """Should combine the versions of the given tables, treating a table without a row as version 0"""
+        mock_db.session.query.return_value.filter.return_value.all.return_value = [('a', 3), ('b', 5)]
+        self.assertEqual('3.0.5', TableVersions().get('a', 'c', 'b'))
+
+    @patch('{}.db'.format(REFERENCE_DATA_PATH))
+    def test_get_every_call(self, mock_db):
+        """Should read the versions from the database every time, so writes by other processes are seen"""
+        versions = TableVersions()
+        mock_db.session.query.return_value.filter.return_value.all.return_value = [('a', 1)]
+        self.assertEqual('1', versions.get('a'))
+        mock_db.session.query.return_value.filter.return_value.all.return_value = [('a', 2)]
+        self.assertEqual('2', versions.get('a'))
+
+    @patch('{}.db'.format(REFERENCE_DATA_PATH))
+    def test_bump(self, mock_db):
+        """Should increment the table's version in the current transaction, leaving the commit to the caller"""
+        mock_db.session.query.return_value.filter.return_value.update.return_value = 1
+        TableVersions().bump('a')
+        mock_db.session.query.return_value.filter.return_value.update.assert_called_once()
+        mock_db.session.add.assert_not_called()
+        mock_db.session.commit.assert_not_called()
+
+    @patch('{}.db'.format(REFERENCE_DATA_PATH))
+    def test_bump_first_write(self, mock_db):
+        """Should add the table's row if it doesn't have one yet"""
+        mock_db.session.query.return_value.filter.return_value.update.return_value = 0
+        TableVersions().bump('a')
+        added = mock_db.session.add.call_args[0][0]
+        self.assertEqual(('a', 1), (added.table_name, added.version))
+
+
+class TestEncodedResponse(TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+
+    @patch('{}.REFERENCE_DATA_GZIP'.format(REFERENCE_DATA_PATH), True)
+    def test_gzip_accepted(self):
+        """Should serve the gzipped copy, with its own ETag, to callers that accept gzip"""
+        body = EncodedBody(["abc"])
+        with self.app.test_request_context(headers={'Accept-Encoding': 'gzip, deflate'}):
+            response = encoded_response(body)
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+        self.assertEqual(b'["abc"]', gzip.decompress(response.get_data()))
+        self.assertEqual((body.etag + '-gzip', False), response.get_etag())
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+
+    @patch('{}.REFERENCE_DATA_GZIP'.format(REFERENCE_DATA_PATH), True)
+    def test_gzip_not_accepted(self):
+        """Should serve the plain body to callers that don't accept gzip"""
+        body = EncodedBody(["abc"])
+        with self.app.test_request_context():
+            response = encoded_response(body)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(b'["abc"]', response.get_data())
+        self.assertEqual((body.etag, False), response.get_etag())
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+
+    @patch('{}.REFERENCE_DATA_GZIP'.format(REFERENCE_DATA_PATH), True)
+    @patch('{}.gzip'.format(REFERENCE_DATA_PATH))
+    def test_gzip_on_first_use(self, mock_gzip):
+        """Should only compress the body once a caller accepting gzip is served, and only the once"""
+        mock_gzip.compress.return_value = b'gzipped'
+        body = EncodedBody(["abc"])
+        for headers in [{}, {'If-None-Match': '"{}"'.format(body.etag), 'Accept-Encoding': 'gzip'}]:
+            with self.app.test_request_context(headers=headers):
+                encoded_response(body)
+        mock_gzip.compress.assert_not_called()
+        for _ in range(2):
+            with self.app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+                encoded_response(body)
+        mock_gzip.compress.assert_called_once_with(b'["abc"]')
+
+    @patch('{}.REFERENCE_DATA_GZIP'.format(REFERENCE_DATA_PATH), False)
+    def test_gzip_disabled(self):
+        """Should not keep a gzipped copy when gzip is disabled"""
+        body = EncodedBody(["abc"])
+        self.assertIsNone(body.gzipped)
+        with self.app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+            response = encoded_response(body)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertNotIn('Vary', response.headers)
+
+    def test_etag_from_content(self):
+        """Should give equal bodies the same ETag, whichever order their keys were added in"""
+        self.assertEqual(EncodedBody({"a": 1, "b": [2]}).etag, EncodedBody({"b": [2], "a": 1}).etag)
+        self.assertNotEqual(EncodedBody({"a": 1}).etag, EncodedBody({"a": 2}).etag)
+
+    def test_encoded_response_not_modified(self):
+        """Should answer a request already holding the body's ETag with a 304"""
+        body = EncodedBody(["abc"])
+        with self.app.test_request_context(headers={'If-None-Match': '"{}"'.format(body.etag)}):
+            response = encoded_response(body)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b'', response.get_data())
+
+    def test_not_modified(self):
+        """Should treat the ETags of both copies as matching"""
+        for etag in ['1', '1-gzip']:
+            with self.app.test_request_context(headers={'If-None-Match': '"{}"'.format(etag)}):
+                response = not_modified('1')
+            self.assertEqual(304, response.status_code)
+            self.assertEqual((etag, False), response.get_etag())
+        with self.app.test_request_context(headers={'If-None-Match': '"2"'}):
+            self.assertIsNone(not_modified('1'))
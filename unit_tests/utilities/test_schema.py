@@ -0,0 +1,33 @@
+from unittest import TestCase
+from jsonschema import validate, SchemaError, ValidationError
+from maintain_api.utilities.schema import schema_validator
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"}
+    },
+    "additionalProperties": False,
+    "required": ["name"]
+}
+
+
+class TestSchemaValidator(TestCase):
+
+    def test_schema_validator_valid(self):
+        """Should accept a payload matching the schema"""
+        schema_validator(SCHEMA).validate({"name": "abc"})
+
+    def test_schema_validator_invalid(self):
+        """Should raise the same error jsonschema.validate does"""
+        validator = schema_validator(SCHEMA)
+        for payload in [{}, {"name": 1}, {"name": "abc", "other": 1}, None]:
+            with self.assertRaises(ValidationError) as expected:
+                validate(payload, SCHEMA)
+            with self.assertRaises(ValidationError) as actual:
+                validator.validate(payload)
+            self.assertEqual(expected.exception.message, actual.exception.message)
+
+    def test_schema_validator_invalid_schema(self):
+        """Should raise when given an invalid schema, rather than on first use"""
+        self.assertRaises(SchemaError, schema_validator, {"type": "unknown"})
@@ -0,0 +1,28 @@
+from unittest import TestCase
+from flask import g
+from maintain_api.main import app
+from maintain_api.utilities.server_timing import start_server_timing, record_phase, server_timing_header
+
+
+class TestServerTiming(TestCase):
+
+    def test_phases_added_up(self):
+        """Should add up the time recorded against each phase, in the order phases were first recorded."""
+        with app.test_request_context('/health'):
+            start_server_timing()
+            record_phase('db', 0.002)
+            record_phase('mint', 0.1)
+            record_phase('db', 0.0015)
+
+            self.assertEqual(server_timing_header(0.25), 'db;dur=3.50, mint;dur=100.00, total;dur=250.00')
+
+    def test_not_collecting(self):
+        """Should ignore phases recorded for a request that isn't collecting timings."""
+        with app.test_request_context('/health'):
+            record_phase('db', 0.002)
+
+            self.assertNotIn('server_timing', g)
+
+    def test_outside_request(self):
+        """Should ignore phases recorded outside a request."""
+        record_phase('db', 0.002)